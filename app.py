@@ -1,34 +1,129 @@
+import hashlib
 import os
-from flask import Flask, render_template, make_response
-from flask_sockets import Sockets
-from core.models import db, ServerMode
-from core.schema import schema
+from functools import partial
+import time
+from flask import Flask, Response, g, has_request_context, jsonify, render_template, make_response, request
+from core.bus import event_bus
+from core.models import db, audit_writer, rate_limiter, read_router, server_mode_cache, ServerMode
+from core.schema import schema, paste_fanout
+from core.subscriptions import WebSocketRoutes
 from flask_graphql import GraphQLView
+from graphql_server import HttpQueryError, run_http_query
+from graphql import validate
 from graphql.backend import GraphQLCoreBackend
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult, execute
+from graphql.language.printer import print_ast
+from graphql.utils.get_operation_ast import get_operation_ast
+from core.cache import LRUCache
+from core.db_migrate import CleanupJob, upgrade_database
+from core.engine import apply_sqlite_pragmas, engine_options
+from core.expiry import expiry_scheduler
+from core.hashing import password_hasher
+from core.persisted import PersistedQueryError, persisted_queries
+from core.response_cache import ResponseCacheMiddleware, response_cache
+from core.ratelimit import request_identity
+from core.workers import Master, worker_info
+from core.metrics import (
+    MetricsMiddleware, instrument_engine, operation_errors, operation_seconds, registry
+)
+from core.cost import DEFAULT_LIST_SIZE, QueryCostError, analyze, check_limits, limits_for
 
 # Initialize Flask app
 app = Flask(__name__)
 
 # Configuration
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///dvga.db')
+
 app.config.update(
     SECRET_KEY=os.environ.get('SECRET_KEY', 'dev'),
-    SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL', 'sqlite:///dvga.db'),
+    SQLALCHEMY_DATABASE_URI=DATABASE_URL,
     SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    SQLALCHEMY_ENGINE_OPTIONS=engine_options(
+        DATABASE_URL,
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    ),
+    SQLALCHEMY_READ_ROUTING=os.environ.get('DB_READ_ROUTING', 'False').lower() == 'true',
+    SQLALCHEMY_READ_DATABASE_URI=os.environ.get('READ_DATABASE_URL'),
+    SQLALCHEMY_READ_POOL_SIZE=int(os.environ.get('DB_READ_POOL_SIZE', 20)),
+    SQLITE_JOURNAL_MODE=os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    SQLITE_SYNCHRONOUS=os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    SQLITE_MMAP_SIZE=int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),
+    SQLITE_BUSY_TIMEOUT=int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
     WEB_HOST=os.environ.get('WEB_HOST', '127.0.0.1'),
-    WEB_PORT=int(os.environ.get('WEB_PORT', 5013))
+    WEB_PORT=int(os.environ.get('WEB_PORT', 5013)),
+    GRAPHQL_DOCUMENT_CACHE_SIZE=int(os.environ.get('GRAPHQL_DOCUMENT_CACHE_SIZE', 256)),
+    AUDIT_BATCH_SIZE=int(os.environ.get('AUDIT_BATCH_SIZE', 500)),
+    AUDIT_FLUSH_INTERVAL=float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0)),
+    AUDIT_MAX_PENDING=int(os.environ.get('AUDIT_MAX_PENDING', 100000)),  # Rows beyond this are dropped
+    AUDIT_MAX_ATTEMPTS=int(os.environ.get('AUDIT_MAX_ATTEMPTS', 3)),
+    SERVER_MODE_RECHECK_INTERVAL=float(os.environ.get('SERVER_MODE_RECHECK_INTERVAL', 5.0)),
+    PASTE_VERSION_SNAPSHOT_INTERVAL=int(os.environ.get('PASTE_VERSION_SNAPSHOT_INTERVAL', 20)),
+    SUBSCRIPTION_QUEUE_SIZE=int(os.environ.get('SUBSCRIPTION_QUEUE_SIZE', 100)),
+    SUBSCRIPTION_OVERFLOW_POLICY=os.environ.get('SUBSCRIPTION_OVERFLOW_POLICY', 'drop_oldest'),
+    CLEANUP_INTERVAL=int(os.environ.get('CLEANUP_INTERVAL', 0)),  # Seconds; 0 disables the job
+    CLEANUP_CHUNK_SIZE=int(os.environ.get('CLEANUP_CHUNK_SIZE', 500)),
+    CLEANUP_PAUSE=float(os.environ.get('CLEANUP_PAUSE', 0.0)),
+    EXPIRY_HORIZON=int(os.environ.get('EXPIRY_HORIZON', 300)),  # Seconds of deadlines held in memory; 0 disables
+    EXPIRY_BATCH_SIZE=int(os.environ.get('EXPIRY_BATCH_SIZE', 200)),
+    EXPIRY_MAX_QUEUED=int(os.environ.get('EXPIRY_MAX_QUEUED', 10000)),
+    METRICS_SAMPLE_RATE=float(os.environ.get('METRICS_SAMPLE_RATE', 0.1)),  # Of calls to fields with their own resolver
+    METRICS_FIELD_SAMPLE_RATES={},  # e.g. {'Paste.title': 0.01} for very hot fields
+    PASSWORD_HASH_WORKERS=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+    PASSWORD_HASH_MAX_PENDING=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64)),
+    RATE_LIMIT_FLUSH_INTERVAL=float(os.environ.get('RATE_LIMIT_FLUSH_INTERVAL', 30.0)),
+    PERSISTED_QUERY_CACHE_SIZE=int(os.environ.get('PERSISTED_QUERY_CACHE_SIZE', 1000)),
+    PERSISTED_QUERIES_FILE=os.environ.get('PERSISTED_QUERIES_FILE'),  # JSON {sha256: query}
+    PERSISTED_QUERIES_ONLY=os.environ.get('PERSISTED_QUERIES_ONLY', 'False').lower() == 'true',
+    RESPONSE_CACHE_SIZE=int(os.environ.get('RESPONSE_CACHE_SIZE', 1024)),
+    RESPONSE_CACHE_TTL=float(os.environ.get('RESPONSE_CACHE_TTL', 30.0)),  # Seconds; 0 disables the cache
+    WEB_WORKERS=int(os.environ.get('WEB_WORKERS', 1)),  # >1 enables pre-fork serving
+    WEB_REUSE_PORT=os.environ.get('WEB_REUSE_PORT', 'False').lower() == 'true',
+    WORKER_HEARTBEAT_INTERVAL=float(os.environ.get('WORKER_HEARTBEAT_INTERVAL', 5.0)),
+    WORKER_HEARTBEAT_TIMEOUT=float(os.environ.get('WORKER_HEARTBEAT_TIMEOUT', 30.0)),
+    WORKER_GRACEFUL_TIMEOUT=float(os.environ.get('WORKER_GRACEFUL_TIMEOUT', 30.0))
 )
 
 # Initialize extensions
 db.init_app(app)
-sockets = Sockets(app)
+event_bus.init_app(app)
+audit_writer.init_app(app)
+rate_limiter.init_app(app)
+server_mode_cache.recheck_interval = app.config['SERVER_MODE_RECHECK_INTERVAL']
+paste_fanout.init_app(app)
+cleanup_job = CleanupJob()
+cleanup_job.init_app(app)
+expiry_scheduler.init_app(app)
+password_hasher.init_app(app)
+metrics_middleware = MetricsMiddleware()
+metrics_middleware.init_app(app)
+persisted_queries.init_app(app)
+response_cache.init_app(app)
+response_cache_middleware = ResponseCacheMiddleware()
+sockets = WebSocketRoutes(app)
 
 # Create database tables
 with app.app_context():
-    db.create_all()
+    for engine in db.engines.values():
+        apply_sqlite_pragmas(
+            engine,
+            journal_mode=app.config['SQLITE_JOURNAL_MODE'],
+            synchronous=app.config['SQLITE_SYNCHRONOUS'],
+            mmap_size=app.config['SQLITE_MMAP_SIZE'],
+            busy_timeout=app.config['SQLITE_BUSY_TIMEOUT']
+        )
+        instrument_engine(engine)
+    upgrade_database()
     # Initialize default server mode if not exists
     if not ServerMode.query.first():
         ServerMode.set_mode('easy')
 
+read_router.init_app(app)
+if read_router.enabled:
+    instrument_engine(read_router.engine)
+
 # Routes
 @app.route('/')
 def index():
@@ -36,38 +131,360 @@ def index():
     resp.set_cookie("env", "graphiql:disable")
     return resp
 
+def worker_stats():
+    """This process's load, reported by /health and by pre-fork heartbeats."""
+    return {
+        'index': worker_info['index'],
+        'leader': worker_info['leader'],
+        'pid': os.getpid(),
+        'uptime': round(time.time() - worker_info['started'], 1),
+        'event_bus_connected': event_bus.connected,
+        'subscribers': paste_fanout.subscriber_count,
+        'audit_pending': audit_writer.pending,
+        'password_hash_queue_depth': password_hasher.queue_depth,
+        'response_cache_hit_ratio': round(response_cache.hit_ratio, 3),
+        'rate_limited': rate_limiter.limited
+    }
+
 @app.route('/health')
 def health_check():
     try:
         # Check database connection
         with app.app_context():
-            db.session.execute('SELECT 1')
-        return {'status': 'healthy', 'database': 'connected'}, 200
+            db.session.execute(db.text('SELECT 1'))
+        return {
+            'status': 'healthy',
+            'database': 'connected',
+            'worker': worker_stats(),
+            'workers': worker_info['cluster']
+        }, 200
     except Exception as e:
         return {'status': 'unhealthy', 'error': str(e)}, 500
 
+@app.before_request
+def enforce_rate_limit():
+    """Apply ServerMode.rate_limit (requests per minute) in hard mode."""
+    if request.endpoint not in ('graphql', 'graphiql'):
+        return None
+
+    username = request_identity()
+    if username:
+        rate_limiter.record_request(username)
+
+    config = ServerMode.get_config()
+    if config.mode != 'hard' or not config.rate_limit:
+        return None
+
+    keys = [f'ip:{request.remote_addr}']
+    if username:
+        keys.append(f'user:{username}')
+    if all(rate_limiter.allow(key, config.rate_limit) for key in keys):
+        return None
+    return jsonify({'errors': [{'message': 'Rate limit exceeded'}]}), 429
+
+@app.after_request
+def add_response_etag(response):
+    """ETag responses served entirely from the response cache; 304 on a matching GET."""
+    etags = g.pop('response_etags', None)
+    if request.endpoint != 'graphql' or not etags or None in etags or response.status_code != 200:
+        return response
+    if len(etags) != g.get('graphql_operation_count'):
+        # Some operations in the batch failed before reaching execution
+        return response
+    etag = etags[0] if len(etags) == 1 else hashlib.sha1('/'.join(etags).encode('utf-8')).hexdigest()
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # GraphQL endpoints
+def execute_validated(validation_errors, schema, document_ast, *args, normalized_query=None, **kwargs):
+    """Execute a document whose validation result was computed ahead of time.
+    
+    Documents whose static cost exceeds the current server mode's limits are
+    rejected before any resolver runs; the computed cost is reported in the
+    response extensions either way. Successful queries are served from the
+    response cache when an entry for the same document, variables and caller
+    exists.
+    """
+    if validation_errors:
+        record_response_etag(None)
+        return ExecutionResult(errors=validation_errors, invalid=True)
+
+    config = ServerMode.get_config()
+    limits = limits_for(config)
+    cost = analyze(
+        schema,
+        document_ast,
+        variables=kwargs.get('variables'),
+        operation_name=kwargs.get('operation_name'),
+        default_list_size=limits.get('default_list_size', DEFAULT_LIST_SIZE)
+    )
+    extensions = {'cost': cost.to_dict()}
+    try:
+        check_limits(cost, limits)
+    except QueryCostError as e:
+        record_response_etag(None)
+        return ExecutionResult(errors=[GraphQLError(str(e))], invalid=True, extensions=extensions)
+
+    operation = get_operation_ast(document_ast, kwargs.get('operation_name'))
+    operation_type = operation.operation if operation else 'unknown'
+
+    cache_key = None
+    if operation_type == 'query' and normalized_query and response_cache.enabled and has_request_context():
+        cache_key = response_cache.key(
+            normalized_query,
+            kwargs.get('variables'),
+            kwargs.get('operation_name'),
+            (request_identity(), config.mode)
+        )
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            record_response_etag(entry.etag)
+            return ExecutionResult(data=entry.data, extensions=extensions)
+
+    generation = response_cache.generation
+    started = time.perf_counter()
+    with response_cache.collect() as tags:
+        result = execute(schema, document_ast, *args, **kwargs)
+    operation_seconds.observe(time.perf_counter() - started, operation_type)
+    etag = None
+    if isinstance(result, ExecutionResult):
+        if result.errors:
+            operation_errors.inc(operation_type)
+        elif cache_key is not None and not result.invalid:
+            entry = response_cache.set(cache_key, result.data, tags, generation)
+            etag = entry.etag if entry else None
+        result.extensions = dict(result.extensions or {}, **extensions)
+    record_response_etag(etag)
+    return result
+
+def record_response_etag(etag):
+    """Note one executed operation's ETag, or None if it was not cacheable."""
+    if has_request_context():
+        # Operations run, and are recorded, in request order
+        g.setdefault('response_etags', []).append(etag)
+
 class CustomBackend(GraphQLCoreBackend):
-    def __init__(self, executor=None):
+    def __init__(self, executor=None, cache_size=256):
         super().__init__(executor)
         self.execute_params['allow_subscriptions'] = True
+        self.document_cache = LRUCache(maxsize=cache_size)
+
+    def document_from_string(self, schema, document_string):
+        """Parse and validate each distinct query text once."""
+        if not isinstance(document_string, str):
+            return super().document_from_string(schema, document_string)
+
+        key = (id(schema), document_string)
+        document = self.document_cache.get(key)
+        if document is None:
+            document = super().document_from_string(schema, document_string)
+            validation_errors = validate(schema, document.document_ast)
+            document.execute = partial(
+                execute_validated,
+                validation_errors,
+                schema,
+                document.document_ast,
+                normalized_query=print_ast(document.document_ast),
+                **self.execute_params
+            )
+            self.document_cache.set(key, document)
+        return document
+
+class CustomGraphQLView(GraphQLView):
+    """GraphQLView with automatic persisted queries.
+
+    Batched operations run one after another on the request's session and
+    DataLoaders, so a row several operations ask for is fetched once.
+    """
+
+    def dispatch_request(self):
+        # Same as GraphQLView.dispatch_request, with failed persisted
+        # queries answered in place and result extensions kept
+        try:
+            request_method = request.method.lower()
+            data = self.parse_body()
+
+            show_graphiql = request_method == 'get' and self.should_display_graphiql()
+            catch = show_graphiql
+
+            pretty = self.pretty or show_graphiql or request.args.get('pretty')
+
+            extra_options = {}
+            executor = self.get_executor()
+            if executor:
+                extra_options['executor'] = executor
+
+            # Batch entries whose persisted query did not resolve fail on their own
+            failed = {}
+            runnable = data
+            if isinstance(data, list):
+                failed = {i: entry for i, entry in enumerate(data) if isinstance(entry, PersistedQueryError)}
+                runnable = [entry for entry in data if not isinstance(entry, PersistedQueryError)]
+
+            execution_results, all_params = run_http_query(
+                self.schema,
+                request_method,
+                runnable,
+                query_data=request.args,
+                batch_enabled=self.batch,
+                catch=catch,
+                backend=self.get_backend(),
+                root=self.get_root_value(),
+                context=self.get_context(),
+                middleware=self.get_middleware(),
+                **extra_options
+            ) if runnable else ([], [])
+            if failed:
+                results = iter(execution_results)
+                execution_results = [
+                    persisted_query_result(failed[i]) if i in failed else next(results)
+                    for i in range(len(data))
+                ]
+            result, status_code = self.encode_execution_results(
+                execution_results, is_batch=isinstance(data, list), pretty=pretty
+            )
+
+            if show_graphiql:
+                return self.render_graphiql(params=all_params[0], result=result)
+
+            return Response(result, status=status_code, content_type='application/json')
+
+        except HttpQueryError as e:
+            return Response(
+                self.encode({'errors': [self.format_error(e)]}),
+                status=e.status_code,
+                headers=e.headers,
+                content_type='application/json'
+            )
+
+    def encode_execution_results(self, execution_results, is_batch=False, pretty=False):
+        """graphql_server.encode_execution_results, keeping each result's extensions.
+
+        ExecutionResult.to_dict() in graphql-core 2 drops ``extensions``, which
+        carry the query cost report.
+        """
+        results, status_code = [], 200
+        for execution_result in execution_results:
+            if execution_result is None:
+                results.append(None)
+                continue
+            response = execution_result.to_dict(format_error=self.format_error)
+            if execution_result.extensions:
+                response['extensions'] = execution_result.extensions
+            if execution_result.invalid:
+                status_code = 400
+            results.append(response)
+        return self.encode(results if is_batch else results[0], pretty=pretty), status_code
+
+    def parse_body(self):
+        """The request's operations, with persisted queries resolved.
+
+        A persisted query that cannot be resolved fails a single operation
+        with HttpQueryError; in a batch the entry is replaced by its
+        PersistedQueryError, to be reported for that entry only.
+        """
+        data = super().parse_body()
+        if isinstance(data, list):
+            g.graphql_operation_count = len(data)
+            return [self.resolve_persisted(params, in_batch=True) for params in data]
+        g.graphql_operation_count = 1
+        if not data and request.method == 'GET':
+            data = request.args.to_dict()
+        return self.resolve_persisted(data)
+
+    def resolve_persisted(self, params, in_batch=False):
+        if not hasattr(params, 'get'):
+            return params
+        try:
+            query = persisted_queries.resolve(params)
+        except PersistedQueryError as e:
+            if in_batch:
+                return e
+            raise HttpQueryError(e.status_code, str(e))
+        if query is not None and query != params.get('query'):
+            params = dict(params, query=query)
+        return params
+
+def persisted_query_result(error):
+    """The result reported for a batch entry whose persisted query failed."""
+    return ExecutionResult(errors=[GraphQLError(str(error))], invalid=error.status_code != 200)
+
+graphql_backend = CustomBackend(cache_size=app.config['GRAPHQL_DOCUMENT_CACHE_SIZE'])
+
+registry.gauge(
+    'dvga_document_cache_hits_total', 'Parsed document cache hits.',
+    lambda: graphql_backend.document_cache.hits, metric_type='counter'
+)
+registry.gauge(
+    'dvga_document_cache_misses_total', 'Parsed document cache misses.',
+    lambda: graphql_backend.document_cache.misses, metric_type='counter'
+)
+registry.gauge('dvga_audit_queue_pending', 'Audit rows waiting to be written.', lambda: audit_writer.pending)
+registry.gauge(
+    'dvga_audit_rows_dropped_total', 'Audit rows dropped on a full queue or after repeated write failures.',
+    lambda: audit_writer.dropped, metric_type='counter'
+)
+registry.gauge('dvga_expiry_queued', 'Upcoming expiry deadlines held in memory.', lambda: expiry_scheduler.queued)
+registry.gauge(
+    'dvga_expired_pastes_total', 'Pastes deleted by the expiry scheduler.',
+    lambda: expiry_scheduler.expired['pastes'], metric_type='counter'
+)
+registry.gauge('dvga_password_hash_active', 'Password hashes running on worker threads.', lambda: password_hasher.active)
+registry.gauge('dvga_password_hash_queue_depth', 'Password operations waiting for a worker.', lambda: password_hasher.queue_depth)
+registry.gauge(
+    'dvga_password_hash_rejected_total', 'Password operations refused because the queue was full.',
+    lambda: password_hasher.rejected, metric_type='counter'
+)
+registry.gauge(
+    'dvga_rate_limited_total', 'Requests refused by the rate limiter.',
+    lambda: rate_limiter.limited, metric_type='counter'
+)
+registry.gauge(
+    'dvga_persisted_query_hits_total', 'Persisted query hashes found in the cache.',
+    lambda: persisted_queries.cache.hits, metric_type='counter'
+)
+registry.gauge(
+    'dvga_persisted_query_misses_total', 'Persisted query hashes not found in the cache.',
+    lambda: persisted_queries.cache.misses, metric_type='counter'
+)
+registry.gauge(
+    'dvga_response_cache_hits_total', 'Query results served from the response cache.',
+    lambda: response_cache.hits, metric_type='counter'
+)
+registry.gauge(
+    'dvga_response_cache_misses_total', 'Cacheable queries that had to execute.',
+    lambda: response_cache.misses, metric_type='counter'
+)
+registry.gauge('dvga_response_cache_hit_ratio', 'Response cache hits per lookup.', lambda: response_cache.hit_ratio)
+registry.gauge('dvga_response_cache_entries', 'Cached query results.', lambda: len(response_cache))
+registry.gauge(
+    'dvga_response_cache_invalidations_total', 'Cached results dropped by writes.',
+    lambda: response_cache.invalidations, metric_type='counter'
+)
+registry.gauge('dvga_subscribers', 'Active websocket subscriptions.', lambda: paste_fanout.subscriber_count)
 
 app.add_url_rule(
     '/graphql',
-    view_func=GraphQLView.as_view(
+    view_func=CustomGraphQLView.as_view(
         'graphql',
         schema=schema,
-        backend=CustomBackend(),
+        backend=graphql_backend,
+        middleware=[metrics_middleware, response_cache_middleware],
         batch=True
     )
 )
 
 app.add_url_rule(
     '/graphiql',
-    view_func=GraphQLView.as_view(
+    view_func=CustomGraphQLView.as_view(
         'graphiql',
         schema=schema,
-        backend=CustomBackend(),
+        backend=CustomBackend(cache_size=app.config['GRAPHQL_DOCUMENT_CACHE_SIZE']),
+        middleware=[metrics_middleware, response_cache_middleware],
         graphiql=True
     )
 )
@@ -79,15 +496,59 @@ def echo_socket(ws):
     subscription_server.handle(ws)
     return []
 
-if __name__ == '__main__':
-    # Note: This file should be run using: uv run python app.py
+def make_server(listener):
     from gevent import pywsgi
     from geventwebsocket.handler import WebSocketHandler
-    
-    server = pywsgi.WSGIServer(
-        (app.config['WEB_HOST'], app.config['WEB_PORT']),
-        app,
-        handler_class=WebSocketHandler
-    )
-    print(f"Server running on {app.config['WEB_HOST']}:{app.config['WEB_PORT']}")
-    server.serve_forever() 
\ No newline at end of file
+    return pywsgi.WSGIServer(listener, app, handler_class=WebSocketHandler)
+
+def start_background_jobs(index=0):
+    audit_writer.start()
+    rate_limiter.start()
+
+def stop_background_jobs(index=0):
+    rate_limiter.stop()
+    audit_writer.stop()
+
+def start_singleton_jobs():
+    """The periodic cleanup and the expiry scheduler, run by one process only."""
+    cleanup_job.start()
+    expiry_scheduler.start()
+
+def stop_singleton_jobs():
+    expiry_scheduler.stop()
+    cleanup_job.stop()
+
+def dispose_engines():
+    """Drop pooled connections so forked workers open their own."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    if read_router.enabled:
+        read_router.engine.dispose()
+
+if __name__ == '__main__':
+    # Note: This file should be run using: uv run python app.py
+    address = (app.config['WEB_HOST'], app.config['WEB_PORT'])
+    if app.config['WEB_WORKERS'] > 1:
+        print(f"Server running on {address[0]}:{address[1]} with {app.config['WEB_WORKERS']} workers")
+        Master(
+            make_server,
+            workers=app.config['WEB_WORKERS'],
+            bind=address,
+            reuse_port=app.config['WEB_REUSE_PORT'],
+            heartbeat_interval=app.config['WORKER_HEARTBEAT_INTERVAL'],
+            heartbeat_timeout=app.config['WORKER_HEARTBEAT_TIMEOUT'],
+            graceful_timeout=app.config['WORKER_GRACEFUL_TIMEOUT'],
+            before_fork=dispose_engines,
+            on_worker_start=start_background_jobs,
+            on_worker_stop=stop_background_jobs,
+            worker_stats=worker_stats,
+            on_leader_start=start_singleton_jobs,
+            on_leader_stop=stop_singleton_jobs
+        ).run()
+    else:
+        server = make_server(address)
+        start_background_jobs()
+        start_singleton_jobs()
+        print(f"Server running on {address[0]}:{address[1]}")
+        server.serve_forever()
@@ -0,0 +1,113 @@
+"""Audit write throughput: one transaction per row versus the batching AuditWriter.
+
+``inline`` writes every audit in its own transaction, as Audit.log_action
+did before the writer existed; ``batched`` enqueues through
+Audit.log_action and lets the writer's greenlet flush in bulk. Audits
+arrive from ``--callers`` greenlets that yield between writes, like
+request handlers would. Run from the repository root:
+
+    uv run python -m benchmarks.audit_writer --audits 20000 --mode batched
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import gevent
+from flask import Flask
+
+from core.engine import apply_sqlite_pragmas, engine_options
+from core.models import db, audit_writer, Audit
+
+
+def make_app(database_uri, batch_size, flush_interval):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SQLALCHEMY_ENGINE_OPTIONS=engine_options(database_uri),
+        AUDIT_BATCH_SIZE=batch_size,
+        AUDIT_FLUSH_INTERVAL=flush_interval
+    )
+    db.init_app(app)
+    audit_writer.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine)
+    return app
+
+
+def inline_write(index):
+    with db.engine.begin() as connection:
+        Audit.insert_many(connection, [{
+            'paste_id': None, 'user_id': None, 'action': 'read',
+            'ip_address': f'10.0.0.{index % 250}', 'timestamp': datetime.utcnow()
+        }])
+
+
+def batched_write(index):
+    Audit.log_action(None, None, 'read', ip_address=f'10.0.0.{index % 250}')
+
+
+def run(args):
+    database = args.database
+    if database is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        database = f'sqlite:///{path}'
+    app = make_app(database, args.batch_size, args.flush_interval)
+    write = batched_write if args.mode == 'batched' else inline_write
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    latencies = []
+
+    def caller(indexes):
+        with app.app_context():
+            for index in indexes:
+                started = time.perf_counter()
+                write(index)
+                latencies.append(time.perf_counter() - started)
+                gevent.sleep(0)
+
+    if args.mode == 'batched':
+        audit_writer.start()
+    start = time.perf_counter()
+    gevent.joinall([
+        gevent.spawn(caller, range(offset, args.audits, args.callers)) for offset in range(args.callers)
+    ])
+    if args.mode == 'batched':
+        audit_writer.stop()
+    seconds = time.perf_counter() - start
+
+    with app.app_context():
+        written = Audit.query.count()
+    latencies.sort()
+    return {
+        'mode': args.mode,
+        'audits': args.audits,
+        'callers': args.callers,
+        'rows_written': written,
+        'rows_per_second': round(written / seconds),
+        'seconds': round(seconds, 3),
+        'caller_p50_us': round(statistics.median(latencies) * 1e6, 1),
+        'caller_p99_us': round(latencies[int(len(latencies) * 0.99) - 1] * 1e6, 1),
+        'flushes': audit_writer.flushes,
+        'dropped': audit_writer.dropped,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='Defaults to a fresh temporary SQLite file')
+    parser.add_argument('--audits', type=int, default=20000)
+    parser.add_argument('--callers', type=int, default=8, help='Concurrent writing greenlets')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--mode', choices=('batched', 'inline'), default='batched')
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
@@ -0,0 +1,113 @@
+"""Throughput and exactly-once delivery of burn-after-read pastes under contention.
+
+Every paste is requested by several readers at once. ``atomic`` uses
+Paste.read_and_burn; ``legacy`` is the old SELECT through the session
+followed by an ORM delete. Run from the repository root:
+
+    uv run python -m benchmarks.burn --pastes 2000 --readers 4 --mode atomic
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+
+from core.engine import apply_sqlite_pragmas, engine_options
+from core.models import db, Paste
+
+
+def make_app(database_uri, pool_size):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SQLALCHEMY_ENGINE_OPTIONS=engine_options(database_uri, pool_size=pool_size)
+    )
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine)
+    return app
+
+
+def legacy_burn(paste_id):
+    paste = Paste.query.filter_by(id=paste_id, burn=True).first()
+    if paste is None:
+        return None
+    content = paste.content
+    db.session.delete(paste)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return content
+
+
+def atomic_burn(paste_id):
+    paste = Paste.read_and_burn(paste_id)
+    return paste.content if paste is not None else None
+
+
+def run(args):
+    database = args.database
+    if database is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        database = f'sqlite:///{path}'
+    app = make_app(database, args.readers)
+    burn = atomic_burn if args.mode == 'atomic' else legacy_burn
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Paste.__table__.insert(), [
+            {'id': i, 'title': f'burn {i}', 'content': f'secret {i}', 'burn': True,
+             'public': True, 'version': 1, 'size': 8}
+            for i in range(1, args.pastes + 1)
+        ])
+        db.session.commit()
+
+    def reader(paste_id):
+        with app.app_context():
+            try:
+                return burn(paste_id)
+            except Exception:
+                return 'error'
+
+    requests = [paste_id for paste_id in range(1, args.pastes + 1) for _ in range(args.readers)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.readers) as executor:
+        results = list(executor.map(reader, requests))
+    seconds = time.perf_counter() - start
+
+    delivered = {}
+    for paste_id, content in zip(requests, results):
+        if content not in (None, 'error'):
+            delivered[paste_id] = delivered.get(paste_id, 0) + 1
+    with app.app_context():
+        remaining = Paste.query.filter_by(burn=True).count()
+
+    return {
+        'mode': args.mode,
+        'pastes': args.pastes,
+        'readers_per_paste': args.readers,
+        'requests': len(requests),
+        'requests_per_second': round(len(requests) / seconds),
+        'errors': results.count('error'),
+        'delivered_once': sum(1 for count in delivered.values() if count == 1),
+        'delivered_more_than_once': sum(1 for count in delivered.values() if count > 1),
+        'never_delivered': args.pastes - len(delivered),
+        'rows_remaining': remaining,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='Defaults to a fresh temporary SQLite file')
+    parser.add_argument('--pastes', type=int, default=2000)
+    parser.add_argument('--readers', type=int, default=4, help='Concurrent readers per paste')
+    parser.add_argument('--mode', choices=('atomic', 'legacy'), default='atomic')
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
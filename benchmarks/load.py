@@ -0,0 +1,396 @@
+"""Seeded load test for the DVGA GraphQL server.
+
+Seeds a SQLite database at a chosen scale, starts the gevent server (in this
+process or as a subprocess), replays a weighted mix of queries and mutations
+at fixed concurrency, and prints machine-readable JSON:
+
+    uv run python -m benchmarks.load --pastes 20000 --concurrency 32 --duration 30 \\
+        --output bench.json
+    uv run python -m benchmarks.load --compare bench.json
+
+Results include throughput, p50/p95/p99 latency per operation and the number
+of SQL statements each operation issues (read from /metrics).
+
+Repeated reads are mostly answered by the response cache, which drops their
+SQL counts well below one statement per operation; pass --no-response-cache
+to measure the resolvers themselves. Only compare runs made with the same
+flags, scale and seed. Subscriptions are not part of the mix: flask-sockets
+routes are not marked as websocket rules, so Werkzeug >= 2 refuses every
+upgrade to /subscriptions with WebsocketMismatch.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import gevent
+from gevent.pool import Pool
+
+QUERIES = {
+    'pastes': (
+        '{ pastes(public: true, limit: 20) { id title owner { username } } }',
+        lambda ctx: {}
+    ),
+    'paste': (
+        'query Paste($id: Int) { paste(id: $id) { id title content } }',
+        lambda ctx: {'id': ctx.random_paste_id()}
+    ),
+    'nested': (
+        '{ pastes(limit: 10) { title owner { username pastes { title } } } }',
+        lambda ctx: {}
+    ),
+    'connection': (
+        '{ pastesConnection(first: 20, public: true) '
+        '{ edges { cursor node { id title } } pageInfo { hasNextPage endCursor } } }',
+        lambda ctx: {}
+    ),
+    'search': (
+        'query Search($keyword: String) { search(keyword: $keyword) '
+        '{ ... on Paste { id title } ... on User { username } } }',
+        lambda ctx: {'keyword': ctx.rng.choice(WORDS)}
+    ),
+    'create_pastes': (
+        'mutation Create($inputs: [PasteInput!]!) { createPastes(inputs: $inputs) { pastes { id } } }',
+        lambda ctx: {'inputs': [{
+            'title': f'bench {ctx.rng.random():.6f}',
+            'content': ctx.paste_content(),
+            'public': True,
+        }]}
+    ),
+}
+
+DEFAULT_MIX = {
+    'pastes': 30,
+    'paste': 25,
+    'nested': 10,
+    'connection': 15,
+    'search': 10,
+    'create_pastes': 10,
+}
+
+WORDS = (
+    'alpha', 'bravo', 'charlie', 'delta', 'echo', 'select', 'insert', 'token',
+    'config', 'secret', 'graphql', 'paste', 'server', 'admin', 'debug', 'query',
+)
+
+
+class Context:
+    def __init__(self, seed, paste_count):
+        self.rng = random.Random(seed)
+        self.paste_count = paste_count
+
+    def random_paste_id(self):
+        return self.rng.randint(1, max(1, self.paste_count))
+
+    def paste_content(self):
+        return paste_content(self.rng)
+
+
+def paste_content(rng):
+    """Paste bodies follow a rough log-normal size distribution (median ~1 KB)."""
+    size = min(int(rng.lognormvariate(7, 1)), 256 * 1024)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def seed_database(app, users, pastes, versions, audits, seed=1):
+    """Populate a fresh database with core.seed's bulk loader."""
+    from core.models import db, ServerMode
+    from core.seed import Seeder
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        ServerMode.set_mode('easy')
+        return Seeder(
+            users=users,
+            pastes=pastes,
+            versions_per_paste=versions,
+            audits_per_paste=audits / pastes if pastes else 0,
+            login_attempts_per_user=0,
+            seed=seed
+        ).run()
+
+
+class Server:
+    """The app under test, either imported here or run as ``python app.py``."""
+
+    def __init__(self, mode, host, port, env):
+        self.mode = mode
+        self.host = host
+        self.port = port
+        self.env = env
+        self.process = None
+        self.server = None
+
+    def start(self):
+        if self.mode == 'subprocess':
+            self.process = subprocess.Popen(
+                [sys.executable, 'app.py'],
+                env=dict(os.environ, **self.env),
+                stdout=subprocess.DEVNULL
+            )
+        else:
+            from gevent import pywsgi
+            from geventwebsocket.handler import WebSocketHandler
+            from app import app, audit_writer
+            audit_writer.start()
+            self.server = pywsgi.WSGIServer(
+                (self.host, self.port), app, handler_class=WebSocketHandler, log=None
+            )
+            self.server.start()
+        self.wait_ready()
+
+    def wait_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=2)
+                connection.request('GET', '/health')
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            gevent.sleep(0.2)
+        raise RuntimeError('Server did not become healthy in time')
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        if self.server is not None:
+            self.server.stop(timeout=5)
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+
+    def graphql(self, query, variables=None):
+        body = json.dumps({'query': query, 'variables': variables or {}})
+        try:
+            self.connection.request('POST', '/graphql', body, {'Content-Type': 'application/json'})
+            response = self.connection.getresponse()
+            payload = json.loads(response.read())
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            raise
+        return response.status == 200 and not payload.get('errors')
+
+    def metrics(self):
+        self.connection.request('GET', '/metrics')
+        return self.connection.getresponse().read().decode('utf-8')
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 3)
+
+
+def sql_statement_count(metrics_text):
+    return sum(int(float(value)) for value in re.findall(
+        r'^dvga_sql_statement_seconds_count\{[^}]*\} (\S+)$', metrics_text, re.MULTILINE
+    ))
+
+
+def run_operation(name, client, ctx):
+    query, variables = QUERIES[name]
+    return client.graphql(query, variables(ctx))
+
+
+def measure_sql_per_operation(host, port, mix, ctx, repeat=5):
+    """Run each operation alone and diff the server's SQL statement counter."""
+    client = Client(host, port)
+    result = {}
+    for name in mix:
+        before = sql_statement_count(client.metrics())
+        for _ in range(repeat):
+            run_operation(name, client, ctx)
+        after = sql_statement_count(client.metrics())
+        result[name] = round((after - before) / repeat, 2)
+    return result
+
+
+def run_load(host, port, mix, concurrency, duration, seed, paste_count):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        ctx = Context(seed + index, paste_count)
+        client = Client(host, port)
+        while time.monotonic() < deadline:
+            name = ctx.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = run_operation(name, client, ctx)
+            except Exception:
+                ok = False
+            latencies[name].append(time.perf_counter() - started)
+            if not ok:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    pool = Pool(concurrency)
+    for index in range(concurrency):
+        pool.spawn(worker, index)
+    pool.join()
+    elapsed = time.perf_counter() - started
+
+    operations = {}
+    for name in names:
+        samples = latencies[name]
+        operations[name] = {
+            'count': len(samples),
+            'errors': errors[name],
+            'throughput': round(len(samples) / elapsed, 2),
+            'p50_ms': percentile(samples, 0.50),
+            'p95_ms': percentile(samples, 0.95),
+            'p99_ms': percentile(samples, 0.99),
+        }
+    everything = [sample for samples in latencies.values() for sample in samples]
+    overall = {
+        'count': len(everything),
+        'errors': sum(errors.values()),
+        'throughput': round(len(everything) / elapsed, 2),
+        'p50_ms': percentile(everything, 0.50),
+        'p95_ms': percentile(everything, 0.95),
+        'p99_ms': percentile(everything, 0.99),
+        'seconds': round(elapsed, 3),
+    }
+    return operations, overall
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, current):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    deltas = {}
+    for name, stats in current['operations'].items():
+        before = baseline.get('operations', {}).get(name)
+        if not before:
+            continue
+        deltas[name] = {
+            key: round(stats[key] - before[key], 3)
+            for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms')
+            if stats.get(key) is not None and before.get(key) is not None
+        }
+    return {'baseline_revision': baseline.get('meta', {}).get('revision'), 'operations': deltas}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seeded load test for the DVGA GraphQL server.')
+    parser.add_argument('--database', help='SQLite file to seed (default: a temporary file)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--pastes', type=int, default=5000)
+    parser.add_argument('--versions', type=int, default=1)
+    parser.add_argument('--audits', type=int, default=20000)
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--server', choices=('inprocess', 'subprocess'), default='inprocess')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--mix', help='JSON object of operation weights', default=None)
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='Disable the response cache so reads reach the database')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--compare', help='Baseline JSON to diff the results against')
+    args = parser.parse_args(argv)
+
+    mix = json.loads(args.mix) if args.mix else dict(DEFAULT_MIX)
+    unknown = set(mix) - set(QUERIES)
+    if unknown:
+        parser.error(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='dvga-bench-'), 'bench.db')
+    env = {
+        'DATABASE_URL': f'sqlite:///{os.path.abspath(database)}',
+        'WEB_HOST': args.host,
+        'WEB_PORT': str(args.port),
+    }
+    if args.no_response_cache:
+        # Read by app.py at import time, so it must be set before the import below
+        env['RESPONSE_CACHE_TTL'] = '0'
+    os.environ.update(env)
+
+    if not args.skip_seed:
+        from app import app
+        seeded = time.perf_counter()
+        seed_database(app, args.users, args.pastes, args.versions, args.audits, args.seed)
+        seed_seconds = round(time.perf_counter() - seeded, 3)
+    else:
+        seed_seconds = None
+
+    server = Server(args.server, args.host, args.port, env)
+    server.start()
+    try:
+        ctx = Context(args.seed, args.pastes)
+        sql_per_operation = measure_sql_per_operation(args.host, args.port, mix, ctx)
+        operations, overall = run_load(
+            args.host, args.port, mix, args.concurrency, args.duration, args.seed, args.pastes
+        )
+    finally:
+        server.stop()
+
+    for name, count in sql_per_operation.items():
+        operations[name]['sql_per_operation'] = count
+
+    result = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'server': args.server,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'scale': {'users': args.users, 'pastes': args.pastes, 'audits': args.audits},
+            'seed_seconds': seed_seconds,
+            'response_cache': not args.no_response_cache,
+            'mix': mix,
+        },
+        'overall': overall,
+        'operations': operations,
+    }
+    if args.compare:
+        result['comparison'] = compare(args.compare, result)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
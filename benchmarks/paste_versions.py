@@ -0,0 +1,119 @@
+"""Storage size and reconstruction latency of delta-compressed paste versions.
+
+Run from the repository root:
+
+    uv run python -m benchmarks.paste_versions --versions 1000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from flask import Flask
+from sqlalchemy.sql import func
+
+from core.models import db, Paste, PasteVersion
+from core.versions import build_version, get_version_content, version_cache
+
+
+def make_app(database_uri, snapshot_interval):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        PASTE_VERSION_SNAPSHOT_INTERVAL=snapshot_interval
+    )
+    db.init_app(app)
+    return app
+
+
+def edit(content, rng):
+    """Apply a small random edit, similar to a typical paste revision."""
+    lines = content.splitlines(keepends=True)
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(lines))
+        choice = rng.random()
+        if choice < 0.6:
+            lines[index] = f"edited line {rng.random():.8f}\n"
+        elif choice < 0.8:
+            lines.insert(index, f"inserted line {rng.random():.8f}\n")
+        elif len(lines) > 1:
+            del lines[index]
+    return ''.join(lines)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    app = make_app(args.database, args.snapshot_interval)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        content = ''.join(f"line {i} {rng.random():.8f}\n" for i in range(args.lines))
+        paste = Paste(title='bench', content=content, version=1, size=len(content))
+        db.session.add(paste)
+        db.session.add(PasteVersion(paste=paste, content=content, version=1, is_snapshot=True))
+        db.session.commit()
+
+        full_bytes = len(content.encode('utf-8'))
+        expected = {1: content}
+        for _ in range(args.versions - 1):
+            new_content = edit(paste.content, rng)
+            db.session.add(build_version(paste, paste.version + 1, new_content, previous_content=paste.content))
+            paste.version += 1
+            paste.content = new_content
+            expected[paste.version] = new_content
+            full_bytes += len(new_content.encode('utf-8'))
+        db.session.commit()
+
+        stored_bytes = db.session.query(
+            func.sum(func.length(PasteVersion.content) + func.coalesce(func.length(PasteVersion.delta), 0))
+        ).scalar()
+
+        samples = rng.sample(sorted(expected), min(args.samples, len(expected)))
+        cold, warm = [], []
+        for version in samples:
+            version_cache.clear()
+            db.session.expire_all()
+            start = time.perf_counter()
+            text = get_version_content(paste.id, version)
+            cold.append((time.perf_counter() - start) * 1000)
+            assert text == expected[version], f"version {version} did not round-trip"
+
+            start = time.perf_counter()
+            get_version_content(paste.id, version)
+            warm.append((time.perf_counter() - start) * 1000)
+
+        return {
+            'versions': args.versions,
+            'snapshot_interval': args.snapshot_interval,
+            'full_text_bytes': full_bytes,
+            'stored_bytes': stored_bytes,
+            'compression_ratio': round(full_bytes / stored_bytes, 2),
+            'reconstruct_cold_ms': {
+                'p50': round(statistics.median(cold), 3),
+                'p95': round(percentile(cold, 0.95), 3),
+                'max': round(max(cold), 3),
+            },
+            'reconstruct_cached_ms': {
+                'p50': round(statistics.median(warm), 4),
+                'p95': round(percentile(warm, 0.95), 4),
+            },
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite:///:memory:')
+    parser.add_argument('--versions', type=int, default=1000)
+    parser.add_argument('--lines', type=int, default=400)
+    parser.add_argument('--snapshot-interval', type=int, default=20)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
@@ -0,0 +1,140 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from flask import has_app_context
+import gevent
+from gevent.event import Event
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """Buffer audit-style rows in memory and write them with bulk INSERTs.
+
+    Rows are flushed by a background greenlet whenever ``batch_size`` rows
+    are pending or ``flush_interval`` seconds have passed, whichever comes
+    first. ``flush()`` writes everything synchronously and is meant for
+    tests, scripts and shutdown. Hooks registered with ``on_write`` run in
+    the same transaction as the INSERTs.
+
+    The queue is bounded: rows enqueued while ``max_pending`` rows are
+    waiting are dropped, and rows of a batch that failed ``max_attempts``
+    times are given up on. Both are logged and counted in ``dropped``.
+    """
+
+    def __init__(self, db, batch_size=500, flush_interval=1.0, max_pending=100000, max_attempts=3):
+        self.db = db
+        self.app = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.rows_written = 0
+        self.flushes = 0
+        self.dropped = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = Event()
+        self._greenlet = None
+        self._hooks = defaultdict(list)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', self.flush_interval)
+        self.max_pending = app.config.get('AUDIT_MAX_PENDING', self.max_pending)
+        self.max_attempts = app.config.get('AUDIT_MAX_ATTEMPTS', self.max_attempts)
+        app.extensions['audit_writer'] = self
+        atexit.register(self.stop)
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def on_write(self, table, hook):
+        """Call ``hook(connection, rows)`` whenever rows of ``table`` are written."""
+        self._hooks[table].append(hook)
+
+    def enqueue(self, table, **values):
+        """Queue one row for ``table``; it is written on the next flush."""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                dropped = self.dropped
+            else:
+                self._pending.append((table, values, 0))
+                dropped = None
+            full = len(self._pending) >= self.batch_size
+        if dropped is not None and (dropped == 1 or dropped % 1000 == 0):
+            logger.error("Audit queue is full (%s rows); %s rows dropped so far", self.max_pending, dropped)
+        if full:
+            self._wakeup.set()
+
+    def start(self):
+        if self._greenlet is None or self._greenlet.dead:
+            self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        self.flush()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit flush failed")
+
+    def flush(self):
+        """Write all pending rows in a single transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        if has_app_context() or self.app is None:
+            self._write(pending)
+        else:
+            with self.app.app_context():
+                self._write(pending)
+        return len(pending)
+
+    def _write(self, pending):
+        # executemany needs the same keys for every row of a statement
+        batches = defaultdict(list)
+        for table, values, _ in pending:
+            batches[(table, tuple(sorted(values)))].append(values)
+
+        try:
+            with self.db.engine.begin() as connection:
+                for (table, _), rows in batches.items():
+                    connection.execute(table.insert(), rows)
+                    for hook in self._hooks.get(table, ()):
+                        hook(connection, rows)
+        except Exception:
+            self._requeue(pending)
+            raise
+
+        self.rows_written += len(pending)
+        self.flushes += 1
+
+    def _requeue(self, pending):
+        """Put a failed batch back in front of the queue, minus rows out of attempts."""
+        retry = [(table, values, attempts + 1) for table, values, attempts in pending
+                 if attempts + 1 < self.max_attempts]
+        with self._lock:
+            self._pending[:0] = retry
+            # Make room by giving up on the oldest rows
+            overflow = max(0, len(self._pending) - self.max_pending)
+            del self._pending[:overflow]
+            dropped = len(pending) - len(retry) + overflow
+            self.dropped += dropped
+        if dropped:
+            logger.error(
+                "Dropped %s audit rows after %s failed writes or a full queue", dropped, self.max_attempts
+            )
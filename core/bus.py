@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+
+import gevent
+from gevent import socket
+from gevent.lock import Semaphore
+from gevent.server import StreamServer
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(message):
+    return (json.dumps(message, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+
+
+class BusBroker:
+    """Relay newline-delimited JSON messages between worker processes.
+
+    Runs in the master process on a Unix domain socket. Every message a
+    worker sends is forwarded to all other connected workers; messages on
+    ``control`` channels are handed to ``on_control`` instead.
+    """
+
+    def __init__(self, path, on_control=None, control_channels=('heartbeat',)):
+        self.path = path
+        self.on_control = on_control
+        self.control_channels = set(control_channels)
+        self.relayed = 0
+        self._clients = {}
+        self._server = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen(128)
+        self._server = StreamServer(listener, self._handle)
+        self._server.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def detach(self):
+        """Drop inherited sockets in a forked child, leaving the parent's broker running."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for client in list(self._clients):
+            client.close()
+        self._clients.clear()
+
+    def broadcast(self, message, exclude=None):
+        data = _encode(message)
+        for client, lock in list(self._clients.items()):
+            if client is exclude:
+                continue
+            try:
+                with lock:
+                    client.sendall(data)
+            except OSError:
+                self._clients.pop(client, None)
+
+    def _handle(self, client, address):
+        self._clients[client] = Semaphore()
+        reader = client.makefile('rb')
+        try:
+            for line in reader:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logger.warning("Dropping malformed bus message")
+                    continue
+                if message.get('channel') in self.control_channels:
+                    if self.on_control:
+                        self.on_control(message)
+                    continue
+                self.relayed += 1
+                self.broadcast(message, exclude=client)
+        except OSError:
+            pass
+        finally:
+            self._clients.pop(client, None)
+            reader.close()
+            client.close()
+
+
+class EventBus:
+    """Worker-side connection to the BusBroker.
+
+    ``publish`` sends a message to every other worker; handlers registered
+    with ``subscribe`` run for messages from other workers, inside an
+    application context. Without a broker (single-process serving)
+    ``publish`` does nothing, so callers never need to check.
+    """
+
+    def __init__(self, reconnect_interval=1.0):
+        self.app = None
+        self.path = None
+        self.reconnect_interval = reconnect_interval
+        self.published = 0
+        self.received = 0
+        self._handlers = {}
+        self._socket = None
+        self._lock = Semaphore()
+        self._greenlet = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['event_bus'] = self
+
+    @property
+    def connected(self):
+        return self._socket is not None
+
+    def subscribe(self, channel, handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def connect(self, path):
+        self.path = path
+        if self._greenlet is None or self._greenlet.dead:
+            self._greenlet = gevent.spawn(self._run)
+
+    def close(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        self._disconnect()
+
+    def publish(self, channel, **data):
+        sock = self._socket
+        if sock is None:
+            return False
+        data['channel'] = channel
+        data['origin'] = os.getpid()
+        try:
+            with self._lock:
+                sock.sendall(_encode(data))
+        except OSError:
+            self._disconnect()
+            return False
+        self.published += 1
+        return True
+
+    def _disconnect(self):
+        sock, self._socket = self._socket, None
+        if sock is not None:
+            sock.close()
+
+    def _run(self):
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                gevent.sleep(self.reconnect_interval)
+                continue
+            self._socket = sock
+            reader = sock.makefile('rb')
+            try:
+                for line in reader:
+                    self._dispatch(json.loads(line))
+            except (OSError, ValueError):
+                logger.warning("Event bus connection lost; reconnecting")
+            finally:
+                reader.close()
+                self._disconnect()
+            gevent.sleep(self.reconnect_interval)
+
+    def _dispatch(self, message):
+        self.received += 1
+        handlers = self._handlers.get(message.get('channel'), ())
+        if not handlers:
+            return
+        with self.app.app_context():
+            for handler in handlers:
+                try:
+                    handler(message)
+                except Exception:
+                    logger.exception("Event bus handler failed")
+
+
+event_bus = EventBus()
@@ -0,0 +1,153 @@
+from graphql.language import ast
+from graphql.type import GraphQLList, GraphQLNonNull
+from graphql.utils.get_operation_ast import get_operation_ast
+
+# Assumed length of list fields that carry no limit/first argument
+DEFAULT_LIST_SIZE = 10
+
+SIZE_ARGUMENTS = ('limit', 'first')
+
+# Per-mode limits; security_config JSON on the server_mode row overrides them
+DEFAULT_LIMITS = {
+    'easy': {},
+    'hard': {
+        'max_query_depth': 8,
+        'max_query_cost': 5000,
+        'max_query_rows': 10000,
+    },
+}
+
+
+class QueryCost:
+    """Static estimate of the work a document will do."""
+
+    def __init__(self):
+        self.depth = 0
+        self.fields = 0
+        self.cost = 0
+        self.rows = 0
+
+    def to_dict(self):
+        return {
+            'depth': self.depth,
+            'fields': self.fields,
+            'cost': self.cost,
+            'rows': self.rows,
+        }
+
+
+class QueryCostError(Exception):
+    pass
+
+
+def limits_for(config):
+    """Merge the mode defaults with overrides from ``security_config``."""
+    limits = dict(DEFAULT_LIMITS.get(config.mode, {}))
+    for key in ('max_query_depth', 'max_query_cost', 'max_query_rows', 'default_list_size'):
+        if key in config.security_config:
+            limits[key] = config.security_config[key]
+    return limits
+
+
+def check_limits(cost, limits):
+    for key, value in (('depth', cost.depth), ('cost', cost.cost), ('rows', cost.rows)):
+        limit = limits.get(f'max_query_{key}')
+        if limit is not None and value > limit:
+            raise QueryCostError(f'Query {key} {value} exceeds the limit of {limit}')
+
+
+def _unwrap(graphql_type):
+    is_list = False
+    while isinstance(graphql_type, (GraphQLList, GraphQLNonNull)):
+        if isinstance(graphql_type, GraphQLList):
+            is_list = True
+        graphql_type = graphql_type.of_type
+    return graphql_type, is_list
+
+
+def _size_argument(field, variables):
+    for argument in field.arguments or []:
+        if argument.name.value not in SIZE_ARGUMENTS:
+            continue
+        value = argument.value
+        if isinstance(value, ast.Variable):
+            value = variables.get(value.name.value)
+        elif isinstance(value, ast.IntValue):
+            value = int(value.value)
+        else:
+            value = None
+        if isinstance(value, int):
+            return max(value, 0)
+    return None
+
+
+def analyze(schema, document_ast, variables=None, operation_name=None, default_list_size=DEFAULT_LIST_SIZE):
+    """Compute depth, field cost and estimated row count without executing.
+
+    ``cost`` counts resolver calls: each field is weighted by how many parent
+    objects it will run for. ``rows`` estimates objects fetched by list
+    fields. A list field's length is its ``limit``/``first`` argument, an
+    argument on a non-list field (e.g. a connection) carries down to its
+    first list child, and anything else assumes ``default_list_size``.
+    """
+    variables = variables or {}
+    cost = QueryCost()
+    operation = get_operation_ast(document_ast, operation_name)
+    if operation is None:
+        return cost
+
+    fragments = {
+        definition.name.value: definition
+        for definition in document_ast.definitions
+        if isinstance(definition, ast.FragmentDefinition)
+    }
+    root_type = {
+        'query': schema.get_query_type,
+        'mutation': schema.get_mutation_type,
+        'subscription': schema.get_subscription_type,
+    }[operation.operation]()
+
+    def visit(selection_set, parent_type, depth, multiplier, pending_size):
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.FragmentSpread):
+                fragment = fragments.get(selection.name.value)
+                if fragment is not None:
+                    fragment_type = schema.get_type(fragment.type_condition.name.value)
+                    visit(fragment.selection_set, fragment_type, depth, multiplier, pending_size)
+                continue
+            if isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = schema.get_type(selection.type_condition.name.value)
+                visit(selection.selection_set, fragment_type, depth, multiplier, pending_size)
+                continue
+
+            name = selection.name.value
+            cost.fields += 1
+            cost.cost += multiplier
+            cost.depth = max(cost.depth, depth)
+
+            fields = getattr(parent_type, 'fields', None) or {}
+            field_def = fields.get(name)
+            if field_def is None or selection.selection_set is None:
+                continue
+
+            field_type, is_list = _unwrap(field_def.type)
+            size = _size_argument(selection, variables)
+            child_multiplier = multiplier
+            child_pending = pending_size
+            if is_list:
+                if size is None:
+                    size = pending_size if pending_size is not None else default_list_size
+                child_multiplier = multiplier * size
+                child_pending = None
+                cost.rows += child_multiplier
+            elif size is not None:
+                child_pending = size
+            else:
+                cost.rows += multiplier
+
+            visit(selection.selection_set, field_type, depth + 1, child_multiplier, child_pending)
+
+    visit(operation.selection_set, root_type, 1, 1, None)
+    return cost
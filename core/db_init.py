@@ -1,4 +1,4 @@
-from .models import db, User, ServerMode
+from .models import db, audit_writer, User, ServerMode
 
 def init_db():
     """Initialize the database, creating tables and default data."""
@@ -63,6 +63,8 @@ def create_test_data():
             burn=paste_data['burn']
         )
 
+    audit_writer.flush()
+
 def setup_db(app, create_test_data=False):
     """Setup database with application context."""
     db.init_app(app)
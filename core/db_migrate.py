@@ -1,10 +1,14 @@
 import os
-import json
 import logging
+import time
 from datetime import datetime, timedelta
+import gevent
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
 from .models import (
-    db, User, ServerMode, Paste, UserSession,
-    LoginAttempt, Audit, PasteVersion
+    db, audit_writer, rate_limiter, server_mode_cache, User, ServerMode, Paste, UserSession,
+    LoginAttempt, Audit, AuditRollup, PasteVersion, MaintenanceCheckpoint,
+    remove_from_search_index, invalidate_cached_responses, search_enabled
 )
 
 # Set up logging
@@ -48,6 +52,7 @@ def create_database():
                 }
             )
         
+        audit_writer.flush()
         logger.info("Database creation completed successfully")
         return True
         
@@ -91,51 +96,335 @@ def setup_database(app, reset=False):
         logger.error(f"Error setting up database: {str(e)}")
         raise
 
-def cleanup_database():
-    """Cleanup old data and reset security-sensitive information."""
+CLEANUP_CHECKPOINT = 'cleanup_database'
+CLEANUP_PHASES = (
+    'sessions', 'pastes', 'audits', 'audit_rollups', 'login_attempts', 'rate_limits', 'server_mode'
+)
+
+def _new_stats():
+    return {'rows': 0, 'chunks': 0, 'lock_seconds': 0.0, 'max_lock_seconds': 0.0}
+
+def _record_chunk(stats, rows, held):
+    stats['rows'] += rows
+    stats['chunks'] += 1
+    stats['lock_seconds'] += held
+    stats['max_lock_seconds'] = max(stats['max_lock_seconds'], held)
+
+def _chunk_phase(name, model, condition, order_column, chunk_size, pause, before_delete=None):
+    """Delete rows matching ``condition`` in index-ordered chunks, one transaction each."""
+    stats = _new_stats()
+    started = time.perf_counter()
+    while True:
+        chunk_started = time.perf_counter()
+        ids = [row[0] for row in db.session.query(model.id).filter(condition).order_by(
+            order_column, model.id
+        ).limit(chunk_size)]
+        if not ids:
+            db.session.rollback()
+            break
+
+        if before_delete:
+            before_delete(ids)
+        db.session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        _save_checkpoint(name)
+        db.session.commit()
+
+        _record_chunk(stats, len(ids), time.perf_counter() - chunk_started)
+        # Let request greenlets in between chunks
+        gevent.sleep(pause)
+
+    return _finish_stats(stats, started)
+
+def _finish_stats(stats, started):
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 4)
+    stats['rows_per_second'] = round(stats['rows'] / elapsed, 1) if elapsed else 0.0
+    stats['lock_seconds'] = round(stats['lock_seconds'], 4)
+    stats['max_lock_seconds'] = round(stats['max_lock_seconds'], 4)
+    return stats
+
+def _load_checkpoint():
+    checkpoint = db.session.get(MaintenanceCheckpoint, CLEANUP_CHECKPOINT)
+    if checkpoint is None:
+        now = datetime.utcnow()
+        checkpoint = MaintenanceCheckpoint(name=CLEANUP_CHECKPOINT, phase=CLEANUP_PHASES[0])
+        checkpoint.set_state({
+            'now': now.isoformat(),
+            'retention_cutoff': (now - timedelta(days=30)).isoformat(),
+        })
+        db.session.add(checkpoint)
+        db.session.commit()
+    else:
+        logger.info(f"Resuming database cleanup at phase '{checkpoint.phase}'")
+    return checkpoint
+
+def _save_checkpoint(phase, **state):
+    checkpoint = db.session.get(MaintenanceCheckpoint, CLEANUP_CHECKPOINT)
+    checkpoint.phase = phase
+    if state:
+        checkpoint.set_state(dict(checkpoint.get_state(), **state))
+
+def _delete_paste_dependents(ids):
+    db.session.query(PasteVersion).filter(PasteVersion.paste_id.in_(ids)).delete(synchronize_session=False)
+    remove_from_search_index(db.session.connection(), 'paste_search', ids)
+
+def cleanup_database(chunk_size=500, pause=0.0):
+    """Cleanup old data and reset security-sensitive information.
+    
+    Each phase deletes in chunks of ``chunk_size`` rows ordered along the
+    expires_at/timestamp indexes, commits per chunk and yields to other
+    greenlets for ``pause`` seconds in between, so no single transaction
+    holds the write lock for long. Progress is checkpointed in
+    maintenance_checkpoints; an interrupted run resumes at the phase it
+    stopped in, with the same cutoffs. Returns per-phase statistics.
+    """
     logger.info("Starting database cleanup...")
+    report = {}
     try:
-        with db.session.begin():
-            # Remove expired sessions
-            deleted = UserSession.query.filter(
-                UserSession.expires_at < datetime.utcnow()
-            ).delete()
-            logger.info(f"Deleted {deleted} expired sessions")
-            
-            # Remove expired pastes
-            deleted = Paste.query.filter(
-                Paste.expires_at < datetime.utcnow()
-            ).delete()
-            logger.info(f"Deleted {deleted} expired pastes")
-            
-            # Remove old audit logs (older than 30 days)
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            deleted = Audit.query.filter(
-                Audit.timestamp < thirty_days_ago
-            ).delete()
-            logger.info(f"Deleted {deleted} old audit logs")
-            
-            # Remove old login attempts
-            deleted = LoginAttempt.query.filter(
-                LoginAttempt.timestamp < thirty_days_ago
-            ).delete()
-            logger.info(f"Deleted {deleted} old login attempts")
-            
-            # Reset rate limiting counters
-            updated = User.query.update({
-                User.request_count: 0,
-                User.last_request: None
-            })
-            logger.info(f"Reset rate limiting for {updated} users")
-            
-            # Reset server mode to 'easy'
-            ServerMode.set_mode('easy')
-            logger.info("Reset server mode to 'easy'")
-            
-            logger.info("Database cleanup completed successfully")
-            return True
+        checkpoint = _load_checkpoint()
+        state = checkpoint.get_state()
+        now = datetime.fromisoformat(state['now'])
+        retention_cutoff = datetime.fromisoformat(state['retention_cutoff'])
+        phases = CLEANUP_PHASES[CLEANUP_PHASES.index(checkpoint.phase):]
+
+        for phase in phases:
+            _save_checkpoint(phase)
+            db.session.commit()
+
+            if phase == 'sessions':
+                report[phase] = _chunk_phase(
+                    phase, UserSession, UserSession.expires_at < now,
+                    UserSession.expires_at, chunk_size, pause
+                )
+                logger.info(f"Deleted {report[phase]['rows']} expired sessions")
+            elif phase == 'pastes':
+                report[phase] = _chunk_phase(
+                    phase, Paste, Paste.expires_at < now,
+                    Paste.expires_at, chunk_size, pause,
+                    before_delete=_delete_paste_dependents
+                )
+                logger.info(f"Deleted {report[phase]['rows']} expired pastes")
+            elif phase == 'audits':
+                report[phase] = _chunk_phase(
+                    phase, Audit, Audit.timestamp < retention_cutoff,
+                    Audit.timestamp, chunk_size, pause
+                )
+                logger.info(f"Deleted {report[phase]['rows']} old audit logs")
+            elif phase == 'audit_rollups':
+                # Hourly rollups are kept; they outlive the raw audits
+                report[phase] = _chunk_phase(
+                    phase, AuditRollup,
+                    (AuditRollup.period == 'minute') & (AuditRollup.bucket < retention_cutoff),
+                    AuditRollup.bucket, chunk_size, pause
+                )
+                logger.info(f"Deleted {report[phase]['rows']} old minute audit rollups")
+            elif phase == 'login_attempts':
+                report[phase] = _chunk_phase(
+                    phase, LoginAttempt, LoginAttempt.timestamp < retention_cutoff,
+                    LoginAttempt.timestamp, chunk_size, pause
+                )
+                logger.info(f"Deleted {report[phase]['rows']} old login attempts")
+            elif phase == 'rate_limits':
+                # Zeroes the stored counts and clears every worker's buckets
+                rate_limiter.reset()
+                logger.info("Reset rate limiting counters")
+            elif phase == 'server_mode':
+                ServerMode.set_mode('easy')
+                logger.info("Reset server mode to 'easy'")
+
+            if phase in report:
+                stats = report[phase]
+                logger.info(
+                    f"Cleanup phase {phase}: {stats['rows_per_second']} rows/s, "
+                    f"lock held {stats['lock_seconds']}s (max {stats['max_lock_seconds']}s per chunk)"
+                )
+
+        db.session.delete(db.session.get(MaintenanceCheckpoint, CLEANUP_CHECKPOINT))
+        db.session.commit()
+        logger.info("Database cleanup completed successfully")
+        return report
             
     except Exception as e:
         logger.error(f"Error during database cleanup: {str(e)}")
         db.session.rollback()
-        raise 
\ No newline at end of file
+        raise
+    finally:
+        server_mode_cache.invalidate()
+        # Chunked deletes bypass the ORM listeners that invalidate precisely
+        invalidate_cached_responses()
+
+class CleanupJob:
+    """Run cleanup_database periodically on a background greenlet."""
+
+    def __init__(self, interval=3600, chunk_size=500, pause=0.0):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.app = None
+        self.last_report = None
+        self._greenlet = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('CLEANUP_INTERVAL', self.interval)
+        self.chunk_size = app.config.get('CLEANUP_CHUNK_SIZE', self.chunk_size)
+        self.pause = app.config.get('CLEANUP_PAUSE', self.pause)
+        app.extensions['cleanup_job'] = self
+
+    def start(self):
+        if self.interval and (self._greenlet is None or self._greenlet.dead):
+            self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+
+    def _run(self):
+        while True:
+            gevent.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    self.last_report = cleanup_database(self.chunk_size, self.pause)
+            except Exception:
+                logger.exception("Scheduled database cleanup failed")
+
+def add_column(table, column):
+    """ALTER TABLE ... ADD COLUMN, with the column rendered for the current dialect."""
+    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+    db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+
+def _search_index_missing():
+    """True when the FTS tables were just created over existing pastes or users."""
+    connection = db.session.connection()
+    if not search_enabled(connection):
+        return False
+    for index, table in (('paste_search', 'pastes'), ('user_search', 'users')):
+        indexed = connection.execute(text(f'SELECT 1 FROM {index} LIMIT 1')).first()
+        stored = connection.execute(text(f'SELECT 1 FROM {table} LIMIT 1')).first()
+        if stored and not indexed:
+            return True
+    return False
+
+def upgrade_database():
+    """Bring a database created by an earlier version up to the current schema.
+    
+    db.create_all() creates missing tables but never alters existing ones;
+    this also adds the columns introduced since and converts the data they
+    hold. Every step checks the live schema first, so it is safe to run on
+    each startup.
+    """
+    try:
+        db.create_all()
+        inspector = inspect(db.engine)
+        server_mode_columns = {column['name'] for column in inspector.get_columns('server_mode')}
+        version_columns = {column['name'] for column in inspector.get_columns('paste_versions')}
+
+        if 'config_version' not in server_mode_columns:
+            logger.info("Adding server_mode.config_version...")
+            add_column(ServerMode.__table__, ServerMode.__table__.c.config_version)
+        db.session.commit()
+
+        if 'delta' not in version_columns:
+            migrate_paste_versions()
+
+        if _search_index_missing():
+            from .search import rebuild_search_index
+            logger.info("Building the search index...")
+            rebuild_search_index()
+
+    except Exception as e:
+        logger.error(f"Error upgrading database: {str(e)}")
+        db.session.rollback()
+        raise
+
+def migrate_paste_versions(interval=None):
+    """Convert full-text paste_versions rows to snapshot + delta storage."""
+    from .versions import apply_delta, is_snapshot_version, make_delta, snapshot_interval
+
+    interval = interval or snapshot_interval()
+    logger.info(f"Migrating paste versions (snapshot every {interval} versions)...")
+    try:
+        columns = {column['name'] for column in inspect(db.engine).get_columns('paste_versions')}
+        for name in ('delta', 'is_snapshot'):
+            if name not in columns:
+                add_column(PasteVersion.__table__, PasteVersion.__table__.c[name])
+        db.session.commit()
+
+        paste_ids = [row[0] for row in db.session.query(PasteVersion.paste_id).distinct()]
+        converted = 0
+        for paste_id in paste_ids:
+            rows = PasteVersion.query.filter_by(paste_id=paste_id).order_by(PasteVersion.version).all()
+            previous = None
+            for row in rows:
+                if not row.is_snapshot:
+                    # Already converted by an earlier run
+                    content = apply_delta(previous, row.delta)
+                else:
+                    content = row.content
+                    if previous is not None and not is_snapshot_version(row.version, interval):
+                        row.delta = make_delta(previous, content)
+                        row.content = ''
+                        row.is_snapshot = False
+                        converted += 1
+                previous = content
+            # One paste per transaction keeps each write lock short
+            db.session.commit()
+
+        logger.info(f"Converted {converted} paste versions to deltas")
+        return converted
+
+    except Exception as e:
+        logger.error(f"Error migrating paste versions: {str(e)}")
+        db.session.rollback()
+        raise
+
+def backfill_audit_rollups(since=None, chunk_size=5000):
+    """Rebuild the audit rollups from the audits table.
+    
+    Rollups from the hour of ``since`` on (default: the oldest audit) are
+    deleted and recounted in id-ordered chunks, one transaction each.
+    Audits written while this runs are counted by the normal write path,
+    since they get ids above the last one counted here. Earlier hourly
+    rollups, whose raw audits may already have been cleaned up, are kept.
+    """
+    from .rollups import bucket_start
+
+    logger.info("Backfilling audit rollups...")
+    try:
+        since = since or db.session.query(func.min(Audit.timestamp)).scalar()
+        if since is None:
+            logger.info("No audits to roll up")
+            return 0
+        start = bucket_start(since, 'hour')
+        db.session.query(AuditRollup).filter(AuditRollup.bucket >= start).delete(synchronize_session=False)
+        last_id = db.session.query(func.max(Audit.id)).scalar() or 0
+        db.session.commit()
+
+        columns = [column for column in Audit.__table__.c if column.name in (
+            'timestamp', 'action', 'operation_type', 'security_level', 'user_id'
+        )]
+        counted, after = 0, 0
+        while after < last_id:
+            rows = [dict(row._mapping) for row in db.session.execute(
+                select(Audit.__table__.c.id, *columns).where(
+                    Audit.__table__.c.id > after,
+                    Audit.__table__.c.id <= last_id,
+                    Audit.__table__.c.timestamp >= start
+                ).order_by(Audit.__table__.c.id).limit(chunk_size)
+            )]
+            if not rows:
+                break
+            AuditRollup.record(db.session.connection(), rows)
+            db.session.commit()
+            counted += len(rows)
+            after = rows[-1]['id']
+            gevent.sleep(0)
+
+        logger.info(f"Rolled up {counted} audits from {start.isoformat()}")
+        return counted
+
+    except Exception as e:
+        logger.error(f"Error backfilling audit rollups: {str(e)}")
+        db.session.rollback()
+        raise
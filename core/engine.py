@@ -0,0 +1,125 @@
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_file_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(uri, pool_size=10, max_overflow=20, pool_timeout=10):
+    """SQLALCHEMY_ENGINE_OPTIONS sized for many greenlets sharing one process."""
+    if is_sqlite(uri) and not is_file_sqlite(uri):
+        # In-memory databases keep Flask-SQLAlchemy's single shared connection
+        return {}
+    options = {
+        'poolclass': QueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+    }
+    if is_sqlite(uri):
+        # Pooled connections are returned from other threads, e.g. at exit
+        options['connect_args'] = {'check_same_thread': False}
+    return options
+
+
+def apply_sqlite_pragmas(engine, journal_mode='WAL', synchronous='NORMAL',
+                         mmap_size=268435456, busy_timeout=5000, read_only=False):
+    """Set per-connection SQLite pragmas whenever the pool opens a connection.
+
+    WAL lets readers proceed while a writer holds the lock, NORMAL
+    synchronous skips the fsync on every commit (still safe with WAL), and
+    mmap_size serves reads from memory-mapped pages.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if journal_mode and not read_only:
+                cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            if synchronous:
+                cursor.execute(f'PRAGMA synchronous={synchronous}')
+            if mmap_size:
+                cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+            if busy_timeout:
+                cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+            if read_only:
+                cursor.execute('PRAGMA query_only=ON')
+        finally:
+            cursor.close()
+
+
+def read_only_uri(uri):
+    """Read-only variant of a file-backed SQLite URI; other URIs are unchanged."""
+    if not is_file_sqlite(uri):
+        return uri
+    database = make_url(uri).database
+    return f'sqlite:///file:{database}?mode=ro&uri=true'
+
+
+class ReadRouter:
+    """Session factory for read-only resolvers.
+
+    When enabled, reads go through their own engine and connection pool
+    (opened read-only on SQLite) so they never wait for a pooled connection
+    behind writers. When disabled, ``session`` is simply ``db.session``.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.engine = None
+        self._session = None
+
+    def init_app(self, app):
+        uri = app.config.get('SQLALCHEMY_READ_DATABASE_URI')
+        if not uri and app.config.get('SQLALCHEMY_READ_ROUTING'):
+            with app.app_context():
+                # Flask-SQLAlchemy resolves relative SQLite paths; use its URL
+                uri = read_only_uri(self.db.engine.url.render_as_string(hide_password=False))
+        if not uri:
+            return
+        options = engine_options(
+            uri,
+            pool_size=app.config.get('SQLALCHEMY_READ_POOL_SIZE', 20),
+            max_overflow=app.config.get('SQLALCHEMY_READ_MAX_OVERFLOW', 20)
+        )
+        self.engine = create_engine(uri, **options)
+        apply_sqlite_pragmas(
+            self.engine,
+            synchronous=None,
+            mmap_size=app.config.get('SQLITE_MMAP_SIZE', 268435456),
+            read_only=True
+        )
+        self._session = scoped_session(
+            sessionmaker(bind=self.engine),
+            scopefunc=lambda: id(app_ctx._get_current_object())
+        )
+        app.teardown_appcontext(self.remove)
+        app.extensions['read_router'] = self
+
+    def remove(self, exc=None):
+        """Close the current scope's read session, if routing is enabled."""
+        if self._session is not None:
+            self._session.remove()
+
+    @property
+    def enabled(self):
+        return self._session is not None
+
+    @property
+    def session(self):
+        return self._session if self._session is not None else self.db.session
+
+    def query(self, *entities):
+        return self.session.query(*entities)
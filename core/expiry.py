@@ -0,0 +1,251 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import gevent
+from gevent.event import Event
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from .bus import event_bus
+from .models import (
+    db, Paste, PasteVersion, UserSession, invalidate_cached_responses, remove_from_search_index
+)
+from .response_cache import tags_for_change
+from .versions import forget_pastes
+
+logger = logging.getLogger(__name__)
+
+EXPIRING_MODELS = {
+    'pastes': Paste,
+    'sessions': UserSession,
+}
+
+
+class ExpiryScheduler:
+    """Delete pastes and sessions shortly after their ``expires_at``.
+
+    Deadlines are kept in a min-heap that holds only the next ``horizon``
+    seconds; it is filled lazily from the expires_at indexes (at most
+    ``max_queued`` rows per model at a time) and topped up as the window
+    moves. Rows written with an expiry inside the window are pushed
+    directly, also from other worker processes via the event bus. A
+    background greenlet sleeps until the earliest deadline and deletes
+    what is due in batches of ``batch_size``, one transaction each.
+
+    Deletes re-check expires_at, so a stale or duplicate entry for a row
+    whose expiry was extended or that is already gone does nothing. Reads
+    do not rely on this job: resolvers filter with Paste.not_expired().
+    """
+
+    def __init__(self, horizon=300, batch_size=200, max_queued=10000):
+        self.app = None
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.expired = {kind: 0 for kind in EXPIRING_MODELS}
+        self._heap = []
+        self._queued = set()
+        self._loaded_until = {}
+        self._lock = threading.Lock()
+        self._wakeup = Event()
+        self._greenlet = None
+
+    def init_app(self, app):
+        self.app = app
+        self.horizon = app.config.get('EXPIRY_HORIZON', self.horizon)
+        self.batch_size = app.config.get('EXPIRY_BATCH_SIZE', self.batch_size)
+        self.max_queued = app.config.get('EXPIRY_MAX_QUEUED', self.max_queued)
+        app.extensions['expiry_scheduler'] = self
+
+    @property
+    def running(self):
+        return self._greenlet is not None and not self._greenlet.dead
+
+    @property
+    def queued(self):
+        return len(self._heap)
+
+    def start(self):
+        if self.horizon and not self.running:
+            self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        with self._lock:
+            self._heap, self._queued, self._loaded_until = [], set(), {}
+
+    def schedule(self, kind, id, expires_at):
+        """Queue a row whose expires_at falls inside the loaded window."""
+        if not self.running or expires_at is None:
+            return
+        with self._lock:
+            loaded_until = self._loaded_until.get(kind)
+            if loaded_until is None or expires_at >= loaded_until or (kind, id) in self._queued:
+                # The next refill picks it up
+                return
+            heapq.heappush(self._heap, (expires_at, kind, id))
+            self._queued.add((kind, id))
+            earliest = self._heap[0][2] == id and self._heap[0][1] == kind
+        if earliest:
+            self._wakeup.set()
+
+    def refill(self, kind, now):
+        """Load upcoming deadlines for ``kind`` along its expires_at index."""
+        model = EXPIRING_MODELS[kind]
+        until = now + timedelta(seconds=self.horizon)
+        statement = select(model.id, model.expires_at).where(
+            model.expires_at.isnot(None), model.expires_at < until
+        )
+        loaded_until = self._loaded_until.get(kind)
+        if loaded_until is not None:
+            statement = statement.where(model.expires_at >= loaded_until)
+        rows = db.session.execute(
+            statement.order_by(model.expires_at).limit(self.max_queued)
+        ).all()
+        db.session.rollback()
+
+        with self._lock:
+            for id, expires_at in rows:
+                if (kind, id) not in self._queued:
+                    heapq.heappush(self._heap, (expires_at, kind, id))
+                    self._queued.add((kind, id))
+            # A full batch may have stopped inside a run of equal deadlines;
+            # the next refill starts at (and re-reads) the last one
+            self._loaded_until[kind] = rows[-1][1] if len(rows) == self.max_queued else until
+        return len(rows)
+
+    def run_pending(self, now=None):
+        """Refill the heap where needed and delete everything that is due."""
+        now = now or datetime.utcnow()
+        for kind in EXPIRING_MODELS:
+            loaded_until = self._loaded_until.get(kind)
+            if loaded_until is None or loaded_until <= now + timedelta(seconds=self.horizon / 2):
+                self.refill(kind, now)
+
+        expired = 0
+        while True:
+            due = []
+            with self._lock:
+                while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                    _, kind, id = heapq.heappop(self._heap)
+                    self._queued.discard((kind, id))
+                    due.append((kind, id))
+            if not due:
+                return expired
+            for kind in EXPIRING_MODELS:
+                ids = [id for (entry_kind, id) in due if entry_kind == kind]
+                if ids:
+                    expired += self.expire(kind, ids, now)
+            # Let request greenlets in between batches
+            gevent.sleep(0)
+
+    def expire(self, kind, ids, now):
+        """Delete rows of ``kind`` among ``ids`` that expired by ``now``."""
+        model = EXPIRING_MODELS[kind]
+        table = model.__table__
+        expired = (table.c.id.in_(ids), table.c.expires_at <= now)
+        with db.engine.begin() as connection:
+            if kind == 'pastes':
+                rows = connection.execute(
+                    select(table.c.id, table.c.user_id, table.c.owner_id).where(*expired)
+                ).all()
+                ids = [row.id for row in rows]
+                if ids:
+                    connection.execute(
+                        PasteVersion.__table__.delete().where(PasteVersion.__table__.c.paste_id.in_(ids))
+                    )
+                    remove_from_search_index(connection, 'paste_search', ids)
+                    connection.execute(table.delete().where(table.c.id.in_(ids)))
+                count = len(ids)
+            else:
+                rows = ()
+                count = connection.execute(table.delete().where(*expired)).rowcount
+
+        if rows:
+            tags = set()
+            for row in rows:
+                tags |= tags_for_change(table.name, row.id, (row.user_id, row.owner_id))
+            invalidate_cached_responses(tags)
+            forget_pastes(ids)
+        self.expired[kind] += count
+        return count
+
+    def _seconds_until_next(self):
+        now = datetime.utcnow()
+        wake = now + timedelta(seconds=self.horizon / 2)
+        with self._lock:
+            if self._heap:
+                wake = min(wake, self._heap[0][0])
+        return max(0.0, (wake - now).total_seconds())
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.run_pending()
+            except Exception:
+                logger.exception("Expiry run failed")
+                # Entries popped by the failed batch are reloaded from the indexes
+                with self._lock:
+                    self._loaded_until.clear()
+            self._wakeup.wait(timeout=self._seconds_until_next())
+            self._wakeup.clear()
+
+
+expiry_scheduler = ExpiryScheduler()
+
+
+def _queue_expiry(kind, target, changed_only=False):
+    if target.expires_at is None:
+        return
+    if changed_only and not inspect(target).attrs.expires_at.history.has_changes():
+        return
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('expiry_schedule', []).append((kind, target.id, target.expires_at))
+
+
+@db.event.listens_for(Paste, 'after_insert')
+def paste_expiry_insert_listener(mapper, connection, target):
+    _queue_expiry('pastes', target)
+
+
+@db.event.listens_for(Paste, 'after_update')
+def paste_expiry_update_listener(mapper, connection, target):
+    _queue_expiry('pastes', target, changed_only=True)
+
+
+@db.event.listens_for(UserSession, 'after_insert')
+def session_expiry_insert_listener(mapper, connection, target):
+    _queue_expiry('sessions', target)
+
+
+@db.event.listens_for(UserSession, 'after_update')
+def session_expiry_update_listener(mapper, connection, target):
+    _queue_expiry('sessions', target, changed_only=True)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def schedule_committed_expiries(session):
+    # Scheduled only once committed, so the job never waits on the writer's lock
+    for kind, id, expires_at in session.info.pop('expiry_schedule', ()):
+        expiry_scheduler.schedule(kind, id, expires_at)
+        event_bus.publish('expiry', kind=kind, id=id, expires_at=expires_at.isoformat())
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def discard_rolled_back_expiries(session):
+    session.info.pop('expiry_schedule', None)
+
+
+def _remote_expiry(message):
+    expiry_scheduler.schedule(
+        message['kind'], message['id'], datetime.fromisoformat(message['expires_at'])
+    )
+
+
+event_bus.subscribe('expiry', _remote_expiry)
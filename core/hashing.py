@@ -0,0 +1,73 @@
+from gevent.lock import BoundedSemaphore
+from gevent.threadpool import ThreadPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Run werkzeug password hashing on native threads.
+
+    The calling greenlet waits cooperatively on a gevent ThreadPool, so the
+    hub keeps serving other connections while a hash is computed. At most
+    ``max_workers`` hashes run at once; up to ``max_pending`` further
+    callers queue, and anything beyond that fails fast with
+    PasswordHasherBusy instead of piling up.
+    """
+
+    def __init__(self, max_workers=2, max_pending=64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.completed = 0
+        self.rejected = 0
+        self._pool = None
+        self._slots = None
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS', self.max_workers)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self._pool = None
+        app.extensions['password_hasher'] = self
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPool(self.max_workers)
+            self._slots = BoundedSemaphore(self.max_workers + self.max_pending)
+        return self._pool
+
+    @property
+    def active(self):
+        """Hashes currently running on a worker thread."""
+        if self._pool is None:
+            return 0
+        return min(len(self._pool), self.max_workers)
+
+    @property
+    def queue_depth(self):
+        """Callers waiting for a free worker thread."""
+        if self._pool is None:
+            return 0
+        return max(0, len(self._pool) - self.max_workers)
+
+    def _run(self, function, *args):
+        pool = self.pool
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy('Too many pending password operations')
+        try:
+            return pool.apply(function, args)
+        finally:
+            self._slots.release()
+            self.completed += 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,60 @@
+from collections import defaultdict
+from flask import g
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from .models import User, Paste, read_router
+
+
+class UserLoader(DataLoader):
+    """Batch User lookups by primary key into a single IN (...) query."""
+
+    def batch_load_fn(self, keys):
+        users = {user.id: user for user in read_router.query(User).filter(User.id.in_(keys))}
+        return Promise.resolve([users.get(key) for key in keys])
+
+
+class PasteListLoader(DataLoader):
+    """Batch one-to-many Paste lookups keyed on a foreign key column."""
+
+    # A name, not the attribute itself: mapped attributes are descriptors and
+    # would be bound to the loader instance on lookup
+    column_name = None
+
+    def batch_load_fn(self, keys):
+        grouped = defaultdict(list)
+        column = getattr(Paste, self.column_name)
+        query = read_router.query(Paste).filter(
+            column.in_(keys), Paste.not_expired()
+        ).order_by(Paste.id)
+        for paste in query:
+            grouped[getattr(paste, self.column_name)].append(paste)
+        return Promise.resolve([grouped.get(key, []) for key in keys])
+
+
+class PastesByUserLoader(PasteListLoader):
+    column_name = 'user_id'
+
+
+class PastesByOwnerLoader(PasteListLoader):
+    column_name = 'owner_id'
+
+
+class Loaders:
+    """Per-request set of loaders; each caches what it has already fetched."""
+
+    def __init__(self):
+        self.users = UserLoader()
+        self.pastes_by_user = PastesByUserLoader()
+        self.pastes_by_owner = PastesByOwnerLoader()
+
+
+def get_loaders():
+    """Return the loaders for the current request, creating them on first use.
+
+    The operations of a batch share them, and the request's session.
+    """
+    loaders = g.get('dataloaders')
+    if loaders is None:
+        loaders = g.dataloaders = Loaders()
+    return loaders
@@ -0,0 +1,231 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from functools import partial
+from promise import Promise, is_thenable
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Gauge:
+    """Value read from a callable at scrape time.
+
+    ``metric_type`` may be set to ``counter`` for monotonic totals that are
+    kept elsewhere, such as cache hit counts.
+    """
+
+    def __init__(self, name, documentation, function, metric_type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.metric_type = metric_type
+
+    def render(self):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+            f'{self.name} {self.function()}',
+        ]
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labels + ('le',), label_values + (le,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, function, metric_type='gauge'):
+        return self.register(Gauge(name, documentation, function, metric_type))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+resolver_seconds = registry.histogram(
+    'dvga_graphql_resolver_seconds', 'Resolver latency per field (sampled).', ('field',)
+)
+resolver_errors = registry.counter(
+    'dvga_graphql_resolver_errors_total', 'Resolver exceptions per field.', ('field',)
+)
+operation_seconds = registry.histogram(
+    'dvga_graphql_operation_seconds', 'Total execution latency per operation.', ('operation',)
+)
+operation_errors = registry.counter(
+    'dvga_graphql_operation_errors_total', 'Operations that returned errors.', ('operation',)
+)
+sql_seconds = registry.histogram(
+    'dvga_sql_statement_seconds', 'SQL statement latency by statement type.', ('statement',)
+)
+
+
+class MetricsMiddleware:
+    """Graphene middleware that samples per-field resolver latency.
+
+    Fields without a resolver of their own (plain attribute lookups) are
+    never timed. Other fields are timed for a ``sample_rate`` fraction of
+    calls; ``field_sample_rates`` overrides it for individual
+    ``Type.field`` names, including attribute fields. Resolvers returning
+    a promise (DataLoader fields) are timed until it settles. Errors,
+    raised or rejected, are counted for every call regardless of sampling.
+    """
+
+    def __init__(self, sample_rate=0.1, field_sample_rates=None):
+        self.sample_rate = sample_rate
+        self.field_sample_rates = field_sample_rates or {}
+        self._default_rates = {}
+
+    def init_app(self, app):
+        self.sample_rate = app.config.get('METRICS_SAMPLE_RATE', self.sample_rate)
+        self.field_sample_rates = app.config.get('METRICS_FIELD_SAMPLE_RATES', self.field_sample_rates)
+        self._default_rates = {}
+
+    def _rate(self, field, info):
+        rate = self.field_sample_rates.get(field)
+        if rate is None:
+            rate = self._default_rates.get(field)
+            if rate is None:
+                resolver = info.parent_type.fields[info.field_name].resolver
+                trivial = resolver is None or isinstance(resolver, partial)
+                rate = self._default_rates[field] = 0.0 if trivial else self.sample_rate
+        return rate
+
+    def resolve(self, next, root, info, **args):
+        field = f'{info.parent_type.name}.{info.field_name}'
+        rate = self._rate(field, info)
+        timed = rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+        started = time.perf_counter() if timed else None
+        try:
+            result = next(root, info, **args)
+        except Exception:
+            resolver_errors.inc(field)
+            if timed:
+                resolver_seconds.observe(time.perf_counter() - started, field)
+            raise
+        if is_thenable(result):
+            return Promise.resolve(result).then(
+                partial(self._settled, field, started),
+                partial(self._rejected, field, started)
+            )
+        if timed:
+            resolver_seconds.observe(time.perf_counter() - started, field)
+        return result
+
+    def _settled(self, field, started, value):
+        if started is not None:
+            resolver_seconds.observe(time.perf_counter() - started, field)
+        return value
+
+    def _rejected(self, field, started, error):
+        resolver_errors.inc(field)
+        self._settled(field, started, None)
+        raise error
+
+
+def instrument_engine(engine):
+    """Record the count and latency of every statement run on ``engine``."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['metrics_query_start'].pop()
+        sql_seconds.observe(time.perf_counter() - started, _statement_type(statement))
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('metrics_query_start'):
+            connection.info['metrics_query_start'].pop()
+
+
+def _statement_type(statement):
+    words = statement.split(None, 1)
+    return words[0].upper() if words else 'OTHER'
@@ -1,11 +1,25 @@
 from datetime import datetime, timedelta
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import relationship
+from sqlalchemy import and_, inspect, or_, text
+from sqlalchemy.orm import Session, object_session, relationship
 from sqlalchemy.sql import func
-from werkzeug.security import generate_password_hash, check_password_hash
 import json
+import threading
+import time
+from .audit import AuditWriter
+from .bus import event_bus
+from .hashing import password_hasher
+from .ratelimit import RateLimiter
+from .engine import ReadRouter
+from .response_cache import response_cache, tags_for_change
+from .rollups import (
+    DIMENSIONS, EMPTY, PERIODS, bucket_start, covering_ranges, rollup_counts, upsert_counts
+)
 
 db = SQLAlchemy()
+audit_writer = AuditWriter(db)
+rate_limiter = RateLimiter(db)
+read_router = ReadRouter(db)
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -23,12 +37,12 @@ class User(db.Model):
     reset_token = db.Column(db.String(100), unique=True)
     reset_token_expires = db.Column(db.DateTime)
     
-    # Rate limiting
+    # Rate limiting (written back periodically by rate_limiter)
     last_request = db.Column(db.DateTime)
     request_count = db.Column(db.Integer, default=0)
     
     # Relationships
-    pastes = relationship('Paste', back_populates='user', lazy='dynamic')
+    pastes = relationship('Paste', back_populates='user', foreign_keys='Paste.user_id', lazy='dynamic')
     owned_pastes = relationship('Paste', back_populates='owner', foreign_keys='Paste.owner_id', lazy='dynamic')
     sessions = relationship('UserSession', back_populates='user', lazy='dynamic')
     
@@ -43,15 +57,17 @@ class User(db.Model):
     
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # Hashing runs on a native thread so it does not block the gevent hub
+        self.password_hash = password_hasher.hash(password)
     
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     @classmethod
     def create_user(cls, username, password, is_admin=False):
-        user = cls(username=username, is_admin=is_admin)
-        user.password = password
+        # Hash before the session checks out a connection, so none is held while waiting
+        password_hash = password_hasher.hash(password)
+        user = cls(username=username, is_admin=is_admin, password_hash=password_hash)
         db.session.add(user)
         db.session.commit()
         return user
@@ -125,6 +141,11 @@ class Paste(db.Model):
         db.Index('idx_paste_expiry', 'expires_at'),
     )
     
+    @classmethod
+    def not_expired(cls, now=None):
+        """Filter clause for pastes that have no expiry or have not reached it."""
+        return or_(cls.expires_at.is_(None), cls.expires_at > (now or datetime.utcnow()))
+
     def set_metadata(self, data):
         """Store additional metadata as JSON"""
         self.paste_metadata = json.dumps(data)
@@ -157,7 +178,8 @@ class Paste(db.Model):
         version = PasteVersion(
             paste=paste,
             content=content,
-            version=1
+            version=1,
+            is_snapshot=True
         )
         
         db.session.add(paste)
@@ -169,17 +191,139 @@ class Paste(db.Model):
         
         return paste
 
+    @classmethod
+    def create_pastes(cls, items, user_id=None):
+        """Create many pastes with their first versions and audits in one transaction.
+        
+        ``items`` are dicts with the keyword arguments of create_paste. Pastes
+        are inserted with one flush (batched INSERTs), versions, audits and
+        search index rows with executemany, and everything commits once.
+        """
+        pastes = []
+        for item in items:
+            content = item['content']
+            paste = cls(
+                title=item['title'],
+                content=content,
+                user_id=user_id,
+                owner_id=user_id,
+                public=item.get('public', True),
+                burn=item.get('burn', False),
+                language=item.get('language'),
+                size=len(content.encode('utf-8')),
+                file_path=item.get('file_path'),
+                expires_at=item.get('expires_at'),
+                version=1
+            )
+            if item.get('metadata'):
+                paste.set_metadata(item['metadata'])
+            # Indexed below in one statement rather than per row by the listener
+            paste._bulk_indexed = True
+            pastes.append(paste)
+
+        if not pastes:
+            return pastes
+
+        try:
+            db.session.add_all(pastes)
+            db.session.flush()
+            index_pastes(db.session.connection(), pastes)
+
+            now = datetime.utcnow()
+            db.session.execute(PasteVersion.__table__.insert(), [
+                {'paste_id': paste.id, 'content': paste.content, 'version': 1,
+                 'is_snapshot': True, 'created_at': now}
+                for paste in pastes
+            ])
+            Audit.insert_many(db.session.connection(), [
+                {'paste_id': paste.id, 'user_id': user_id, 'action': 'create',
+                 'ip_address': None, 'timestamp': now}
+                for paste in pastes
+            ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return pastes
+
+    @classmethod
+    def read_and_burn(cls, paste_id, user_id=None, ip_address=None):
+        """Return a burn-after-read paste and delete it, or None.
+
+        Runs in its own transaction. Where the dialect supports DELETE ...
+        RETURNING the row is removed and returned by one conditional
+        statement. Elsewhere the transaction first claims the row with a
+        conditional no-op UPDATE (taking the write lock before anything is
+        read), then reads and deletes it. Either way exactly one of any
+        number of concurrent readers gets the content. ORM cascades and
+        listeners are bypassed, so the same transaction does their work:
+        it deletes the paste's versions, audits and search entry and writes
+        the 'burn' audit and the 'delete' audit that
+        paste_delete_listener would have queued.
+        """
+        table = cls.__table__
+        burnable = (table.c.id == paste_id, table.c.burn.is_(True), cls.not_expired())
+        with db.engine.begin() as connection:
+            if getattr(connection.dialect, 'delete_returning', False):
+                row = connection.execute(
+                    table.delete().where(*burnable).returning(*table.c)
+                ).mappings().first()
+            else:
+                row = None
+                if connection.execute(table.update().where(*burnable).values(burn=True)).rowcount == 1:
+                    row = connection.execute(table.select().where(*burnable)).mappings().first()
+                    connection.execute(table.delete().where(*burnable))
+            if row is None:
+                return None
+
+            for child in (PasteVersion.__table__, Audit.__table__):
+                connection.execute(child.delete().where(child.c.paste_id == paste_id))
+            now = datetime.utcnow()
+            # paste_id would reference the deleted row
+            Audit.insert_many(connection, [
+                {'paste_id': None, 'user_id': user_id, 'action': 'burn',
+                 'ip_address': ip_address, 'timestamp': now},
+                {'paste_id': None, 'user_id': row['user_id'], 'action': 'delete',
+                 'ip_address': None, 'timestamp': now},
+            ])
+            remove_from_search_index(connection, 'paste_search', [paste_id])
+
+        invalidate_cached_responses(tags_for_change(table.name, paste_id, (row['user_id'], row['owner_id'])))
+        from .versions import forget_pastes
+        forget_pastes([paste_id])
+        # A detached copy for the resolvers; the row no longer exists
+        return cls(**dict(row))
+
 class PasteVersion(db.Model):
-    """Track paste version history"""
+    """Track paste version history
+    
+    Every few versions store the full text (``is_snapshot``); the rows in
+    between hold a compressed line diff against the previous version in
+    ``delta`` and an empty ``content``. See core.versions.
+    """
     __tablename__ = 'paste_versions'
     
     id = db.Column(db.Integer, primary_key=True)
     paste_id = db.Column(db.Integer, db.ForeignKey('pastes.id', ondelete='CASCADE'), index=True)
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(db.Text, nullable=False, default='')
+    delta = db.Column(db.LargeBinary)
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     version = db.Column(db.Integer, nullable=False)
     
     paste = relationship('Paste', back_populates='versions')
+    
+    __table_args__ = (
+        db.Index('idx_paste_version_number', 'paste_id', 'version'),
+    )
+    
+    def get_content(self):
+        """Return the full text of this version, rebuilding it from deltas if needed."""
+        if self.is_snapshot:
+            return self.content
+        from .versions import get_version_content
+        return get_version_content(self.paste_id, self.version)
 
 class Audit(db.Model):
     __tablename__ = 'audits'
@@ -210,15 +354,93 @@ class Audit(db.Model):
     
     @classmethod
     def log_action(cls, paste_id, user_id, action, ip_address=None):
-        audit = cls(
+        """Queue an audit record; audit_writer persists it in a later batch."""
+        audit_writer.enqueue(
+            cls.__table__,
             paste_id=paste_id,
             user_id=user_id,
             action=action,
-            ip_address=ip_address
+            ip_address=ip_address,
+            timestamp=datetime.utcnow()
         )
-        db.session.add(audit)
-        db.session.commit()
-        return audit
+
+    @classmethod
+    def insert_many(cls, connection, rows):
+        """Insert audit rows with executemany and count them in the rollups."""
+        connection.execute(cls.__table__.insert(), rows)
+        AuditRollup.record(connection, rows)
+
+class AuditRollup(db.Model):
+    """Per-minute and per-hour audit counts, maintained as audits are written"""
+    __tablename__ = 'audit_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(10), nullable=False)  # minute, hour
+    bucket = db.Column(db.DateTime, nullable=False)  # start of the minute or hour
+    action = db.Column(db.String(50), nullable=False, default='')
+    operation_type = db.Column(db.String(20), nullable=False, default='')
+    security_level = db.Column(db.String(20), nullable=False, default='')
+    user_id = db.Column(db.Integer, nullable=False, default=0)  # 0: no user
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint(
+            'period', 'bucket', 'action', 'operation_type', 'security_level', 'user_id',
+            name='uq_audit_rollup_bucket'
+        ),
+        db.Index('idx_audit_rollup_user', 'period', 'user_id', 'bucket'),
+    )
+    
+    @classmethod
+    def record(cls, connection, rows):
+        """Add audit row dicts to the rollups on the writing connection."""
+        return upsert_counts(connection, cls.__table__, rollup_counts(rows))
+
+    @classmethod
+    def summary(cls, since=None, until=None, group_by=('action',), period=None, **filters):
+        """Audit counts in [since, until) (default: the last 30 days).
+        
+        With ``period`` ('minute' or 'hour') there is one row per bucket;
+        without, counts are totalled over the range, reading whole hours
+        from the hourly rollup and only the partial hours at the edges from
+        the minute rollup. ``filters`` restrict dimensions, e.g.
+        action='login'. Returns dicts; missing dimension values are None.
+        """
+        unknown = (set(group_by) | set(filters)) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown audit dimension(s): {', '.join(sorted(unknown))}")
+        if period is not None and period not in PERIODS:
+            raise ValueError(f"period must be one of: {', '.join(PERIODS)}")
+
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=30)
+        if period is None:
+            ranges = covering_ranges(since, until)
+        else:
+            ranges = [(period, bucket_start(since, period), until)]
+
+        columns = [getattr(cls, name) for name in group_by]
+        if period is not None:
+            columns.insert(0, cls.bucket)
+        query = read_router.query(*columns, func.sum(cls.count).label('count')).filter(or_(*(
+            and_(cls.period == name, cls.bucket >= start, cls.bucket < end)
+            for name, start, end in ranges
+        )))
+        for name, value in filters.items():
+            if value is not None:
+                query = query.filter(getattr(cls, name) == value)
+        if columns:
+            query = query.group_by(*columns).order_by(*columns)
+
+        results = []
+        for row in query:
+            result = dict(row._mapping)
+            result['count'] = result['count'] or 0
+            for name in group_by:
+                if result[name] == EMPTY[name]:
+                    result[name] = None
+            results.append(result)
+        return results
 
 class LoginAttempt(db.Model):
     """Track login attempts for security monitoring"""
@@ -233,15 +455,87 @@ class LoginAttempt(db.Model):
     
     @classmethod
     def create(cls, user_id, success, ip_address=None, user_agent=None):
-        attempt = cls(
+        """Queue a login attempt; audit_writer persists it in a later batch."""
+        audit_writer.enqueue(
+            cls.__table__,
             user_id=user_id,
             success=success,
             ip_address=ip_address,
-            user_agent=user_agent
+            user_agent=user_agent,
+            timestamp=datetime.utcnow()
         )
-        db.session.add(attempt)
-        db.session.commit()
-        return attempt
+
+class MaintenanceCheckpoint(db.Model):
+    """Progress of a resumable maintenance job such as the cleanup sweep"""
+    __tablename__ = 'maintenance_checkpoints'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    phase = db.Column(db.String(50))
+    state = db.Column(db.Text)  # JSON: cutoffs and cursors for the current run
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def get_state(self):
+        return json.loads(self.state) if self.state else {}
+    
+    def set_state(self, data):
+        self.state = json.dumps(data)
+
+class ServerModeSnapshot:
+    """Read-only copy of the server_mode row with security_config decoded."""
+
+    __slots__ = (
+        'mode', 'rate_limit', 'max_paste_size', 'max_file_size',
+        'allowed_file_types', 'log_level', 'security_config', 'version'
+    )
+
+    def __init__(self, row=None):
+        self.mode = row.mode if row else 'easy'
+        self.rate_limit = row.rate_limit if row else 100
+        self.max_paste_size = row.max_paste_size if row else 1048576
+        self.max_file_size = row.max_file_size if row else 5242880
+        self.allowed_file_types = row.allowed_file_types if row else 'txt,pdf,png,jpg'
+        self.log_level = row.log_level if row else 'INFO'
+        self.security_config = json.loads(row.security_config) if row and row.security_config else {}
+        self.version = (row.config_version or 0) if row else 0
+
+class ServerModeCache:
+    """Process-local ServerModeSnapshot, reloaded only when invalidated or stale.
+
+    Other processes bump ``ServerMode.config_version`` when they change the
+    row; every ``recheck_interval`` seconds the cached copy compares its
+    version against a single-column read and reloads on mismatch.
+    """
+
+    def __init__(self, recheck_interval=5.0):
+        self.recheck_interval = recheck_interval
+        self.generation = 0
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.recheck_interval:
+            return snapshot
+
+        with self._lock:
+            if snapshot is not None and self._snapshot is snapshot:
+                stored = db.session.query(ServerMode.config_version).limit(1).scalar()
+                if (stored or 0) == snapshot.version:
+                    self._checked_at = now
+                    return snapshot
+            self._snapshot = ServerModeSnapshot(ServerMode.query.first())
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self.generation += 1
+
+server_mode_cache = ServerModeCache()
 
 class ServerMode(db.Model):
     """Controls the application's security mode and configuration"""
@@ -250,6 +544,7 @@ class ServerMode(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     mode = db.Column(db.String(10), nullable=False, default='easy', index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    config_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every change
     
     # Security settings
     rate_limit = db.Column(db.Integer, default=100)  # Requests per minute
@@ -261,10 +556,14 @@ class ServerMode(db.Model):
     # Configuration as JSON
     security_config = db.Column(db.Text)  # JSON field for flexible security settings
     
+    @classmethod
+    def get_config(cls):
+        """Return the cached ServerModeSnapshot for this process."""
+        return server_mode_cache.get()
+
     @classmethod
     def get_mode(cls):
-        mode = cls.query.first()
-        return mode.mode if mode else 'easy'
+        return cls.get_config().mode
     
     @classmethod
     def set_mode(cls, mode):
@@ -274,18 +573,182 @@ class ServerMode(db.Model):
         server_mode = cls.query.first()
         if server_mode:
             server_mode.mode = mode
+            server_mode.config_version = (server_mode.config_version or 0) + 1
         else:
-            server_mode = cls(mode=mode)
+            server_mode = cls(mode=mode, config_version=1)
             db.session.add(server_mode)
         
         db.session.commit()
+        server_mode_cache.invalidate()
+        event_bus.publish('server_mode')
         return server_mode
 
+
 # Event listeners for audit logging
+audit_writer.on_write(Audit.__table__, AuditRollup.record)
+
+def _log_action_on_commit(target, action):
+    session = object_session(target)
+    if session is None:
+        Audit.log_action(target.id, target.user_id, action)
+    else:
+        session.info.setdefault('audit_actions', []).append((target.id, target.user_id, action))
+
 @db.event.listens_for(Paste, 'after_update')
 def paste_update_listener(mapper, connection, target):
-    Audit.log_action(target.id, target.user_id, 'update')
+    _log_action_on_commit(target, 'update')
 
 @db.event.listens_for(Paste, 'after_delete')
 def paste_delete_listener(mapper, connection, target):
-    Audit.log_action(target.id, target.user_id, 'delete') 
\ No newline at end of file
+    _log_action_on_commit(target, 'delete')
+
+@db.event.listens_for(Session, 'after_commit')
+def log_committed_actions(session):
+    # Only changes that were committed are audited
+    for paste_id, user_id, action in session.info.pop('audit_actions', ()):
+        Audit.log_action(paste_id, user_id, action)
+
+@db.event.listens_for(Session, 'after_rollback')
+def discard_rolled_back_actions(session):
+    session.info.pop('audit_actions', None)
+
+
+# Full-text search index (SQLite FTS5), kept in sync inside the writing transaction
+SEARCH_INDEXES = {
+    'paste_search': "CREATE VIRTUAL TABLE IF NOT EXISTS paste_search "
+                    "USING fts5(title, content, tokenize='unicode61', prefix='2 3')",
+    'user_search': "CREATE VIRTUAL TABLE IF NOT EXISTS user_search "
+                   "USING fts5(username, tokenize='unicode61', prefix='2 3')",
+}
+
+def search_enabled(connection):
+    return connection.dialect.name == 'sqlite'
+
+@db.event.listens_for(db.metadata, 'after_create')
+def create_search_indexes(target, connection, **kw):
+    if search_enabled(connection):
+        for ddl in SEARCH_INDEXES.values():
+            connection.execute(text(ddl))
+
+@db.event.listens_for(db.metadata, 'after_drop')
+def drop_search_indexes(target, connection, **kw):
+    if search_enabled(connection):
+        for name in SEARCH_INDEXES:
+            connection.execute(text(f'DROP TABLE IF EXISTS {name}'))
+
+def remove_from_search_index(connection, index, ids):
+    """Drop rows for ``ids`` from ``index``; for writes that bypass the ORM."""
+    if search_enabled(connection) and ids:
+        connection.execute(
+            text(f'DELETE FROM {index} WHERE rowid = :id'),
+            [{'id': id} for id in ids]
+        )
+
+def _changed(target, *names):
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+def index_pastes(connection, pastes):
+    if not search_enabled(connection) or not pastes:
+        return
+    remove_from_search_index(connection, 'paste_search', [paste.id for paste in pastes])
+    connection.execute(
+        text('INSERT INTO paste_search (rowid, title, content) VALUES (:id, :title, :content)'),
+        [{'id': paste.id, 'title': paste.title, 'content': paste.content} for paste in pastes]
+    )
+
+def index_paste(connection, paste):
+    index_pastes(connection, [paste])
+
+def index_user(connection, user):
+    remove_from_search_index(connection, 'user_search', [user.id])
+    connection.execute(
+        text('INSERT INTO user_search (rowid, username) VALUES (:id, :username)'),
+        {'id': user.id, 'username': user.username}
+    )
+
+@db.event.listens_for(Paste, 'after_insert')
+def paste_search_insert_listener(mapper, connection, target):
+    if search_enabled(connection) and not getattr(target, '_bulk_indexed', False):
+        index_paste(connection, target)
+
+@db.event.listens_for(Paste, 'after_update')
+def paste_search_update_listener(mapper, connection, target):
+    if search_enabled(connection) and _changed(target, 'title', 'content'):
+        index_paste(connection, target)
+
+@db.event.listens_for(User, 'after_insert')
+def user_search_insert_listener(mapper, connection, target):
+    if search_enabled(connection):
+        index_user(connection, target)
+
+@db.event.listens_for(User, 'after_update')
+def user_search_update_listener(mapper, connection, target):
+    if search_enabled(connection) and _changed(target, 'username'):
+        index_user(connection, target)
+
+@db.event.listens_for(Paste, 'after_delete')
+def paste_search_delete_listener(mapper, connection, target):
+    remove_from_search_index(connection, 'paste_search', [target.id])
+
+@db.event.listens_for(User, 'after_delete')
+def user_search_delete_listener(mapper, connection, target):
+    remove_from_search_index(connection, 'user_search', [target.id])
+
+
+# Response cache invalidation, applied once the writing transaction commits
+def _history_values(target, name):
+    history = inspect(target).attrs[name].history
+    return list(history.added) + list(history.unchanged) + list(history.deleted)
+
+def _invalidate_cached_responses(target, owner_ids=()):
+    tags = tags_for_change(target.__tablename__, target.id, owner_ids)
+    session = object_session(target)
+    if session is None:
+        response_cache.invalidate(tags)
+    else:
+        session.info.setdefault('response_cache_tags', set()).update(tags)
+
+@db.event.listens_for(Paste, 'after_insert')
+@db.event.listens_for(Paste, 'after_update')
+@db.event.listens_for(Paste, 'after_delete')
+def paste_response_cache_listener(mapper, connection, target):
+    _invalidate_cached_responses(
+        target, _history_values(target, 'user_id') + _history_values(target, 'owner_id')
+    )
+
+@db.event.listens_for(User, 'after_insert')
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def user_response_cache_listener(mapper, connection, target):
+    _invalidate_cached_responses(target)
+
+def invalidate_cached_responses(tags=None):
+    """Drop cached responses in this and every other worker; all if ``tags`` is None."""
+    if tags is None:
+        response_cache.clear()
+        event_bus.publish('response_cache', clear=True)
+    else:
+        response_cache.invalidate(tags)
+        event_bus.publish('response_cache', tags=sorted(tags))
+
+@db.event.listens_for(Session, 'after_commit')
+def invalidate_committed_responses(session):
+    tags = session.info.pop('response_cache_tags', None)
+    if tags:
+        invalidate_cached_responses(tags)
+
+@db.event.listens_for(Session, 'after_rollback')
+def discard_rolled_back_invalidations(session):
+    session.info.pop('response_cache_tags', None)
+
+
+# Changes made by other worker processes
+def _remote_response_cache_change(message):
+    if message.get('clear'):
+        response_cache.clear()
+    else:
+        response_cache.invalidate(message.get('tags', ()))
+
+event_bus.subscribe('response_cache', _remote_response_cache_change)
+event_bus.subscribe('server_mode', lambda message: server_mode_cache.invalidate())
@@ -0,0 +1,45 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+from .models import Paste
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(paste):
+    """Opaque cursor holding the (created_at, id) sort key of a paste."""
+    raw = f"{paste.created_at.isoformat()}|{paste.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, paste_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(paste_id)
+    except (ValueError, UnicodeError):
+        raise Exception('Invalid cursor')
+
+
+def paginate_pastes(query, first=20, after=None):
+    """Return one page of pastes, newest first, and whether more follow.
+
+    Pages are selected with a keyset predicate on (created_at, id) instead of
+    OFFSET, so the cost of a page does not depend on how deep it is. Callers
+    filter on ``public`` or ``user_id`` first so the scan runs along
+    idx_paste_public_created or idx_paste_user_created.
+    """
+    first = max(0, min(first or 0, MAX_PAGE_SIZE))
+
+    if after:
+        query = query.filter(
+            tuple_(Paste.created_at, Paste.id) < tuple_(*decode_cursor(after))
+        )
+
+    rows = query.order_by(
+        Paste.created_at.desc(),
+        Paste.id.desc()
+    ).limit(first + 1).all()
+
+    return rows[:first], len(rows) > first
@@ -0,0 +1,105 @@
+import hashlib
+import json
+
+from .cache import LRUCache
+
+NOT_FOUND = 'PersistedQueryNotFound'
+NOT_SUPPORTED = 'PersistedQueryNotSupported'
+
+
+class PersistedQueryError(Exception):
+    """A persisted query could not be resolved.
+
+    ``status_code`` follows the automatic persisted query protocol: an
+    unknown hash is answered with 200 so clients retry with the full text.
+    """
+
+    def __init__(self, message, status_code=200):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class PersistedQueryStore:
+    """Query text keyed by its sha256 hash.
+
+    Clients send ``extensions.persistedQuery.sha256Hash`` instead of the
+    query; an unknown hash gets PersistedQueryNotFound, the client resends
+    the hash together with the text, and the pair is remembered in a bounded
+    LRU. Queries loaded from a JSON allow-list (``{hash: query}``) are never
+    evicted. With ``allow_list_only`` set, only those queries execute and
+    clients cannot register new ones.
+    """
+
+    def __init__(self, maxsize=1000, allow_list_only=False):
+        self.allow_list_only = allow_list_only
+        self.registered = {}
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def init_app(self, app):
+        self.allow_list_only = app.config.get('PERSISTED_QUERIES_ONLY', self.allow_list_only)
+        self.cache = LRUCache(maxsize=app.config.get('PERSISTED_QUERY_CACHE_SIZE', self.cache.maxsize))
+        path = app.config.get('PERSISTED_QUERIES_FILE')
+        if path:
+            self.load(path)
+        app.extensions['persisted_queries'] = self
+
+    def load(self, path):
+        with open(path) as f:
+            queries = json.load(f)
+        for digest, query in queries.items():
+            if query_hash(query) != digest:
+                raise ValueError(f'Persisted query {digest} does not match its hash')
+            self.registered[digest] = query
+        return len(queries)
+
+    def get(self, digest):
+        query = self.registered.get(digest)
+        if query is None:
+            query = self.cache.get(digest)
+        return query
+
+    def resolve(self, params, extensions=None):
+        """Return the query text for one request's ``params``.
+
+        Raises PersistedQueryError when the request cannot be executed.
+        """
+        query = params.get('query')
+        extensions = params.get('extensions', extensions)
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise PersistedQueryError('Extensions are invalid JSON.', 400)
+        persisted = (extensions or {}).get('persistedQuery')
+
+        if not persisted:
+            if self.allow_list_only and query is not None and query_hash(query) not in self.registered:
+                raise PersistedQueryError(NOT_SUPPORTED, 400)
+            return query
+
+        if persisted.get('version', 1) != 1:
+            raise PersistedQueryError('Unsupported persisted query version', 400)
+        digest = persisted.get('sha256Hash')
+        if not isinstance(digest, str):
+            raise PersistedQueryError('Persisted query hash is missing', 400)
+
+        if query is None:
+            query = self.get(digest)
+            if query is None:
+                raise PersistedQueryError(NOT_FOUND)
+            return query
+
+        if query_hash(query) != digest:
+            raise PersistedQueryError('Provided sha256Hash does not match query', 400)
+        if digest not in self.registered:
+            if self.allow_list_only:
+                raise PersistedQueryError(NOT_SUPPORTED, 400)
+            self.cache.set(digest, query)
+        return query
+
+
+persisted_queries = PersistedQueryStore()
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from graphene.utils.str_converters import to_snake_case
+from graphql.language.ast import Field, FragmentSpread, InlineFragment
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only
+
+
+def _collect(info, nodes, fields):
+    for node in nodes:
+        if node.selection_set is None:
+            continue
+        for selection in node.selection_set.selections:
+            if isinstance(selection, Field):
+                fields.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, InlineFragment):
+                _collect(info, [selection], fields)
+            elif isinstance(selection, FragmentSpread):
+                _collect(info, [info.fragments[selection.name.value]], fields)
+    return fields
+
+
+def selected_fields(info, path=(), nodes=None):
+    """Map each field selected below the resolving field to its AST nodes.
+
+    ``path`` descends through wrapper fields first, e.g. ('edges', 'node')
+    for a connection. Fragments are expanded; @skip/@include are ignored,
+    which can only over-select.
+    """
+    fields = _collect(info, info.field_asts if nodes is None else nodes, OrderedDict())
+    for name in path:
+        fields = _collect(info, fields.get(name, []), OrderedDict())
+    return fields
+
+
+def _loader_options(info, model, fields, extra, relationship=None):
+    """Loader options for ``fields`` of ``model``, or None if one is not mapped."""
+    mapper = inspect(model)
+    columns = {column.key for column in mapper.primary_key}
+    columns.update(extra)
+    options = []
+    for name, nodes in fields.items():
+        if name.startswith('__'):
+            continue
+        key = to_snake_case(name)
+        if key in mapper.column_attrs:
+            columns.add(key)
+        elif key in mapper.relationships:
+            prop = mapper.relationships[key]
+            # Keep the foreign keys the resolvers and loaders look at
+            columns.update(mapper.get_property_by_column(column).key for column in prop.local_columns)
+            if prop.lazy == 'dynamic' or prop.uselist:
+                continue
+            loader = joinedload(getattr(model, key)) if relationship is None \
+                else relationship.joinedload(getattr(model, key))
+            nested = _loader_options(
+                info, prop.mapper.class_, selected_fields(info, nodes=nodes), (), loader
+            )
+            if nested is None:
+                options.append(loader)
+            else:
+                options.extend(nested)
+        else:
+            # A computed field may read any column; load the full row
+            return None
+
+    attributes = [getattr(model, key) for key in sorted(columns) if key in mapper.column_attrs]
+    if relationship is None:
+        options.append(load_only(*attributes))
+    else:
+        options.append(relationship.load_only(*attributes))
+    return options
+
+
+def project(query, model, info, path=(), extra=()):
+    """Load only the columns behind the fields selected in ``info``.
+
+    Scalar fields become a ``load_only`` list (plus the primary key and any
+    ``extra`` columns the caller needs, e.g. a cursor's sort key);
+    many-to-one relationships are joined in with their own projection.
+    Collections are left to the DataLoaders. If a selected field does not
+    map to a column or relationship the query is returned unchanged.
+    """
+    options = _loader_options(info, model, selected_fields(info, path), extra)
+    if options is None:
+        return query
+    return query.options(*options)
@@ -0,0 +1,200 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from flask import current_app, has_app_context, request
+import gevent
+import jwt
+from sqlalchemy import bindparam, func
+
+from .bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """In-process token buckets keyed by client IP and user.
+
+    Each key holds ``rate`` tokens per minute, refilled continuously, so a
+    check is a dict lookup and some arithmetic. Per-user request counts are
+    kept in memory and added to ``users.request_count`` (with
+    ``users.last_request``) by a background greenlet every
+    ``flush_interval`` seconds. Only the requests counted since the last
+    write-back are added, so several worker processes can share the
+    stored counters without overwriting each other.
+    """
+
+    def __init__(self, db, flush_interval=30.0, idle_seconds=600.0):
+        self.db = db
+        self.app = None
+        self.flush_interval = flush_interval
+        self.idle_seconds = idle_seconds
+        self.allowed = 0
+        self.limited = 0
+        self._buckets = {}
+        self._counts = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._greenlet = None
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('RATE_LIMIT_FLUSH_INTERVAL', self.flush_interval)
+        app.extensions['rate_limiter'] = self
+        event_bus.subscribe('rate_limits', self._clear)
+        atexit.register(self.stop)
+
+    @property
+    def tracked_keys(self):
+        return len(self._buckets)
+
+    def allow(self, key, rate):
+        """Take one token from ``key``'s bucket; False when it is empty."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(rate), now]
+            tokens = min(float(rate), bucket[0] + (now - bucket[1]) * rate / 60.0)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                self.limited += 1
+                return False
+            bucket[0] = tokens - 1.0
+            self.allowed += 1
+            return True
+
+    def record_request(self, username):
+        with self._lock:
+            count = self._counts.get(username)
+            self._counts[username] = [(count[0] if count else 0) + 1, datetime.utcnow()]
+            self._dirty.add(username)
+
+    def request_count(self, username, stored=0):
+        """``stored`` plus the requests this process has not written back yet.
+
+        Requests counted by other workers show up once they flush (within
+        ``flush_interval`` seconds).
+        """
+        with self._lock:
+            count = self._counts.get(username)
+        return (stored or 0) + (count[0] if count else 0)
+
+    def last_request(self, username, stored=None):
+        """The later of ``stored`` and this process's last request from ``username``."""
+        with self._lock:
+            count = self._counts.get(username)
+        if count is None or (stored is not None and stored >= count[1]):
+            return stored
+        return count[1]
+
+    def reset(self):
+        """Refill every bucket and zero the request counts, in all workers.
+
+        Stored counts only ever grow by deltas, so they are zeroed here
+        too; other worker processes drop their buckets and unwritten
+        counts when the reset reaches them over the event bus.
+        """
+        self._clear()
+        if has_app_context() or self.app is None:
+            self._zero_stored_counts()
+        else:
+            with self.app.app_context():
+                self._zero_stored_counts()
+        event_bus.publish('rate_limits', action='reset')
+
+    def _clear(self, message=None):
+        with self._lock:
+            self._buckets.clear()
+            self._counts.clear()
+            self._dirty.clear()
+
+    def _zero_stored_counts(self):
+        from .models import User, invalidate_cached_responses
+        with self.db.engine.begin() as connection:
+            connection.execute(User.__table__.update().values(request_count=0, last_request=None))
+        # Any cached response may include a user's count
+        invalidate_cached_responses()
+
+    def start(self):
+        if self._greenlet is None or self._greenlet.dead:
+            self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        self.flush()
+
+    def _run(self):
+        while True:
+            gevent.sleep(self.flush_interval)
+            self.prune()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Rate limit write-back failed")
+
+    def prune(self):
+        """Forget buckets that have been idle long enough to be full again."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            for key in [key for key, bucket in self._buckets.items() if bucket[1] < cutoff]:
+                del self._buckets[key]
+
+    def flush(self):
+        """Add the requests counted since the last flush to the stored counters."""
+        with self._lock:
+            rows = [
+                {'name': username, 'delta': self._counts[username][0], 'last': self._counts[username][1]}
+                for username in self._dirty
+            ]
+            for username in self._dirty:
+                self._counts[username][0] = 0
+            self._dirty.clear()
+        if not rows:
+            return 0
+
+        try:
+            if has_app_context() or self.app is None:
+                self._write(rows)
+            else:
+                with self.app.app_context():
+                    self._write(rows)
+        except Exception:
+            # Keep the deltas for the next attempt
+            with self._lock:
+                for row in rows:
+                    count = self._counts.setdefault(row['name'], [0, row['last']])
+                    count[0] += row['delta']
+                    self._dirty.add(row['name'])
+            raise
+        return len(rows)
+
+    def _write(self, rows):
+        from .models import User
+        table = User.__table__
+        statement = table.update().where(table.c.username == bindparam('name')).values(
+            request_count=func.coalesce(table.c.request_count, 0) + bindparam('delta'),
+            last_request=bindparam('last')
+        )
+        with self.db.engine.begin() as connection:
+            connection.execute(statement, rows)
+
+
+def request_identity():
+    """Username from the request's bearer token, or None if absent or invalid."""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    try:
+        payload = jwt.decode(
+            header[7:],
+            current_app.config.get('JWT_SECRET_KEY', current_app.config['SECRET_KEY']),
+            algorithms=['HS256']
+        )
+    except jwt.PyJWTError:
+        return None
+    return payload.get(current_app.config.get('JWT_IDENTITY_CLAIM', 'identity'))
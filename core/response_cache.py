@@ -0,0 +1,177 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+CachedResponse = namedtuple('CachedResponse', 'data etag expires tags')
+
+# Root query fields whose answers can change when a row of a table is
+# inserted or deleted (an update also changes which rows a filter matches).
+QUERY_FIELDS = {
+    'pastes': ('paste', 'pastes', 'pastesConnection', 'search', 'node'),
+    'users': ('user', 'users', 'me', 'search', 'node'),
+}
+
+# Root fields with side effects; a query using one is never cached
+UNCACHEABLE_FIELDS = ('readAndBurn',)
+
+_current_tags = ContextVar('response_cache_tags', default=None)
+
+
+def row_tag(table, id):
+    return f'{table}:{id}'
+
+
+def root_tag(field):
+    return f'root:{field}'
+
+
+def tags_for_change(table, id, owner_ids=()):
+    """Tags to invalidate after a row of ``table`` was written."""
+    tags = {row_tag(table, id)}
+    tags.update(root_tag(field) for field in QUERY_FIELDS.get(table, ()))
+    tags.update(f'user-pastes:{owner_id}' for owner_id in owner_ids if owner_id is not None)
+    return tags
+
+
+class ResponseCache:
+    """TTL + LRU cache of successful query results.
+
+    Entries are keyed on the normalized document, variables, operation name
+    and caller scope. While a query executes, ResponseCacheMiddleware tags
+    it with the root fields it used and every row it read; writes
+    invalidate exactly the entries carrying the matching tags. Results of
+    executions that overlapped an invalidation are not stored, since they
+    may have read the old rows.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get('RESPONSE_CACHE_SIZE', self.maxsize)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', self.ttl)
+        app.extensions['response_cache'] = self
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(normalized_query, variables, operation_name, scope):
+        return (
+            normalized_query,
+            json.dumps(variables or {}, sort_keys=True, default=str),
+            operation_name,
+            scope,
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, data, tags, generation=None):
+        if generation is not None and generation != self.generation:
+            return None
+        if any(root_tag(field) in tags for field in UNCACHEABLE_FIELDS):
+            return None
+        body = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        entry = CachedResponse(data, etag, time.monotonic() + self.ttl, frozenset(tags))
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return None
+            self._remove(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            self.generation += 1
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    @contextmanager
+    def collect(self):
+        """Gather tags for the execution running in this context."""
+        tags = set()
+        token = _current_tags.set(tags)
+        try:
+            yield tags
+        finally:
+            _current_tags.reset(token)
+
+
+class ResponseCacheMiddleware:
+    """Graphene middleware that tags the running query for invalidation."""
+
+    def resolve(self, next, root, info, **args):
+        tags = _current_tags.get()
+        if tags is not None:
+            if root is None:
+                tags.add(root_tag(info.field_name))
+            else:
+                table = getattr(root, '__tablename__', None)
+                if table is not None:
+                    tags.add(row_tag(table, root.id))
+                    if table == 'users' and info.field_name in ('pastes', 'ownedPastes'):
+                        tags.add(f'user-pastes:{root.id}')
+        return next(root, info, **args)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,103 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_
+
+# Rollup granularities, finest first
+PERIODS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+}
+
+# Audit columns counted per bucket. Missing values are stored as '' / 0 so
+# they can be part of the unique key that upserts conflict on.
+DIMENSIONS = ('action', 'operation_type', 'security_level', 'user_id')
+EMPTY = {'action': '', 'operation_type': '', 'security_level': '', 'user_id': 0}
+KEY_COLUMNS = ('period', 'bucket') + DIMENSIONS
+
+
+def bucket_start(timestamp, period):
+    if period == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_end(timestamp, period):
+    """Start of the first bucket at or after ``timestamp``."""
+    start = bucket_start(timestamp, period)
+    return start if start == timestamp else start + PERIODS[period]
+
+
+def rollup_counts(rows, now=None):
+    """Count audit row dicts per (period, bucket, *DIMENSIONS)."""
+    counts = Counter()
+    for row in rows:
+        timestamp = row.get('timestamp') or now or datetime.utcnow()
+        key = tuple(row.get(name) or EMPTY[name] for name in DIMENSIONS)
+        for period in PERIODS:
+            counts[(period, bucket_start(timestamp, period)) + key] += 1
+    return counts
+
+
+def _upsert_statement(connection, table):
+    """INSERT ... ON CONFLICT adding to ``count``, or None if unsupported."""
+    name = connection.dialect.name
+    if name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={'count': table.c.count + statement.excluded['count']}
+    )
+
+
+def upsert_counts(connection, table, counts):
+    """Add ``counts`` from rollup_counts to the rollup ``table``.
+
+    Runs on the caller's connection so the rollups commit or roll back
+    together with the audit rows they count.
+    """
+    if not counts:
+        return 0
+    rows = [
+        dict(zip(KEY_COLUMNS, key), count=count)
+        for key, count in sorted(counts.items())
+    ]
+    statement = _upsert_statement(connection, table)
+    if statement is not None:
+        connection.execute(statement, rows)
+        return len(rows)
+
+    for row in rows:
+        match = and_(*(table.c[name] == row[name] for name in KEY_COLUMNS))
+        updated = connection.execute(
+            table.update().where(match).values(count=table.c.count + row['count'])
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert(), row)
+    return len(rows)
+
+
+def covering_ranges(since, until):
+    """Split [since, until) into (period, start, end) ranges to read.
+
+    Whole hours come from the hourly rollup and the partial hours at
+    either edge from the minute rollup, so a 30-day range reads about 720
+    hourly buckets plus at most 118 minute buckets.
+    """
+    since = bucket_start(since, 'minute')
+    until = bucket_end(until, 'minute')
+    first_hour = bucket_end(since, 'hour')
+    last_hour = bucket_start(until, 'hour')
+    if first_hour >= last_hour:
+        return [('minute', since, until)]
+    ranges = [('hour', first_hour, last_hour)]
+    if since < first_hour:
+        ranges.append(('minute', since, first_hour))
+    if last_hour < until:
+        ranges.append(('minute', last_hour, until))
+    return ranges
@@ -1,4 +1,5 @@
 import graphene
+from graphene.utils.str_converters import to_snake_case
 from graphene_sqlalchemy import SQLAlchemyObjectType
 from flask import request
 from flask_graphql_auth import (
@@ -6,25 +7,79 @@ from flask_graphql_auth import (
     create_refresh_token,
     get_jwt_identity
 )
+from rx import operators as ops
 from rx.subject import Subject
 
 from .models import (
-    db,
     User as UserModel,
     Paste as PasteModel,
-    Owner as OwnerModel,
     Audit as AuditModel,
-    ServerMode as ServerModeModel
+    AuditRollup as AuditRollupModel,
+    rate_limiter,
+    read_router
 )
+from .bus import event_bus
+from .loaders import get_loaders
+from .pagination import encode_cursor, paginate_pastes
+from .projection import project
+from .ratelimit import request_identity
+from .search import search as search_index
+from .subscriptions import FanoutEngine, SubscriptionServer
+
+def current_user():
+    """The user named by the request's bearer token, or None."""
+    username = request_identity()
+    if not username:
+        return None
+    return UserModel.query.filter_by(username=username).first()
 
 # Create a subject for subscriptions
 paste_subject = Subject()
 
+# Filtered fan-out used by the websocket subscription server
+paste_fanout = FanoutEngine()
+
+def _publish_local(pastes):
+    paste_fanout.publish_many(pastes)
+    for paste in pastes:
+        paste_subject.on_next(paste)
+
+def publish_pastes(pastes):
+    """Notify subscribers about newly created pastes, in every worker process."""
+    _publish_local(pastes)
+    event_bus.publish('pastes', ids=[paste.id for paste in pastes])
+
+def _publish_remote_pastes(message):
+    # Pastes are committed before they are published, so other workers can load them
+    pastes = read_router.query(PasteModel).filter(
+        PasteModel.id.in_(message['ids'])
+    ).order_by(PasteModel.id).all()
+    _publish_local(pastes)
+
+event_bus.subscribe('pastes', _publish_remote_pastes)
+
 # SQLAlchemy Types
 class User(SQLAlchemyObjectType):
     class Meta:
         model = UserModel
 
+    @staticmethod
+    def resolve_pastes(parent, info):
+        return get_loaders().pastes_by_user.load(parent.id)
+
+    @staticmethod
+    def resolve_owned_pastes(parent, info):
+        return get_loaders().pastes_by_owner.load(parent.id)
+
+    # The stored counters lag behind the in-memory ones by up to a flush
+    @staticmethod
+    def resolve_request_count(parent, info):
+        return rate_limiter.request_count(parent.username, parent.request_count)
+
+    @staticmethod
+    def resolve_last_request(parent, info):
+        return rate_limiter.last_request(parent.username, parent.last_request)
+
 class Paste(SQLAlchemyObjectType):
     class Meta:
         model = PasteModel
@@ -34,20 +89,56 @@ class Paste(SQLAlchemyObjectType):
         # Implement network info directive logic here
         return parent.ip_addr
 
-class Owner(SQLAlchemyObjectType):
+    @staticmethod
+    def resolve_owner(parent, info):
+        if 'owner' in parent.__dict__:
+            # Already joined in by the projected query
+            return parent.owner
+        if parent.owner_id is None:
+            return None
+        return get_loaders().users.load(parent.owner_id)
+
+    @staticmethod
+    def resolve_user(parent, info):
+        if 'user' in parent.__dict__:
+            return parent.user
+        if parent.user_id is None:
+            return None
+        return get_loaders().users.load(parent.user_id)
+
+class PasteConnection(graphene.relay.Connection):
+    class Meta:
+        node = Paste
+
+class SearchResult(graphene.Union):
     class Meta:
-        model = OwnerModel
+        types = (Paste, User)
 
 class Audit(SQLAlchemyObjectType):
     class Meta:
         model = AuditModel
 
+class AuditCount(graphene.ObjectType):
+    """Audit count from the rollups; ungrouped dimensions are null"""
+    bucket = graphene.DateTime()
+    action = graphene.String()
+    operation_type = graphene.String()
+    security_level = graphene.String()
+    user_id = graphene.Int()
+    count = graphene.Int()
+
 # Input Types
 class UserInput(graphene.InputObjectType):
     username = graphene.String(required=True)
     email = graphene.String(required=True)
     password = graphene.String(required=True)
 
+class PasteInput(graphene.InputObjectType):
+    title = graphene.String(required=True)
+    content = graphene.String(required=True)
+    public = graphene.Boolean(default_value=False)
+    burn = graphene.Boolean(default_value=False)
+
 # Mutations
 class CreateUser(graphene.Mutation):
     class Arguments:
@@ -69,28 +160,37 @@ class CreatePaste(graphene.Mutation):
     paste = graphene.Field(lambda: Paste)
 
     def mutate(root, info, title, content, public=False, burn=False):
-        # Get or create default owner
-        owner = OwnerModel.query.filter_by(name='DVGAUser').first()
-        if not owner:
-            owner = OwnerModel(name='DVGAUser')
-            db.session.add(owner)
-            db.session.commit()
-
+        user = current_user()
         paste = PasteModel.create_paste(
             title=title,
             content=content,
+            user_id=user.id if user else None,
             public=public,
-            burn=burn,
-            owner_id=owner.id,
-            ip_addr=request.remote_addr,
-            user_agent=request.headers.get('User-Agent', '')
+            burn=burn
         )
 
         # Notify subscribers
-        paste_subject.on_next(paste)
+        publish_pastes([paste])
         
         return CreatePaste(paste=paste)
 
+class CreatePastes(graphene.Mutation):
+    class Arguments:
+        inputs = graphene.List(graphene.NonNull(PasteInput), required=True)
+
+    pastes = graphene.List(lambda: Paste)
+
+    def mutate(root, info, inputs):
+        user = current_user()
+        pastes = PasteModel.create_pastes(
+            [dict(item) for item in inputs], user_id=user.id if user else None
+        )
+
+        # One notification pass for the whole batch
+        publish_pastes(pastes)
+
+        return CreatePastes(pastes=pastes)
+
 class Login(graphene.Mutation):
     class Arguments:
         username = graphene.String()
@@ -116,6 +216,7 @@ class Login(graphene.Mutation):
 class Mutation(graphene.ObjectType):
     create_user = CreateUser.Field()
     create_paste = CreatePaste.Field()
+    create_pastes = CreatePastes.Field()
     login = Login.Field()
 
 # Queries
@@ -138,21 +239,54 @@ class Query(graphene.ObjectType):
         id=graphene.Int(),
         title=graphene.String()
     )
+    pastes_connection = graphene.Field(
+        PasteConnection,
+        first=graphene.Int(default_value=20),
+        after=graphene.String(),
+        public=graphene.Boolean(),
+        user_id=graphene.Int()
+    )
+
+    read_and_burn = graphene.Field(Paste, id=graphene.Int(required=True))
+
+    # Aggregates over the audit rollups
+    audit_counts = graphene.List(
+        AuditCount,
+        since=graphene.DateTime(),
+        until=graphene.DateTime(),
+        group_by=graphene.List(graphene.String, default_value=['action']),
+        action=graphene.String(),
+        security_level=graphene.String(),
+        user_id=graphene.Int()
+    )
+    audit_timeline = graphene.List(
+        AuditCount,
+        period=graphene.String(default_value='hour'),
+        since=graphene.DateTime(),
+        until=graphene.DateTime(),
+        group_by=graphene.List(graphene.String, default_value=[]),
+        action=graphene.String(),
+        security_level=graphene.String(),
+        user_id=graphene.Int()
+    )
+
+    # Search
+    search = graphene.List(SearchResult, keyword=graphene.String())
 
     def resolve_users(root, info):
-        return UserModel.query.all()
+        return project(read_router.query(UserModel), UserModel, info).all()
 
     def resolve_user(root, info, id):
-        return UserModel.query.get(id)
+        return project(read_router.query(UserModel), UserModel, info).get(id)
 
     def resolve_me(root, info):
         username = get_jwt_identity()
         if not username:
             raise Exception('Not authenticated')
-        return UserModel.query.filter_by(username=username).first()
+        return project(read_router.query(UserModel), UserModel, info).filter_by(username=username).first()
 
     def resolve_pastes(root, info, public=None, limit=None):
-        query = PasteModel.query
+        query = project(read_router.query(PasteModel), PasteModel, info).filter(PasteModel.not_expired())
         
         if public is not None:
             query = query.filter_by(public=public)
@@ -162,23 +296,91 @@ class Query(graphene.ObjectType):
             
         return query.all()
 
+    def resolve_pastes_connection(root, info, first=20, after=None, public=None, user_id=None):
+        query = project(
+            read_router.query(PasteModel), PasteModel, info,
+            path=('edges', 'node'), extra=('created_at',)
+        ).filter(PasteModel.not_expired())
+
+        if public is not None:
+            query = query.filter_by(public=public)
+
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+
+        pastes, has_next_page = paginate_pastes(query, first=first, after=after)
+        edges = [
+            PasteConnection.Edge(node=paste, cursor=encode_cursor(paste))
+            for paste in pastes
+        ]
+
+        return PasteConnection(
+            edges=edges,
+            page_info=graphene.relay.PageInfo(
+                has_next_page=has_next_page,
+                has_previous_page=after is not None,
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None
+            )
+        )
+
+    def resolve_read_and_burn(root, info, id):
+        user = current_user()
+        return PasteModel.read_and_burn(id, user_id=user.id if user else None, ip_address=request.remote_addr)
+
+    def resolve_audit_counts(root, info, since=None, until=None, group_by=('action',), **filters):
+        return AuditRollupModel.summary(
+            since, until, group_by=[to_snake_case(name) for name in group_by], **filters
+        )
+
+    def resolve_audit_timeline(root, info, period='hour', since=None, until=None, group_by=(), **filters):
+        return AuditRollupModel.summary(
+            since, until, group_by=[to_snake_case(name) for name in group_by], period=period, **filters
+        )
+
+    def resolve_search(root, info, keyword=None):
+        return search_index(keyword)
+
     def resolve_paste(root, info, id=None, title=None):
+        query = project(read_router.query(PasteModel), PasteModel, info).filter(PasteModel.not_expired())
         if id:
-            return PasteModel.query.get(id)
+            return query.filter(PasteModel.id == id).first()
         elif title:
-            return PasteModel.query.filter_by(title=title).first()
+            return query.filter_by(title=title).first()
         return None
 
 # Subscriptions
+def paste_matches(paste, id=None, title=None):
+    return (id is None or paste.id == id) and (title is None or paste.title == title)
+
 class Subscription(graphene.ObjectType):
+    paste = graphene.Field(Paste, id=graphene.Int(), title=graphene.String())
     paste_created = graphene.Field(Paste)
 
+    def resolve_paste(root, info, id=None, title=None):
+        return paste_subject.pipe(ops.filter(lambda paste: paste_matches(paste, id, title)))
+
     def resolve_paste_created(root, info):
         return paste_subject
 
+class SubscriptionEvent(graphene.ObjectType):
+    """Query root for rendering subscription payloads; fields return the event."""
+    paste = graphene.Field(Paste, id=graphene.Int(), title=graphene.String())
+    paste_created = graphene.Field(Paste)
+
+    def resolve_paste(root, info, id=None, title=None):
+        return root
+
+    def resolve_paste_created(root, info):
+        return root
+
 # Schema
 schema = graphene.Schema(
     query=Query,
     mutation=Mutation,
     subscription=Subscription
-) 
\ No newline at end of file
+)
+
+event_schema = graphene.Schema(query=SubscriptionEvent)
+
+subscription_server = SubscriptionServer(schema, event_schema, paste_fanout)
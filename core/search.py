@@ -0,0 +1,88 @@
+import re
+from sqlalchemy import or_, text
+
+from .models import db, Paste, User, read_router, search_enabled
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(keyword):
+    """Turn free text into an FTS5 MATCH expression of quoted prefix terms."""
+    tokens = TOKEN_PATTERN.findall(keyword or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _ranked_ids(connection, statement, match, limit):
+    rows = connection.execute(text(statement), {'match': match, 'limit': limit})
+    return [(row[0], row[1]) for row in rows]
+
+
+def search(keyword, limit=50):
+    """Return pastes and users matching ``keyword``, best match first.
+
+    Every term is matched as a prefix. On SQLite the lookup runs against the
+    FTS5 indexes maintained by the listeners in core.models and is ranked by
+    bm25, with title hits weighted above content hits; other databases fall
+    back to an unranked LIKE scan.
+    """
+    match = build_match_query(keyword)
+    if not match:
+        return []
+
+    connection = read_router.session.connection()
+    if not search_enabled(connection):
+        return _search_like(keyword, limit)
+
+    hits = [('paste', id, score) for id, score in _ranked_ids(
+        connection,
+        'SELECT rowid, bm25(paste_search, 10.0, 1.0) AS score FROM paste_search '
+        'WHERE paste_search MATCH :match ORDER BY score LIMIT :limit',
+        match, limit
+    )]
+    hits += [('user', id, score) for id, score in _ranked_ids(
+        connection,
+        'SELECT rowid, bm25(user_search) AS score FROM user_search '
+        'WHERE user_search MATCH :match ORDER BY score LIMIT :limit',
+        match, limit
+    )]
+    # bm25 scores are negative; lower is a better match
+    hits.sort(key=lambda hit: hit[2])
+    hits = hits[:limit]
+
+    paste_ids = [id for kind, id, _ in hits if kind == 'paste']
+    user_ids = [id for kind, id, _ in hits if kind == 'user']
+    objects = {}
+    if paste_ids:
+        objects.update((('paste', p.id), p) for p in read_router.query(Paste).filter(
+            Paste.id.in_(paste_ids), Paste.not_expired()
+        ))
+    if user_ids:
+        objects.update((('user', u.id), u) for u in read_router.query(User).filter(User.id.in_(user_ids)))
+
+    return [objects[(kind, id)] for kind, id, _ in hits if (kind, id) in objects]
+
+
+def _search_like(keyword, limit):
+    pattern = f'%{keyword}%'
+    pastes = read_router.query(Paste).filter(
+        or_(Paste.title.ilike(pattern), Paste.content.ilike(pattern)), Paste.not_expired()
+    ).limit(limit).all()
+    users = read_router.query(User).filter(User.username.ilike(pattern)).limit(limit).all()
+    return (pastes + users)[:limit]
+
+
+def rebuild_search_index():
+    """Repopulate the FTS5 tables from pastes and users, e.g. after bulk loads."""
+    connection = db.session.connection()
+    if not search_enabled(connection):
+        return False
+    connection.execute(text('DELETE FROM paste_search'))
+    connection.execute(text(
+        'INSERT INTO paste_search (rowid, title, content) SELECT id, title, content FROM pastes'
+    ))
+    connection.execute(text('DELETE FROM user_search'))
+    connection.execute(text(
+        'INSERT INTO user_search (rowid, username) SELECT id, username FROM users'
+    ))
+    db.session.commit()
+    return True
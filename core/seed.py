@@ -0,0 +1,265 @@
+"""Bulk synthetic data for capacity tests.
+
+    uv run python -m core.seed --users 10000 --pastes 1000000 --reset
+
+Rows are generated in batches and written with executemany INSERTs through
+Core, one transaction per batch, so memory stays flat at any scale. Core
+inserts bypass the ORM listeners (search index, response cache, audit
+hooks) and no password is hashed per row; the search index is rebuilt once
+at the end instead. Audit rollups are added per batch.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+
+from .models import (
+    db, User, Paste, PasteVersion, Audit, AuditRollup, LoginAttempt, ServerMode,
+    invalidate_cached_responses
+)
+from .search import rebuild_search_index
+from .versions import is_snapshot_version, make_delta
+
+WORDS = (
+    'alpha', 'bravo', 'charlie', 'delta', 'echo', 'select', 'insert', 'token', 'config',
+    'secret', 'graphql', 'paste', 'server', 'admin', 'debug', 'query', 'update', 'from',
+    'where', 'import', 'return', 'function', 'class', 'error', 'request', 'response',
+    'header', 'value', 'false', 'true', 'null', 'user', 'password', 'session', 'cache',
+)
+LANGUAGES = (None, None, 'text', 'python', 'javascript', 'sql', 'bash', 'json', 'yaml', 'go')
+USER_AGENTS = (
+    'Mozilla/5.0 (X11; Linux x86_64)', 'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0)',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64)', 'curl/8.4.0', 'python-requests/2.31',
+)
+ACTIONS = ('read', 'read', 'read', 'read', 'update', 'delete')
+PASSWORD_HASHES = 8
+MAX_CONTENT = 512 * 1024
+
+
+class SeedReport:
+    def __init__(self):
+        self.rows = {}
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def add(self, table, count):
+        self.rows[table] = self.rows.get(table, 0) + count
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def total(self):
+        return sum(self.rows.values())
+
+    def to_dict(self):
+        seconds = self.seconds or (time.perf_counter() - self.started)
+        return {
+            'rows': dict(self.rows),
+            'total_rows': self.total,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.total / seconds) if seconds else None,
+        }
+
+
+class Seeder:
+    """Generate users, pastes, versions, audits and login attempts at scale.
+
+    Sizes follow rough real-world shapes: paste bodies are log-normal
+    (median ~1 KB, capped at 512 KB), paste ownership is Zipf-like so a few
+    users own most pastes, and version, audit and login counts are random
+    around their means. The same ``seed`` always produces the same rows.
+    """
+
+    def __init__(self, users=1000, pastes=100000, versions_per_paste=1.5, audits_per_paste=2.0,
+                 login_attempts_per_user=5.0, batch_size=5000, days=90, seed=1):
+        self.users = users
+        self.pastes = pastes
+        self.versions_per_paste = max(1.0, versions_per_paste)
+        self.audits_per_paste = audits_per_paste
+        self.login_attempts_per_user = login_attempts_per_user
+        self.batch_size = batch_size
+        self.days = days
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow()
+        self.report = SeedReport()
+        # Paste text is sliced out of one shared corpus instead of built word by word
+        self.corpus = ' '.join(self.rng.choice(WORDS) for _ in range(2 * MAX_CONTENT // 5))
+
+    def run(self):
+        user_ids = self.seed_users()
+        if user_ids:
+            self.seed_pastes(user_ids)
+            self.seed_login_attempts(user_ids)
+        rebuild_search_index()
+        invalidate_cached_responses()
+        return self.report.finish()
+
+    def _next_id(self, table):
+        return (db.session.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+    def _insert(self, table, rows):
+        if rows:
+            db.session.execute(table.insert(), rows)
+            self.report.add(table.name, len(rows))
+
+    def _timestamp(self, after=None):
+        start = after or self.now - timedelta(days=self.days)
+        span = max(1, int((self.now - start).total_seconds()))
+        return start + timedelta(seconds=self.rng.randint(0, span))
+
+    def _text(self, size):
+        offset = self.rng.randint(0, len(self.corpus) - size)
+        return self.corpus[offset:offset + size]
+
+    def _content_size(self):
+        return max(16, min(int(self.rng.lognormvariate(7, 1.2)), MAX_CONTENT))
+
+    def _count(self, mean):
+        """Non-negative random count with the given mean."""
+        if mean <= 0:
+            return 0
+        return int(self.rng.expovariate(1.0 / mean) + 0.5)
+
+    def seed_users(self):
+        first = self._next_id(User.__table__)
+        hashes = [generate_password_hash(f'password{i}') for i in range(PASSWORD_HASHES)]
+        for start in range(0, self.users, self.batch_size):
+            self._insert(User.__table__, [
+                {
+                    'id': first + i,
+                    'username': f'user{first + i}',
+                    'password_hash': hashes[i % PASSWORD_HASHES],
+                    'is_admin': i == 0,
+                    'created_at': self._timestamp(),
+                    'failed_login_attempts': 0,
+                    'request_count': 0,
+                }
+                for i in range(start, min(start + self.batch_size, self.users))
+            ])
+            db.session.commit()
+        return range(first, first + self.users)
+
+    def seed_pastes(self, user_ids):
+        # Zipf-like ownership: the user of rank r is weighted 1 / r
+        cumulative, total = [], 0.0
+        for rank in range(1, len(user_ids) + 1):
+            total += 1.0 / rank
+            cumulative.append(total)
+
+        paste_id = self._next_id(Paste.__table__)
+        for start in range(0, self.pastes, self.batch_size):
+            count = min(self.batch_size, self.pastes - start)
+            pastes, versions, audits = [], [], []
+            for owner in self.rng.choices(user_ids, cum_weights=cumulative, k=count):
+                created_at = self._timestamp()
+                content = self._text(self._content_size())
+                version_count = 1 + self._count(self.versions_per_paste - 1)
+                previous = None
+                for version in range(1, version_count + 1):
+                    if previous is not None:
+                        content = f'{content}\n{self._text(self.rng.randint(8, 200))}'
+                    snapshot = previous is None or is_snapshot_version(version)
+                    versions.append({
+                        'paste_id': paste_id,
+                        'content': content if snapshot else '',
+                        'delta': None if snapshot else make_delta(previous, content),
+                        'version': version,
+                        'is_snapshot': snapshot,
+                        'created_at': created_at,
+                    })
+                    previous = content
+
+                pastes.append({
+                    'id': paste_id,
+                    'title': ' '.join(self.rng.sample(WORDS, self.rng.randint(2, 6))),
+                    'content': content,
+                    'public': self.rng.random() < 0.8,
+                    'burn': self.rng.random() < 0.02,
+                    'created_at': created_at,
+                    'expires_at': self.now + timedelta(days=self.rng.randint(1, 30))
+                    if self.rng.random() < 0.1 else None,
+                    'language': self.rng.choice(LANGUAGES),
+                    'size': len(content.encode('utf-8')),
+                    'version': version_count,
+                    'user_id': owner,
+                    'owner_id': owner,
+                })
+
+                audits.append({'paste_id': paste_id, 'user_id': owner, 'action': 'create',
+                               'timestamp': created_at, 'ip_address': None})
+                for _ in range(self._count(self.audits_per_paste - 1)):
+                    audits.append({
+                        'paste_id': paste_id,
+                        'user_id': self.rng.choice(user_ids),
+                        'action': self.rng.choice(ACTIONS),
+                        'timestamp': self._timestamp(created_at),
+                        'ip_address': f'10.{self.rng.randint(0, 255)}.{self.rng.randint(0, 255)}.'
+                                      f'{self.rng.randint(1, 254)}',
+                    })
+                paste_id += 1
+
+            self._insert(Paste.__table__, pastes)
+            self._insert(PasteVersion.__table__, versions)
+            self._insert(Audit.__table__, audits)
+            self.report.add(AuditRollup.__tablename__, AuditRollup.record(db.session.connection(), audits))
+            db.session.commit()
+
+    def seed_login_attempts(self, user_ids):
+        rows = []
+        for user_id in user_ids:
+            for _ in range(self._count(self.login_attempts_per_user)):
+                rows.append({
+                    'user_id': user_id,
+                    'timestamp': self._timestamp(),
+                    'success': self.rng.random() < 0.85,
+                    'ip_address': f'192.168.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}',
+                    'user_agent': self.rng.choice(USER_AGENTS),
+                })
+            if len(rows) >= self.batch_size:
+                self._insert(LoginAttempt.__table__, rows)
+                db.session.commit()
+                rows = []
+        self._insert(LoginAttempt.__table__, rows)
+        db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--pastes', type=int, default=100000)
+    parser.add_argument('--versions-per-paste', type=float, default=1.5)
+    parser.add_argument('--audits-per-paste', type=float, default=2.0)
+    parser.add_argument('--login-attempts-per-user', type=float, default=5.0)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=90, help='Spread created_at over this many days')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables first')
+    args = parser.parse_args(argv)
+
+    from app import app
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            db.create_all()
+            ServerMode.set_mode('easy')
+        report = Seeder(
+            users=args.users,
+            pastes=args.pastes,
+            versions_per_paste=args.versions_per_paste,
+            audits_per_paste=args.audits_per_paste,
+            login_attempts_per_user=args.login_attempts_per_user,
+            batch_size=args.batch_size,
+            days=args.days,
+            seed=args.seed
+        ).run()
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
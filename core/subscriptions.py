@@ -0,0 +1,383 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+import gevent
+from gevent.lock import Semaphore
+from gevent.queue import Queue, Full, Empty
+from graphql import parse, validate
+from graphql.error import format_error
+from graphql.execution import execute
+from graphql.language import ast
+from graphql.language.printer import print_ast
+from graphql.utils.get_operation_ast import get_operation_ast
+from graphql.utils.value_from_ast import value_from_ast
+from flask_sockets import SocketMiddleware, Sockets
+from werkzeug.routing import Rule
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'disconnect')
+
+
+class Subscriber:
+    """One active subscription: its filter, selection key and bounded queue."""
+
+    def __init__(self, paste_id=None, title=None, selection_key=None,
+                 queue_size=100, policy='drop_oldest', on_overflow=None):
+        self.paste_id = paste_id
+        self.title = title
+        self.selection_key = selection_key
+        self.queue = Queue(maxsize=queue_size)
+        self.policy = policy
+        self.on_overflow = on_overflow
+        self.dropped = 0
+        self.closed = False
+
+    def matches(self, paste):
+        if self.paste_id is not None and paste.id != self.paste_id:
+            return False
+        if self.title is not None and paste.title != self.title:
+            return False
+        return True
+
+    def offer(self, message):
+        """Queue ``message`` without blocking, applying the overflow policy."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except Full:
+            pass
+
+        self.dropped += 1
+        if self.policy == 'drop_oldest':
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                pass
+            self.queue.put_nowait(message)
+            return True
+        if self.policy == 'disconnect':
+            self.closed = True
+            if self.on_overflow:
+                self.on_overflow(self)
+        return False
+
+
+class FanoutEngine:
+    """Deliver published pastes only to the subscribers whose filter matches.
+
+    Subscribers are indexed by the ``id`` and ``title`` arguments of their
+    subscription, so a publish touches only candidate subscribers instead of
+    every open subscription. Matching subscribers are grouped by selection
+    key and each group's payload is rendered once and shared.
+    """
+
+    def __init__(self, queue_size=100, policy='drop_oldest'):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.published = 0
+        self.delivered = 0
+        self._by_id = defaultdict(set)
+        self._by_title = defaultdict(set)
+        self._wildcard = set()
+        self._renderers = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.queue_size = app.config.get('SUBSCRIPTION_QUEUE_SIZE', self.queue_size)
+        self.policy = app.config.get('SUBSCRIPTION_OVERFLOW_POLICY', self.policy)
+        if self.policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Overflow policy must be one of {', '.join(OVERFLOW_POLICIES)}")
+        app.extensions['subscription_fanout'] = self
+
+    @property
+    def subscriber_count(self):
+        return (
+            sum(len(bucket) for bucket in self._by_id.values())
+            + sum(len(bucket) for bucket in self._by_title.values())
+            + len(self._wildcard)
+        )
+
+    def subscribe(self, paste_id=None, title=None, selection_key=None, render=None, on_overflow=None):
+        subscriber = Subscriber(
+            paste_id=paste_id,
+            title=title,
+            selection_key=selection_key,
+            queue_size=self.queue_size,
+            policy=self.policy,
+            on_overflow=on_overflow
+        )
+        with self._lock:
+            if render is not None:
+                self._renderers.setdefault(selection_key, [render, 0])[1] += 1
+            if paste_id is not None:
+                self._by_id[paste_id].add(subscriber)
+            elif title is not None:
+                self._by_title[title].add(subscriber)
+            else:
+                self._wildcard.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.closed = True
+        with self._lock:
+            if subscriber.paste_id is not None:
+                bucket, key = self._by_id, subscriber.paste_id
+            elif subscriber.title is not None:
+                bucket, key = self._by_title, subscriber.title
+            else:
+                bucket, key = None, None
+
+            if bucket is None:
+                self._wildcard.discard(subscriber)
+            else:
+                bucket[key].discard(subscriber)
+                if not bucket[key]:
+                    del bucket[key]
+
+            renderer = self._renderers.get(subscriber.selection_key)
+            if renderer is not None:
+                renderer[1] -= 1
+                if renderer[1] <= 0:
+                    del self._renderers[subscriber.selection_key]
+
+    def publish(self, paste):
+        self.publish_many([paste])
+
+    def publish_many(self, pastes):
+        """Fan a batch of pastes out in one pass over the subscriber index."""
+        for paste in pastes:
+            with self._lock:
+                candidates = set(self._wildcard)
+                candidates.update(self._by_id.get(paste.id, ()))
+                candidates.update(self._by_title.get(paste.title, ()))
+                renderers = dict(self._renderers)
+
+            groups = defaultdict(list)
+            for subscriber in candidates:
+                if not subscriber.closed and subscriber.matches(paste):
+                    groups[subscriber.selection_key].append(subscriber)
+
+            for selection_key, subscribers in groups.items():
+                renderer = renderers.get(selection_key)
+                try:
+                    message = renderer[0](paste) if renderer else paste
+                except Exception:
+                    logger.exception("Failed to render subscription payload")
+                    continue
+                for subscriber in subscribers:
+                    if subscriber.offer(message):
+                        self.delivered += 1
+            self.published += 1
+
+
+class SubscriptionServer:
+    """Minimal graphql-ws (subscriptions-transport-ws) protocol handler.
+
+    ``start`` messages are validated against ``schema`` and registered on the
+    fan-out engine. Payloads are rendered by executing the subscription's
+    selection set as a query against ``event_schema``, whose root fields
+    return the published paste itself.
+    """
+
+    def __init__(self, schema, event_schema, engine):
+        self.schema = schema
+        self.event_schema = event_schema
+        self.engine = engine
+        self._documents = LRUCache(maxsize=256)
+
+    def handle(self, ws):
+        connection = _Connection(self, ws)
+        try:
+            connection.run()
+        finally:
+            connection.close()
+
+    def build_subscription(self, payload):
+        """Return (root field name, arguments, selection key, renderer) for a start payload."""
+        query = payload.get('query')
+        variables = payload.get('variables') or {}
+        operation_name = payload.get('operationName')
+        if not query:
+            raise ValueError('Must provide query string.')
+
+        document = parse(query)
+        errors = validate(self.schema, document)
+        if errors:
+            raise ValueError('; '.join(error.message for error in errors))
+
+        operation = get_operation_ast(document, operation_name)
+        if operation is None or operation.operation != 'subscription':
+            raise ValueError('Only subscription operations are accepted here.')
+        if len(operation.selection_set.selections) != 1:
+            raise ValueError('A subscription must select exactly one root field.')
+
+        field = operation.selection_set.selections[0]
+        field_def = self.schema.get_subscription_type().fields[field.name.value]
+        arguments = {}
+        for argument in field.arguments or []:
+            name = argument.name.value
+            arguments[name] = value_from_ast(argument.value, field_def.args[name].type, variables)
+
+        # The same selection set rendered against the event root as a query
+        render_document = ast.Document(definitions=[
+            ast.OperationDefinition(
+                operation='query',
+                name=operation.name,
+                variable_definitions=operation.variable_definitions,
+                directives=operation.directives,
+                selection_set=operation.selection_set
+            )
+        ] + [d for d in document.definitions if isinstance(d, ast.FragmentDefinition)])
+
+        selection_key = (
+            print_ast(render_document),
+            json.dumps(variables, sort_keys=True),
+            operation_name
+        )
+        render = self._documents.get(selection_key)
+        if render is None:
+            render = self._make_renderer(render_document, variables, operation_name)
+            self._documents.set(selection_key, render)
+        return field.name.value, arguments, selection_key, render
+
+    def _make_renderer(self, document, variables, operation_name):
+        def render(paste):
+            result = execute(
+                self.event_schema,
+                document,
+                root=paste,
+                variables=variables,
+                operation_name=operation_name
+            )
+            payload = {'data': result.data}
+            if result.errors:
+                payload['errors'] = [format_error(error) for error in result.errors]
+            # Serialized once; each subscriber only wraps it with its own id
+            return json.dumps(payload)
+        return render
+
+
+class _Connection:
+    def __init__(self, server, ws):
+        self.server = server
+        self.ws = ws
+        self.subscribers = {}
+        self.senders = {}
+        self.send_lock = Semaphore()
+        self.closed = False
+
+    def send(self, message_type, op_id=None, payload=None, raw_payload=None):
+        if self.closed:
+            return
+        parts = [f'"type":{json.dumps(message_type)}']
+        if op_id is not None:
+            parts.append(f'"id":{json.dumps(op_id)}')
+        if raw_payload is not None:
+            parts.append(f'"payload":{raw_payload}')
+        elif payload is not None:
+            parts.append(f'"payload":{json.dumps(payload)}')
+        with self.send_lock:
+            self.ws.send('{' + ','.join(parts) + '}')
+
+    def run(self):
+        while not self.closed:
+            message = self.ws.receive()
+            if message is None:
+                break
+            try:
+                message = json.loads(message)
+            except ValueError:
+                self.send('connection_error', payload={'message': 'Invalid JSON'})
+                continue
+
+            message_type = message.get('type')
+            op_id = message.get('id')
+            if message_type == 'connection_init':
+                self.send('connection_ack')
+            elif message_type == 'start':
+                self.start(op_id, message.get('payload') or {})
+            elif message_type == 'stop':
+                self.stop(op_id)
+            elif message_type == 'connection_terminate':
+                break
+            else:
+                self.send('error', op_id, {'message': f'Unknown message type: {message_type}'})
+
+    def start(self, op_id, payload):
+        self.stop(op_id)
+        try:
+            _, arguments, selection_key, render = self.server.build_subscription(payload)
+        except Exception as e:
+            self.send('error', op_id, {'message': str(e)})
+            return
+
+        subscriber = self.server.engine.subscribe(
+            paste_id=arguments.get('id'),
+            title=arguments.get('title'),
+            selection_key=selection_key,
+            render=render,
+            on_overflow=self.overflow
+        )
+        self.subscribers[op_id] = subscriber
+        self.senders[op_id] = gevent.spawn(self.drain, op_id, subscriber)
+
+    def drain(self, op_id, subscriber):
+        while not subscriber.closed:
+            message = subscriber.queue.get()
+            if not isinstance(message, str):
+                continue
+            try:
+                self.send('data', op_id, raw_payload=message)
+            except Exception:
+                logger.info("Subscription socket closed while sending")
+                self.closed = True
+                return
+
+    def overflow(self, subscriber):
+        logger.warning("Disconnecting slow subscription client")
+        self.closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+    def stop(self, op_id):
+        subscriber = self.subscribers.pop(op_id, None)
+        if subscriber is not None:
+            self.server.engine.unsubscribe(subscriber)
+        sender = self.senders.pop(op_id, None)
+        if sender is not None:
+            sender.kill(block=False)
+
+    def close(self):
+        for op_id in list(self.subscribers):
+            self.stop(op_id)
+        self.closed = True
+
+
+class WebSocketMiddleware(SocketMiddleware):
+    def __call__(self, environ, start_response):
+        # Plain HTTP requests never match a websocket rule; let Flask answer them
+        if 'wsgi.websocket' not in environ:
+            return self.wsgi_app(environ, start_response)
+        return super().__call__(environ, start_response)
+
+
+class WebSocketRoutes(Sockets):
+    """flask-sockets with its rules marked as websocket rules.
+
+    Werkzeug 2.2 raises WebsocketMismatch when a websocket handshake matches
+    a plain rule, which is all flask-sockets registers.
+    """
+
+    def init_app(self, app):
+        app.wsgi_app = WebSocketMiddleware(app.wsgi_app, app, self)
+
+    def add_url_rule(self, rule, _, f, **options):
+        self.url_map.add(Rule(rule, endpoint=f, websocket=True))
@@ -0,0 +1,144 @@
+import json
+import zlib
+from difflib import SequenceMatcher
+from flask import current_app, has_app_context
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.sql import func
+
+from .bus import event_bus
+from .cache import LRUCache
+from .models import db, Paste, PasteVersion
+
+DEFAULT_SNAPSHOT_INTERVAL = 20
+
+# Reconstructed version texts keyed on (paste_id, version). Only committed
+# versions are cached, and a paste's entries are dropped when it is deleted,
+# since SQLite can hand its id to the next paste.
+version_cache = LRUCache(maxsize=512)
+
+
+def snapshot_interval():
+    if has_app_context():
+        return current_app.config.get('PASTE_VERSION_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL)
+    return DEFAULT_SNAPSHOT_INTERVAL
+
+
+def is_snapshot_version(version, interval=None):
+    """Version 1 and every ``interval``-th version after it store full text."""
+    return (version - 1) % (interval or snapshot_interval()) == 0
+
+
+def make_delta(old, new):
+    """Encode ``new`` as zlib-compressed line operations against ``old``.
+
+    The payload is a JSON list where ``[i, j]`` copies old lines ``i:j`` and
+    a string inserts literal text.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(',', ':')).encode('utf-8'))
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(zlib.decompress(delta).decode('utf-8')):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(old_lines[op[0]:op[1]])
+    return ''.join(parts)
+
+
+def build_version(paste, version, content, previous_content=None, interval=None):
+    """Return a PasteVersion row storing ``content`` as a snapshot or a delta."""
+    if previous_content is None or is_snapshot_version(version, interval):
+        row = PasteVersion(paste=paste, version=version, content=content, is_snapshot=True)
+    else:
+        row = PasteVersion(
+            paste=paste,
+            version=version,
+            content='',
+            delta=make_delta(previous_content, content),
+            is_snapshot=False
+        )
+    # Cached once the row is committed
+    row.full_content = content
+    return row
+
+
+def forget_pastes(paste_ids, publish=True):
+    """Drop the cached versions of deleted pastes, here and in other workers."""
+    paste_ids = set(paste_ids)
+    if paste_ids:
+        version_cache.discard(lambda key: key[0] in paste_ids)
+        if publish:
+            event_bus.publish('paste_versions', paste_ids=sorted(paste_ids))
+
+
+def get_version_content(paste_id, version):
+    """Reconstruct the text of one version from its nearest snapshot."""
+    content = version_cache.get((paste_id, version))
+    if content is not None:
+        return content
+
+    base = db.session.query(func.max(PasteVersion.version)).filter(
+        PasteVersion.paste_id == paste_id,
+        PasteVersion.is_snapshot.is_(True),
+        PasteVersion.version <= version
+    ).scalar()
+    if base is None:
+        return None
+
+    rows = PasteVersion.query.filter(
+        PasteVersion.paste_id == paste_id,
+        PasteVersion.version >= base,
+        PasteVersion.version <= version
+    ).order_by(PasteVersion.version).all()
+
+    content = None
+    for row in rows:
+        content = row.content if row.is_snapshot else apply_delta(content, row.delta)
+
+    if rows and rows[-1].version == version:
+        version_cache.set((paste_id, version), content)
+        return content
+    return None
+
+
+@db.event.listens_for(PasteVersion, 'after_insert')
+def version_insert_listener(mapper, connection, target):
+    content = getattr(target, 'full_content', None)
+    session = object_session(target)
+    if content is not None and session is not None:
+        session.info.setdefault('version_cache', []).append(((target.paste_id, target.version), content))
+
+
+@db.event.listens_for(Paste, 'after_delete')
+def paste_versions_delete_listener(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('forgotten_pastes', set()).add(target.id)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def cache_committed_versions(session):
+    forget_pastes(session.info.pop('forgotten_pastes', ()))
+    for key, content in session.info.pop('version_cache', ()):
+        version_cache.set(key, content)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def discard_rolled_back_versions(session):
+    session.info.pop('version_cache', None)
+    session.info.pop('forgotten_pastes', None)
+
+
+event_bus.subscribe('paste_versions', lambda message: forget_pastes(message['paste_ids'], publish=False))
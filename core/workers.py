@@ -0,0 +1,326 @@
+import fcntl
+import logging
+import os
+import signal
+import tempfile
+import time
+
+import gevent
+from gevent import socket
+from gevent.event import Event
+
+from .bus import BusBroker, event_bus
+
+logger = logging.getLogger(__name__)
+
+# This process's place in a pre-fork deployment, reported by /health
+worker_info = {'index': None, 'pid': os.getpid(), 'started': time.time(), 'cluster': [], 'leader': False}
+
+
+def bind_socket(address, reuse_port=False, backlog=1024):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(address)
+    sock.listen(backlog)
+    return sock
+
+
+class WorkerProcess:
+    def __init__(self, index, pid):
+        self.index = index
+        self.pid = pid
+        self.started = time.time()
+        self.last_heartbeat = time.monotonic()
+        self.stats = {}
+        self.retiring = False
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'pid': self.pid,
+            'uptime': round(time.time() - self.started, 1),
+            'heartbeat_age': round(time.monotonic() - self.last_heartbeat, 1),
+            'retiring': self.retiring,
+            'stats': self.stats,
+        }
+
+
+class LeaderLock:
+    """An exclusive flock on ``path``, held by at most one process at a time.
+
+    Workers release it on shutdown, after stopping the jobs it guards, and
+    the kernel drops it if the holder dies, so another worker can only
+    take over once the previous holder's jobs have stopped.
+    """
+
+    def __init__(self, path, poll_interval=1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """Wait (cooperatively) until this process holds the lock."""
+        lock_file = open(self.path, 'a')
+        try:
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    gevent.sleep(self.poll_interval)
+        except BaseException:
+            lock_file.close()
+            raise
+        self._file = lock_file
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class Master:
+    """Pre-fork process manager for running the app on several cores.
+
+    The master binds the listening socket once and forks ``workers``
+    children that all accept on it (with ``reuse_port`` each child binds
+    its own SO_REUSEPORT socket instead and the kernel spreads
+    connections). It also runs the BusBroker that relays event bus
+    messages between workers, and it replaces workers that exit or stop
+    sending heartbeats.
+
+    Signals: SIGTERM/SIGINT stop everything gracefully; SIGHUP replaces the
+    workers one at a time, starting each replacement before the old
+    worker is asked to drain, so capacity never drops.
+
+    ``make_server(listener)`` returns the WSGI server a worker runs;
+    ``before_fork()`` runs in the master before each fork (e.g. to dispose
+    of pooled connections), ``on_worker_start(index)`` and
+    ``on_worker_stop(index)`` run in the worker, and ``worker_stats()``
+    supplies the numbers each heartbeat reports.
+
+    Jobs that must run in exactly one process go in ``on_leader_start()``
+    and ``on_leader_stop()``. Every worker waits on a LeaderLock and only
+    its holder runs them, so they never run twice, not even while an old
+    and a new worker with the same index overlap during a reload.
+    """
+
+    def __init__(self, make_server, workers=2, bind=('127.0.0.1', 5013), reuse_port=False,
+                 bus_path=None, heartbeat_interval=5.0, heartbeat_timeout=30.0,
+                 graceful_timeout=30.0, before_fork=None, on_worker_start=None,
+                 on_worker_stop=None, worker_stats=None, on_leader_start=None,
+                 on_leader_stop=None):
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.make_server = make_server
+        self.worker_count = workers
+        self.bind = bind
+        self.reuse_port = reuse_port
+        self.bus_path = bus_path or os.path.join(tempfile.gettempdir(), f'dvga-bus-{os.getpid()}.sock')
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.graceful_timeout = graceful_timeout
+        self.before_fork = before_fork
+        self.on_worker_start = on_worker_start
+        self.on_worker_stop = on_worker_stop
+        self.worker_stats = worker_stats
+        self.on_leader_start = on_leader_start
+        self.on_leader_stop = on_leader_stop
+        self.lock_path = self.bus_path + '.lock'
+        self.workers = {}
+        self.restarts = 0
+        self.listener = None
+        self.broker = None
+        self._stopping = Event()
+        self._reload_requested = False
+        self._signal_handlers = []
+
+    # Master side
+
+    def run(self):
+        if not self.reuse_port:
+            self.listener = bind_socket(self.bind)
+        self.broker = BusBroker(self.bus_path, on_control=self._on_heartbeat)
+        self.broker.start()
+
+        self._signal_handlers = [
+            gevent.signal_handler(signal.SIGTERM, self._stopping.set),
+            gevent.signal_handler(signal.SIGINT, self._stopping.set),
+            gevent.signal_handler(signal.SIGHUP, self._request_reload),
+        ]
+
+        for index in range(self.worker_count):
+            self.spawn(index)
+        logger.info("Master %s serving on %s:%s with %s workers",
+                    os.getpid(), self.bind[0], self.bind[1], self.worker_count)
+
+        # Forks only ever happen from this loop, so a child never inherits
+        # a suspended master greenlet that could resume in it.
+        try:
+            while not self._stopping.wait(1.0):
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.reload()
+                self.reap()
+                self.check_heartbeats()
+                self.broker.broadcast({'channel': 'workers', 'workers': self.status()})
+        finally:
+            self.shutdown()
+
+    def _request_reload(self):
+        self._reload_requested = True
+
+    def spawn(self, index):
+        if self.before_fork:
+            self.before_fork()
+        pid = gevent.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(index)
+            except BaseException:
+                logger.exception("Worker %s crashed", index)
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = WorkerProcess(index, pid)
+        return pid
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None or worker.retiring or self._stopping.is_set():
+                continue
+            logger.warning("Worker %s (pid %s) exited with status %s; restarting",
+                           worker.index, pid, status)
+            self.restarts += 1
+            self.spawn(worker.index)
+
+    def check_heartbeats(self):
+        deadline = time.monotonic() - self.heartbeat_timeout
+        for worker in list(self.workers.values()):
+            if worker.last_heartbeat < deadline:
+                logger.warning("Worker %s (pid %s) stopped responding; killing it",
+                               worker.index, worker.pid)
+                worker.last_heartbeat = time.monotonic()
+                self._signal(worker.pid, signal.SIGKILL)
+
+    def reload(self):
+        """Replace every worker, one at a time."""
+        for worker in [w for w in self.workers.values() if not w.retiring]:
+            if self._stopping.is_set():
+                return
+            self.spawn(worker.index)
+            worker.retiring = True
+            self._signal(worker.pid, signal.SIGTERM)
+            self._wait_for_exit(worker.pid, self.graceful_timeout + 5)
+        self.restarts += 1
+
+    def shutdown(self):
+        for worker in self.workers.values():
+            worker.retiring = True
+            self._signal(worker.pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            if not self._wait_for_exit(pid, self.graceful_timeout + 5):
+                self._signal(pid, signal.SIGKILL)
+        self.reap()
+        self.broker.stop()
+        if self.listener is not None:
+            self.listener.close()
+        try:
+            os.unlink(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def status(self):
+        return [worker.to_dict() for worker in sorted(self.workers.values(), key=lambda w: w.index)]
+
+    def _on_heartbeat(self, message):
+        worker = self.workers.get(message.get('origin'))
+        if worker is not None:
+            worker.last_heartbeat = time.monotonic()
+            worker.stats = message.get('stats', {})
+
+    def _wait_for_exit(self, pid, timeout):
+        deadline = time.monotonic() + timeout
+        while pid in self.workers and time.monotonic() < deadline:
+            gevent.sleep(0.1)
+            self.reap()
+        return pid not in self.workers
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    # Worker side
+
+    def _run_worker(self, index):
+        for handler in self._signal_handlers:
+            handler.cancel()
+        self.broker.detach()
+        self.workers.clear()
+        # Ctrl-C reaches the whole process group; the master decides when to stop
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        stopping = Event()
+        gevent.signal_handler(signal.SIGTERM, stopping.set)
+        gevent.signal_handler(signal.SIGHUP, lambda: None)
+
+        worker_info.update(index=index, pid=os.getpid(), started=time.time(), cluster=[])
+        event_bus.subscribe('workers', lambda message: worker_info.update(cluster=message['workers']))
+        event_bus.connect(self.bus_path)
+
+        listener = self.listener if self.listener is not None else bind_socket(self.bind, reuse_port=True)
+        server = self.make_server(listener)
+        server.start()
+        if self.on_worker_start:
+            self.on_worker_start(index)
+
+        heartbeat = gevent.spawn(self._heartbeat)
+        leader = gevent.spawn(self._lead) if self.on_leader_start else None
+        stopping.wait()
+
+        heartbeat.kill()
+        if leader is not None:
+            # Hand the singleton jobs over before draining
+            leader.kill()
+        # Stop accepting, then give in-flight requests time to finish
+        server.stop(timeout=self.graceful_timeout)
+        if self.on_worker_stop:
+            self.on_worker_stop(index)
+        event_bus.close()
+
+    def _heartbeat(self):
+        while True:
+            stats = self.worker_stats() if self.worker_stats else {}
+            event_bus.publish('heartbeat', stats=stats)
+            gevent.sleep(self.heartbeat_interval)
+
+    def _lead(self):
+        lock = LeaderLock(self.lock_path)
+        try:
+            lock.acquire()
+            worker_info['leader'] = True
+            logger.info("Worker %s took over the singleton jobs", os.getpid())
+            self.on_leader_start()
+            Event().wait()
+        finally:
+            if worker_info['leader']:
+                worker_info['leader'] = False
+                if self.on_leader_stop:
+                    self.on_leader_stop()
+            lock.release()
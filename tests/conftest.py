@@ -0,0 +1,94 @@
+import itertools
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# app.py configures itself from the environment at import time
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='dvga-tests-'), 'test.db')
+
+from app import app as flask_app  # noqa: E402
+from core.models import db, audit_writer, rate_limiter, ServerMode, User, Paste  # noqa: E402
+from core.response_cache import response_cache  # noqa: E402
+
+_usernames = itertools.count()
+
+
+@pytest.fixture
+def app():
+    """The app over an empty database.
+
+    No application context is left pushed, so every test request gets its
+    own session, as in production.
+    """
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        ServerMode.set_mode('easy')
+    response_cache.clear()
+    rate_limiter.reset()
+    yield flask_app
+    with flask_app.app_context():
+        audit_writer.flush()
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def graphql(client):
+    """POST one operation (or a list of them) to /graphql."""
+    def post(query=None, variables=None, headers=None, **params):
+        body = params.pop('batch', None)
+        if body is None:
+            body = dict(params, query=query, variables=variables or {})
+        return client.post('/graphql', json=body, headers=headers or {})
+    return post
+
+
+@pytest.fixture
+def make_pastes(app):
+    """Create ``users`` users owning ``per_user`` pastes each; returns the paste ids."""
+    def make(users=3, per_user=2, **columns):
+        ids = []
+        with app.app_context():
+            for index in range(users):
+                user = User(username=f'user{next(_usernames)}', password_hash='x')
+                db.session.add(user)
+                db.session.flush()
+                for number in range(per_user):
+                    paste = Paste(
+                        title=f'paste {index}.{number}', content='text', public=True,
+                        user_id=user.id, owner_id=user.id, **columns
+                    )
+                    db.session.add(paste)
+                    db.session.flush()
+                    ids.append(paste.id)
+            db.session.commit()
+        return ids
+    return make
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting the SQL statements run on the primary engine."""
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+    return counting
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table
+
+from core.audit import AuditWriter
+from core.models import db, audit_writer, Audit, Paste
+
+MISSING = Table('no_such_table', MetaData(), Column('id', Integer))
+
+
+def audit_actions(paste_id):
+    audit_writer.flush()
+    return [audit.action for audit in Audit.query.filter_by(paste_id=paste_id)]
+
+
+def test_only_committed_changes_are_audited(app, make_pastes):
+    paste_id, = make_pastes(users=1, per_user=1)
+    with app.app_context():
+        paste = db.session.get(Paste, paste_id)
+        paste.title = 'rolled back'
+        db.session.flush()
+        db.session.rollback()
+        assert audit_actions(paste_id) == []
+
+        paste = db.session.get(Paste, paste_id)
+        paste.title = 'committed'
+        db.session.commit()
+        assert audit_actions(paste_id) == ['update']
+
+
+def test_failed_rows_are_dropped_after_max_attempts(app):
+    writer = AuditWriter(db, max_attempts=2)
+    writer.app = app
+    writer.enqueue(MISSING, id=1)
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            writer.flush()
+
+    assert writer.pending == 0
+    assert writer.dropped == 1
+
+
+def test_rows_beyond_max_pending_are_dropped(app):
+    writer = AuditWriter(db, max_pending=2)
+    for id in range(3):
+        writer.enqueue(MISSING, id=id)
+
+    assert writer.pending == 2
+    assert writer.dropped == 1
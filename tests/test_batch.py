@@ -0,0 +1,32 @@
+import hashlib
+
+PASTES = {'query': '{ pastes { title } }'}
+USERS = {'query': '{ users { username } }'}
+
+
+def test_batch_etag_hashes_operations_in_request_order(graphql, make_pastes):
+    make_pastes(users=2, per_user=1)
+    pastes_etag = graphql(**PASTES).headers['ETag'].strip('"')
+    users_etag = graphql(**USERS).headers['ETag'].strip('"')
+
+    forward = graphql(batch=[PASTES, USERS])
+    backward = graphql(batch=[USERS, PASTES])
+
+    expected = hashlib.sha1(f'{pastes_etag}/{users_etag}'.encode('utf-8')).hexdigest()
+    assert forward.headers['ETag'] == f'"{expected}"'
+    assert backward.headers['ETag'] != forward.headers['ETag']
+
+
+def test_batch_operations_share_the_request_loaders(graphql, make_pastes, count_queries):
+    make_pastes(users=2, per_user=2)
+    first = {'query': '{ users { pastes { title } } }'}
+    second = {'query': '{ users { username pastes { id } } }'}
+
+    with count_queries() as statements:
+        response = graphql(batch=[first, second])
+
+    body = response.get_json()
+    assert [len(result['data']['users']) for result in body] == [2, 2]
+    assert 'username' in body[1]['data']['users'][0]
+    # The second operation's lookups are answered from the first's
+    assert len([s for s in statements if 'pastes.user_id IN' in s]) == 1
@@ -0,0 +1,66 @@
+import jwt
+import pytest
+from sqlalchemy import event
+
+from core.models import db, Audit, Paste, PasteVersion, User
+
+READ = 'query Read($id: Int!) { readAndBurn(id: $id) { title content } }'
+
+
+@pytest.fixture(params=[True, False], ids=['delete-returning', 'claim-update'])
+def dialect(request, app, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'delete_returning', request.param)
+
+
+@pytest.fixture
+def foreign_keys(app):
+    """Enforce foreign keys, which SQLite leaves off by default."""
+    def enable(dbapi_connection, record):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+    with app.app_context():
+        engine = db.engine
+    engine.dispose()
+    event.listen(engine, 'connect', enable)
+    yield
+    event.remove(engine, 'connect', enable)
+    engine.dispose()
+
+
+def bearer(app, username):
+    token = jwt.encode({'identity': username}, app.config['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_burned_paste_is_read_once_and_its_audits_replaced(app, graphql, make_pastes, dialect, foreign_keys):
+    paste_id, = make_pastes(users=1, per_user=1, burn=True)
+    with app.app_context():
+        owner_id = db.session.get(Paste, paste_id).owner_id
+        reader = User(username='reader', password_hash='x')
+        db.session.add(reader)
+        db.session.add(PasteVersion(paste_id=paste_id, content='text', version=1))
+        db.session.add(Audit(paste_id=paste_id, action='view'))
+        db.session.commit()
+        reader_id = reader.id
+
+    first = graphql(READ, {'id': paste_id}, headers=bearer(app, 'reader')).get_json()
+    second = graphql(READ, {'id': paste_id}).get_json()
+
+    assert first['data']['readAndBurn']['content'] == 'text'
+    assert second['data']['readAndBurn'] is None
+    with app.app_context():
+        assert db.session.get(Paste, paste_id) is None
+        assert PasteVersion.query.filter_by(paste_id=paste_id).count() == 0
+        assert Audit.query.filter_by(paste_id=paste_id).count() == 0
+        audits = Audit.query.filter(Audit.action.in_(['burn', 'delete'])).order_by(Audit.action)
+        assert [(a.action, a.paste_id, a.user_id) for a in audits] == [
+            ('burn', None, reader_id), ('delete', None, owner_id)
+        ]
+
+
+def test_pastes_without_burn_are_not_returned(graphql, make_pastes):
+    paste_id, = make_pastes(users=1, per_user=1)
+
+    assert graphql(READ, {'id': paste_id}).get_json()['data']['readAndBurn'] is None
+    assert graphql('{ pastes { title } }').get_json()['data']['pastes'] == [{'title': 'paste 0.0'}]
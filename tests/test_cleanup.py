@@ -0,0 +1,101 @@
+import re
+from datetime import datetime, timedelta
+
+import gevent
+import pytest
+
+from core import db_migrate
+from core.db_migrate import CLEANUP_CHECKPOINT, CleanupJob, cleanup_database
+from core.models import db, MaintenanceCheckpoint, Paste, UserSession
+
+
+def add_sessions(app, count, expires_at):
+    with app.app_context():
+        for _ in range(count):
+            db.session.add(UserSession(expires_at=expires_at))
+        db.session.commit()
+
+
+def count_rows(app, model):
+    with app.app_context():
+        return model.query.count()
+
+
+def test_cleanup_deletes_in_chunks_of_at_most_chunk_size(app, count_queries):
+    past = datetime.utcnow() - timedelta(hours=1)
+    add_sessions(app, 7, past)
+    add_sessions(app, 2, datetime.utcnow() + timedelta(hours=1))
+
+    with count_queries() as statements:
+        with app.app_context():
+            report = cleanup_database(chunk_size=3)
+
+    deletes = [s for s in statements if s.startswith('DELETE FROM user_sessions')]
+    assert [len(re.findall(r'\?', s)) for s in deletes] == [3, 3, 1]
+    assert report['sessions']['rows'] == 7
+    assert report['sessions']['chunks'] == 3
+    assert count_rows(app, UserSession) == 2
+
+
+def test_cleanup_reports_throughput_and_lock_time(app, make_pastes):
+    add_sessions(app, 5, datetime.utcnow() - timedelta(hours=1))
+    make_pastes(users=1, per_user=4, expires_at=datetime.utcnow() - timedelta(hours=1))
+
+    with app.app_context():
+        report = cleanup_database(chunk_size=2)
+
+    assert report['pastes']['rows'] == 4
+    for stats in (report['sessions'], report['pastes']):
+        assert stats['rows_per_second'] > 0
+        assert 0 < stats['max_lock_seconds'] <= stats['lock_seconds'] <= stats['seconds']
+    assert report['audits'] == {
+        'rows': 0, 'chunks': 0, 'lock_seconds': 0.0, 'max_lock_seconds': 0.0,
+        'seconds': report['audits']['seconds'], 'rows_per_second': 0.0,
+    }
+
+
+def test_interrupted_cleanup_resumes_from_its_checkpoint(app, make_pastes, monkeypatch):
+    add_sessions(app, 3, datetime.utcnow() - timedelta(hours=1))
+    make_pastes(users=1, per_user=3, expires_at=datetime.utcnow() - timedelta(hours=1))
+
+    def interrupt(ids):
+        raise RuntimeError('interrupted')
+
+    monkeypatch.setattr(db_migrate, '_delete_paste_dependents', interrupt)
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            cleanup_database(chunk_size=2)
+        checkpoint = db.session.get(MaintenanceCheckpoint, CLEANUP_CHECKPOINT)
+        assert checkpoint.phase == 'pastes'
+        started = datetime.fromisoformat(checkpoint.get_state()['now'])
+    assert count_rows(app, UserSession) == 0
+    assert count_rows(app, Paste) == 3
+
+    # Expired by now, but not at the cutoff the interrupted run chose
+    gevent.sleep(0.01)
+    late = make_pastes(users=1, per_user=1, expires_at=datetime.utcnow())
+    monkeypatch.undo()
+    with app.app_context():
+        report = cleanup_database(chunk_size=2)
+        assert db.session.get(MaintenanceCheckpoint, CLEANUP_CHECKPOINT) is None
+
+    assert 'sessions' not in report
+    assert report['pastes']['rows'] == 3
+    with app.app_context():
+        assert [p.id for p in Paste.query] == late
+        assert db.session.get(Paste, late[0]).expires_at > started
+
+
+def test_cleanup_job_runs_on_its_interval(app):
+    add_sessions(app, 2, datetime.utcnow() - timedelta(hours=1))
+    job = CleanupJob(interval=0.01)
+    job.app = app
+    job.start()
+    try:
+        gevent.sleep(0.1)
+    finally:
+        job.stop()
+
+    # Later runs find nothing left to delete
+    assert job.last_report['sessions']['rows'] == 0
+    assert count_rows(app, UserSession) == 0
@@ -0,0 +1,36 @@
+from core.models import ServerMode
+
+
+def test_successful_query_reports_cost_in_extensions(graphql, make_pastes):
+    make_pastes(users=1, per_user=1)
+
+    response = graphql('{ pastes(limit: 5) { title owner { username } } }')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['data']['pastes'][0]['title'] == 'paste 0.0'
+    cost = body['extensions']['cost']
+    assert cost['depth'] == 3
+    assert cost['rows'] >= 5
+    assert set(cost) == {'depth', 'fields', 'cost', 'rows'}
+
+
+def test_batch_results_each_carry_their_cost(graphql):
+    response = graphql(batch=[{'query': '{ pastes { id } }'}, {'query': '{ users { id } }'}])
+
+    assert response.status_code == 200
+    assert all('cost' in result['extensions'] for result in response.get_json())
+
+
+def test_query_over_the_limit_is_rejected_with_its_cost(app, graphql):
+    with app.app_context():
+        ServerMode.set_mode('hard')
+    deep = '{ pastes { owner { pastes { owner { pastes { owner { pastes { owner { id } } } } } } } } }'
+
+    response = graphql(deep)
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert 'exceeds the limit' in body['errors'][0]['message']
+    assert body['extensions']['cost']['depth'] > 8
+    assert 'data' not in body
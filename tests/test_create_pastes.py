@@ -0,0 +1,53 @@
+import jwt
+
+from core.models import db, Paste, User
+
+CREATE_ONE = '''mutation ($title: String!) {
+  createPaste(title: $title, content: "text") { paste { title owner { username } } }
+}'''
+
+
+def bearer(app, username):
+    token = jwt.encode({'identity': username}, app.config['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_created_paste_belongs_to_the_token_user(app, graphql):
+    with app.app_context():
+        db.session.add(User(username='author', password_hash='x'))
+        db.session.commit()
+
+    owned = graphql(CREATE_ONE, {'title': 'mine'}, headers=bearer(app, 'author')).get_json()
+    anonymous = graphql(CREATE_ONE, {'title': 'anonymous'}).get_json()
+
+    assert owned['data']['createPaste']['paste']['owner'] == {'username': 'author'}
+    assert anonymous['data']['createPaste']['paste']['owner'] is None
+    with app.app_context():
+        paste = Paste.query.filter_by(title='mine').one()
+        assert paste.user_id == paste.owner_id == User.query.filter_by(username='author').one().id
+
+
+CREATE_MANY = '''mutation ($inputs: [PasteInput!]!) {
+  createPastes(inputs: $inputs) { pastes { id title } }
+}'''
+
+
+def test_bulk_created_pastes_belong_to_the_token_user_and_are_searchable(app, graphql, count_queries):
+    with app.app_context():
+        user = User(username='author', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    inputs = [{'title': f'zebra {n}', 'content': 'striped'} for n in range(5)]
+
+    with count_queries() as statements:
+        response = graphql(CREATE_MANY, {'inputs': inputs}, headers=bearer(app, 'author'))
+
+    assert 'errors' not in response.get_json()
+    assert len([s for s in statements if s.startswith('INSERT INTO paste_search')]) == 1
+    with app.app_context():
+        assert {p.user_id for p in Paste.query} == {user_id}
+        assert {p.owner_id for p in Paste.query} == {user_id}
+
+    found = graphql('{ search(keyword: "zebra") { ... on Paste { title } } }').get_json()
+    assert sorted(hit['title'] for hit in found['data']['search']) == [i['title'] for i in inputs]
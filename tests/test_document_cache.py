@@ -0,0 +1,54 @@
+import pytest
+
+from app import graphql_backend
+from core.cache import LRUCache
+
+
+@pytest.fixture
+def documents(monkeypatch):
+    cache = LRUCache(maxsize=2)
+    monkeypatch.setattr(graphql_backend, 'document_cache', cache)
+    return cache
+
+
+def test_repeated_query_text_is_parsed_once(graphql, make_pastes, documents):
+    make_pastes(users=1, per_user=1)
+
+    for _ in range(3):
+        assert graphql('{ pastes { title } }').get_json()['data']['pastes'] == [{'title': 'paste 0.0'}]
+
+    assert (documents.misses, documents.hits, len(documents)) == (1, 2, 1)
+
+
+def test_least_recently_used_document_is_evicted(graphql, documents):
+    for query in ('{ pastes { id } }', '{ users { id } }', '{ pastes { id } }', '{ pastes { title } }'):
+        assert 'errors' not in graphql(query).get_json()
+
+    assert documents.evictions == 1
+    # users was the least recently used entry; pastes { id } is kept
+    assert graphql('{ pastes { id } }').status_code == 200
+    assert documents.hits == 2
+    graphql('{ users { id } }')
+    assert documents.misses == 4
+
+
+def test_one_cached_document_serves_each_operation_by_name(graphql, make_pastes, documents):
+    make_pastes(users=1, per_user=1)
+    document = 'query Pastes { pastes { title } } query Users { users { id } }'
+
+    pastes = graphql(document, operationName='Pastes').get_json()
+    users = graphql(document, operationName='Users').get_json()
+    missing = graphql(document).get_json()
+
+    assert pastes['data'] == {'pastes': [{'title': 'paste 0.0'}]}
+    assert list(users['data']) == ['users']
+    assert 'operation name' in missing['errors'][0]['message']
+    assert (documents.misses, len(documents)) == (1, 1)
+
+
+def test_validation_errors_are_cached_with_the_document(graphql, documents):
+    for _ in range(2):
+        body = graphql('{ pastes { nope } }').get_json()
+        assert 'Cannot query field "nope"' in body['errors'][0]['message']
+
+    assert (documents.misses, documents.hits) == (1, 1)
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+from core.engine import engine_options
+from core.models import db, read_router
+
+
+def test_file_databases_get_a_queue_pool_and_memory_ones_do_not():
+    options = engine_options('sqlite:////tmp/app.db', pool_size=4)
+
+    assert options['poolclass'] is QueuePool
+    assert options['pool_size'] == 4
+    assert options['connect_args'] == {'check_same_thread': False}
+    assert engine_options('sqlite://') == {}
+
+
+def test_pragmas_are_set_on_every_new_connection(app):
+    with app.app_context():
+        db.engine.dispose()
+        with db.engine.connect() as connection:
+            pragma = lambda name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            assert pragma('journal_mode') == 'wal'
+            assert pragma('synchronous') == 1  # NORMAL
+            assert pragma('busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT']
+            assert pragma('query_only') == 0
+
+
+@pytest.fixture
+def routed_reads(app, monkeypatch):
+    """Turn on read routing for one test, restoring the router afterwards."""
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_READ_ROUTING', True)
+    # The router registers a teardown, which Flask refuses once serving
+    monkeypatch.setattr(app, '_got_first_request', False)
+    monkeypatch.setattr(app, 'teardown_appcontext_funcs', list(app.teardown_appcontext_funcs))
+    monkeypatch.setitem(app.extensions, 'read_router', read_router)
+    monkeypatch.setattr(read_router, 'engine', None)
+    monkeypatch.setattr(read_router, '_session', None)
+    read_router.init_app(app)
+    yield read_router
+    read_router.engine.dispose()
+
+
+def test_read_only_resolvers_use_the_read_engine(app, graphql, make_pastes, routed_reads):
+    make_pastes(users=2, per_user=2)
+    statements = {'primary': [], 'read': []}
+
+    def recorder(name):
+        return lambda conn, cursor, statement, *args: statements[name].append(statement)
+
+    with app.app_context():
+        primary = db.engine
+    listeners = [(primary, recorder('primary')), (routed_reads.engine, recorder('read'))]
+    for engine, listener in listeners:
+        event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        body = graphql('{ pastes { title owner { username } } }').get_json()
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+    assert len(body['data']['pastes']) == 4
+    assert any('FROM pastes' in s for s in statements['read'])
+    # The owners are joined into the pastes SELECT
+    assert any('JOIN users' in s for s in statements['read'])
+    assert not [s for s in statements['primary'] if 'FROM pastes' in s or 'FROM users' in s]
+
+
+def test_the_read_engine_cannot_write(routed_reads):
+    with routed_reads.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("INSERT INTO users (username) VALUES ('x')")
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from core.expiry import expiry_scheduler
+from core.models import db, Paste
+
+LISTS = '''{
+  pastes { id }
+  pastesConnection(first: 10) { edges { node { id } } }
+}'''
+
+
+def test_expired_pastes_are_hidden_before_they_are_deleted(graphql, make_pastes):
+    now = datetime.utcnow()
+    [expired] = make_pastes(users=1, per_user=1, expires_at=now - timedelta(seconds=1))
+    [expiring] = make_pastes(users=1, per_user=1, expires_at=now + timedelta(hours=1))
+    [permanent] = make_pastes(users=1, per_user=1)
+    visible = {str(expiring), str(permanent)}
+
+    data = graphql(LISTS).get_json()['data']
+    assert {paste['id'] for paste in data['pastes']} == visible
+    assert {edge['node']['id'] for edge in data['pastesConnection']['edges']} == visible
+
+    single = 'query ($id: Int) { paste(id: $id) { id } }'
+    assert graphql(single, {'id': expired}).get_json()['data']['paste'] is None
+    assert graphql(single, {'id': expiring}).get_json()['data']['paste'] == {'id': str(expiring)}
+
+
+def test_scheduler_deletes_only_due_pastes(app, make_pastes):
+    now = datetime.utcnow()
+    due = make_pastes(users=1, per_user=3, expires_at=now - timedelta(seconds=1))
+    [later] = make_pastes(users=1, per_user=1, expires_at=now + timedelta(hours=1))
+
+    try:
+        with app.app_context():
+            assert expiry_scheduler.run_pending(now) == len(due)
+            assert [paste.id for paste in Paste.query] == [later]
+            assert db.session.execute(db.text('SELECT count(*) FROM paste_search')).scalar() == 1
+    finally:
+        # Drop the loaded deadlines
+        expiry_scheduler.stop()
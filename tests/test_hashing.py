@@ -0,0 +1,31 @@
+from core import models
+from core.models import db, User
+
+
+def recording_hasher(monkeypatch):
+    """Replace the hasher; records whether the session held a transaction for each hash."""
+    held = []
+
+    def hash(password):
+        held.append(db.session().in_transaction())
+        return 'hashed'
+
+    monkeypatch.setattr(models.password_hasher, 'hash', hash)
+    return held
+
+
+def test_create_user_hashes_before_using_the_session(app, monkeypatch):
+    held = recording_hasher(monkeypatch)
+    with app.app_context():
+        user = User.create_user('hashed', 'secret')
+        assert user.password_hash == 'hashed'
+    assert held == [False]
+
+
+def test_setting_a_password_does_not_end_the_transaction(app, monkeypatch):
+    recording_hasher(monkeypatch)
+    with app.app_context():
+        User.query.count()
+        user = User(username='hashed', password='secret')
+        assert db.session().in_transaction()
+        assert user.password_hash == 'hashed'
@@ -0,0 +1,7 @@
+def test_health_reports_database_connected(client):
+    response = client.get('/health')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'healthy'
+    assert body['database'] == 'connected'
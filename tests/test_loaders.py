@@ -0,0 +1,32 @@
+NESTED = '{ pastes { title owner { username pastes { title } ownedPastes { title } } } }'
+
+
+def test_nested_query_returns_related_pastes(graphql, make_pastes):
+    make_pastes(users=2, per_user=2)
+
+    response = graphql(NESTED)
+
+    body = response.get_json()
+    assert 'errors' not in body
+    pastes = body['data']['pastes']
+    assert len(pastes) == 4
+    for paste in pastes:
+        titles = [p['title'] for p in paste['owner']['pastes']]
+        assert paste['title'] in titles
+        assert titles == [p['title'] for p in paste['owner']['ownedPastes']]
+
+
+def test_depth_three_query_count_does_not_grow_with_rows(graphql, make_pastes, count_queries):
+    make_pastes(users=3, per_user=2)
+    with count_queries() as small:
+        assert 'errors' not in graphql(NESTED).get_json()
+
+    make_pastes(users=20, per_user=5)
+    with count_queries() as large:
+        assert 'errors' not in graphql(NESTED).get_json()
+
+    # pastes (+ joined owner), then one IN (...) query per collection;
+    # the server mode recheck runs on a timer and is not counted
+    small, large = ([s for s in statements if 'server_mode' not in s] for statements in (small, large))
+    assert len(large) <= 3
+    assert len(large) == len(small)
@@ -0,0 +1,49 @@
+import graphene
+from promise import Promise
+
+from core.metrics import MetricsMiddleware, resolver_errors, resolver_seconds
+
+
+class Probe(graphene.ObjectType):
+    name = graphene.String()
+    computed = graphene.String()
+    failing = graphene.String()
+
+    def resolve_computed(root, info):
+        return Promise.resolve('done')
+
+    def resolve_failing(root, info):
+        return Promise.reject(ValueError('loader failed'))
+
+
+class ProbeQuery(graphene.ObjectType):
+    probe = graphene.Field(Probe)
+
+    def resolve_probe(root, info):
+        return Probe(name='probe')
+
+
+schema = graphene.Schema(query=ProbeQuery)
+
+
+def run(middleware):
+    return schema.execute('{ probe { name computed failing } }', middleware=[middleware])
+
+
+def test_attribute_fields_are_not_timed_by_default():
+    before = {field: resolver_seconds.count(field) for field in ('Probe.name', 'Probe.computed')}
+
+    result = run(MetricsMiddleware(sample_rate=1.0))
+
+    assert result.data['probe'] == {'name': 'probe', 'computed': 'done', 'failing': None}
+    assert resolver_seconds.count('Probe.name') == before['Probe.name']
+    assert resolver_seconds.count('Probe.computed') == before['Probe.computed'] + 1
+
+
+def test_rejected_promises_are_counted_as_errors():
+    before = resolver_errors.value('Probe.failing')
+
+    result = run(MetricsMiddleware(sample_rate=0.0))
+
+    assert 'loader failed' in str(result.errors[0])
+    assert resolver_errors.value('Probe.failing') == before + 1
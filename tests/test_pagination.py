@@ -0,0 +1,34 @@
+from datetime import datetime
+
+PAGE = '''query ($after: String) {
+  pastesConnection(first: 3, after: $after, public: true) {
+    edges { cursor node { id } }
+    pageInfo { hasNextPage endCursor }
+  }
+}'''
+
+
+def test_cursors_page_through_ties_without_gaps_or_repeats(graphql, make_pastes):
+    # Equal created_at values are ordered by id
+    ids = make_pastes(users=2, per_user=4, created_at=datetime(2024, 1, 1))
+
+    seen, after, pages = [], None, 0
+    while True:
+        connection = graphql(PAGE, {'after': after}).get_json()['data']['pastesConnection']
+        seen += [int(edge['node']['id']) for edge in connection['edges']]
+        pages += 1
+        if pages == 1:
+            # Newer pastes written mid-scan sort before the cursor and do not shift later pages
+            make_pastes(users=1, per_user=2)
+        if not connection['pageInfo']['hasNextPage']:
+            break
+        after = connection['pageInfo']['endCursor']
+
+    assert seen == sorted(ids, reverse=True)
+    assert pages == 3
+
+
+def test_invalid_cursor_is_rejected(graphql):
+    body = graphql(PAGE, {'after': 'not a cursor'}).get_json()
+
+    assert body['errors'][0]['message'] == 'Invalid cursor'
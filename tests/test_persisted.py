@@ -0,0 +1,41 @@
+from core.persisted import query_hash
+
+QUERY = '{ pastes { title } }'
+
+
+def persisted(digest):
+    return {'persistedQuery': {'version': 1, 'sha256Hash': digest}}
+
+
+def test_unknown_hash_then_registration(graphql):
+    digest = query_hash(QUERY)
+
+    missing = graphql(extensions=persisted(digest))
+    registered = graphql(QUERY, extensions=persisted(digest))
+    by_hash = graphql(extensions=persisted(digest))
+
+    assert missing.status_code == 200
+    assert missing.get_json()['errors'][0]['message'] == 'PersistedQueryNotFound'
+    assert registered.get_json()['data'] == {'pastes': []}
+    assert by_hash.get_json()['data'] == {'pastes': []}
+
+
+def test_hash_mismatch_is_rejected(graphql):
+    response = graphql(QUERY, extensions=persisted(query_hash('{ users { id } }')))
+
+    assert response.status_code == 400
+    assert 'does not match' in response.get_json()['errors'][0]['message']
+
+
+def test_unknown_hash_fails_only_its_batch_entry(graphql):
+    response = graphql(batch=[
+        {'query': QUERY},
+        {'extensions': persisted(query_hash('{ unknown }'))},
+        {'query': '{ users { username } }'},
+    ])
+
+    assert response.status_code == 200
+    first, missing, last = response.get_json()
+    assert first['data'] == {'pastes': []}
+    assert missing['errors'][0]['message'] == 'PersistedQueryNotFound'
+    assert last['data'] == {'users': []}
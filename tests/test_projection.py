@@ -0,0 +1,53 @@
+def paste_selects(statements):
+    return [s for s in statements if s.startswith('SELECT') and 'FROM pastes' in s]
+
+
+def run(graphql, count_queries, query):
+    with count_queries() as statements:
+        body = graphql(query).get_json()
+    assert 'errors' not in body
+    return body, statements
+
+
+def test_unrequested_columns_are_not_selected(graphql, make_pastes, count_queries):
+    make_pastes(users=1, per_user=2)
+
+    body, statements = run(graphql, count_queries, '{ pastes { title } }')
+
+    assert [p['title'] for p in body['data']['pastes']] == ['paste 0.0', 'paste 0.1']
+    [select] = paste_selects(statements)
+    assert 'pastes.title' in select
+    assert 'pastes.content' not in select
+    assert 'JOIN' not in select
+
+
+def test_requested_columns_are_selected(graphql, make_pastes, count_queries):
+    make_pastes(users=1, per_user=1)
+
+    _, statements = run(graphql, count_queries, '{ pastes { title content } }')
+
+    [select] = paste_selects(statements)
+    assert 'pastes.content' in select
+
+
+def test_connection_nodes_are_projected(graphql, make_pastes, count_queries):
+    make_pastes(users=1, per_user=2)
+
+    _, statements = run(graphql, count_queries, '{ pastesConnection { edges { node { title } } } }')
+
+    assert paste_selects(statements)
+    assert not [s for s in paste_selects(statements) if 'pastes.content' in s]
+
+
+def test_selected_relationship_is_joined(graphql, make_pastes, count_queries):
+    make_pastes(users=2, per_user=2)
+
+    body, statements = run(graphql, count_queries, '{ pastes { title owner { username } } }')
+
+    assert all(p['owner']['username'] for p in body['data']['pastes'])
+    [select] = paste_selects(statements)
+    assert 'JOIN users' in select
+    assert 'username' in select
+    assert 'password_hash' not in select
+    assert 'pastes.content' not in select
+    assert not [s for s in statements if s.startswith('SELECT') and 'FROM users' in s]
@@ -0,0 +1,66 @@
+from core.models import db, rate_limiter, User
+from core.ratelimit import RateLimiter
+
+
+def stored_count(app, username):
+    with app.app_context():
+        count = db.session.query(User.request_count).filter_by(username=username).scalar()
+        db.session.remove()
+        return count
+
+
+def test_workers_add_their_counts_instead_of_overwriting(app):
+    with app.app_context():
+        db.session.add(User(username='counted', password_hash='x', request_count=0))
+        db.session.commit()
+    # Two worker processes, each with its own in-memory counters
+    first, second = RateLimiter(db), RateLimiter(db)
+    first.app = second.app = app
+
+    for _ in range(3):
+        first.record_request('counted')
+    for _ in range(2):
+        second.record_request('counted')
+    first.flush()
+    second.flush()
+    first.record_request('counted')
+    first.flush()
+
+    assert stored_count(app, 'counted') == 6
+
+
+def test_reset_zeroes_stored_counts(app):
+    with app.app_context():
+        db.session.add(User(username='reset', password_hash='x', request_count=0))
+        db.session.commit()
+    rate_limiter.record_request('reset')
+    rate_limiter.flush()
+    rate_limiter.record_request('reset')
+
+    rate_limiter.reset()
+    rate_limiter.flush()
+
+    assert stored_count(app, 'reset') == 0
+    with app.app_context():
+        assert db.session.query(User.last_request).filter_by(username='reset').scalar() is None
+
+
+def test_user_request_count_includes_unwritten_requests_and_resets(app, graphql):
+    with app.app_context():
+        db.session.add(User(username='reader', password_hash='x', request_count=0))
+        db.session.commit()
+
+    def reported():
+        users = graphql('{ users { username requestCount lastRequest } }').get_json()['data']['users']
+        return next(user for user in users if user['username'] == 'reader')
+
+    rate_limiter.record_request('reader')
+    rate_limiter.record_request('reader')
+    assert reported()['requestCount'] == 2
+    assert reported()['lastRequest'] is not None
+
+    rate_limiter.flush()
+    assert reported()['requestCount'] == 2
+
+    rate_limiter.reset()
+    assert reported()['requestCount'] == 0
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from core.models import db, Paste
+from core.response_cache import response_cache
+
+PASTE = 'query ($id: Int) { paste(id: $id) { title } }'
+
+
+@pytest.fixture
+def get(client):
+    """GET a query from /graphql; conditional requests apply to GET only."""
+    def send(query, variables=None, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        params = {'query': query, 'variables': json.dumps(variables or {})}
+        return client.get('/graphql', query_string=params, headers=headers)
+    return send
+
+
+def test_matching_etag_gets_not_modified(get, graphql, make_pastes):
+    [paste_id] = make_pastes(users=1, per_user=1)
+
+    first = get(PASTE, {'id': paste_id})
+    assert first.status_code == 200
+    assert first.headers.get('ETag')
+
+    again = get(PASTE, {'id': paste_id}, etag=first.headers['ETag'])
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert not again.data
+
+    # The same query POSTed shares the cache entry and its ETag
+    assert graphql(PASTE, {'id': paste_id}).headers['ETag'] == first.headers['ETag']
+
+
+def test_a_write_invalidates_only_entries_tagged_with_it(app, get, make_pastes):
+    edited, untouched = make_pastes(users=2, per_user=1)
+    etags = {id: get(PASTE, {'id': id}).headers['ETag'] for id in (edited, untouched)}
+    users = get('{ users { username } }').headers['ETag']
+
+    with app.app_context():
+        db.session.get(Paste, edited).title = 'edited'
+        db.session.commit()
+
+    hits, misses = response_cache.hits, response_cache.misses
+    # Paste writes do not touch the users query's tags
+    assert get('{ users { username } }', etag=users).status_code == 304
+    assert response_cache.hits == hits + 1
+
+    response = get(PASTE, {'id': edited}, etag=etags[edited])
+    assert response.status_code == 200
+    assert response.get_json()['data']['paste']['title'] == 'edited'
+    assert response.headers['ETag'] != etags[edited]
+
+    # paste(...) entries carry the root field tag and are re-executed, but an
+    # unchanged result hashes to the same ETag
+    assert get(PASTE, {'id': untouched}, etag=etags[untouched]).status_code == 304
+    assert response_cache.misses == misses + 2
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+
+import core.rollups
+from core.models import db, Audit, AuditRollup
+
+HOUR = datetime(2024, 1, 1, 10)
+
+
+def audit(minute, second=0, action='view', **columns):
+    return dict(columns, action=action, timestamp=HOUR.replace(minute=minute, second=second))
+
+
+def rollup_counts(period):
+    rows = db.session.query(AuditRollup).filter_by(period=period).all()
+    return {(row.bucket, row.action): row.count for row in rows}
+
+
+@pytest.fixture(params=['upsert', 'update-then-insert'])
+def write_audits(request, app, monkeypatch):
+    if request.param == 'update-then-insert':
+        # Dialects without INSERT ... ON CONFLICT
+        monkeypatch.setattr(core.rollups, '_upsert_statement', lambda connection, table: None)
+
+    def write(rows):
+        with app.app_context():
+            with db.engine.begin() as connection:
+                Audit.insert_many(connection, rows)
+    return write
+
+
+def test_batches_add_to_existing_buckets(app, write_audits):
+    write_audits([audit(0, 10), audit(0, 50), audit(0, 20, action='create')])
+    write_audits([audit(0, 30), audit(59, 59)])
+
+    with app.app_context():
+        assert rollup_counts('minute') == {
+            (HOUR, 'view'): 3,
+            (HOUR, 'create'): 1,
+            (HOUR.replace(minute=59), 'view'): 1,
+        }
+        assert rollup_counts('hour') == {(HOUR, 'view'): 4, (HOUR, 'create'): 1}
+        assert db.session.query(Audit).count() == 5
+
+
+def test_counts_query_matches_raw_audits_across_partial_hours(app, graphql, write_audits):
+    write_audits([audit(minute, action=action) for minute in (5, 30, 55) for action in ('view', 'edit')])
+    write_audits([audit(minute) for minute in range(0, 60, 10)])
+
+    body = graphql('''{
+      auditCounts(since: "2024-01-01T10:20:00", until: "2024-01-01T11:00:00", groupBy: ["action"]) {
+        action count
+      }
+    }''').get_json()
+
+    assert body['data']['auditCounts'] == [
+        {'action': 'edit', 'count': 2},
+        {'action': 'view', 'count': 2 + 4},
+    ]
@@ -0,0 +1,78 @@
+from functools import partial
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from core import seed
+from core.models import db, User, Paste, PasteVersion, Audit, LoginAttempt
+from core.seed import PASSWORD_HASHES, Seeder
+
+
+@pytest.fixture(autouse=True)
+def cheap_hashes(monkeypatch):
+    # Same scheme as the default, one iteration; verification reads it from the hash
+    monkeypatch.setattr(seed, 'generate_password_hash', partial(generate_password_hash, method='pbkdf2:sha256:1'))
+
+
+@pytest.fixture
+def inserts(app):
+    """The parameter lists of the executemany INSERTs run, per table."""
+    batches = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany and statement.startswith('INSERT INTO'):
+            batches.setdefault(statement.split()[2], []).append(context.compiled_parameters)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield batches
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_seeder_writes_the_requested_rows_in_bounded_batches(app, inserts):
+    with app.app_context():
+        report = Seeder(users=10, pastes=23, batch_size=4, seed=3).run()
+
+        counts = {model.__tablename__: model.query.count() for model in (
+            User, Paste, PasteVersion, Audit, LoginAttempt
+        )}
+    assert counts['users'] == report.rows['users'] == 10
+    assert counts['pastes'] == report.rows['pastes'] == 23
+    for table in ('paste_versions', 'audits', 'login_attempts'):
+        assert counts[table] == report.rows[table]
+    # Every paste has its first version and its create audit
+    assert counts['paste_versions'] >= 23
+    assert counts['audits'] >= 23
+
+    assert [len(batch) for batch in inserts['users']] == [4, 4, 2]
+    assert [len(batch) for batch in inserts['pastes']] == [4, 4, 4, 4, 4, 3]
+    for table in ('paste_versions', 'audits'):
+        # Children are written with the batch of pastes they belong to
+        assert len(inserts[table]) == 6
+        assert all(len({row['paste_id'] for row in batch}) <= 4 for batch in inserts[table])
+
+
+def test_seeded_password_hashes_verify(app):
+    with app.app_context():
+        Seeder(users=PASSWORD_HASHES + 2, pastes=0, seed=3).run()
+        users = User.query.order_by(User.id).all()
+
+        assert users[0].verify_password('password0')
+        assert users[PASSWORD_HASHES + 1].verify_password('password1')
+        assert not users[1].verify_password('password0')
+
+
+def test_seeder_is_deterministic(app):
+    def titles():
+        with app.app_context():
+            Seeder(users=3, pastes=5, seed=7).run()
+            rows = [p.title for p in Paste.query.order_by(Paste.id)]
+            db.session.query(PasteVersion).delete()
+            db.session.query(Audit).delete()
+            db.session.query(Paste).delete()
+            db.session.commit()
+            return rows
+
+    assert titles() == titles()
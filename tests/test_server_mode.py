@@ -0,0 +1,63 @@
+from sqlalchemy import inspect, text
+
+from core.db_migrate import upgrade_database
+from core.models import db, server_mode_cache, ServerMode
+
+
+def test_snapshot_is_loaded_once(app, count_queries):
+    with app.app_context():
+        first = ServerMode.get_config()
+        with count_queries() as statements:
+            assert ServerMode.get_config() is first
+            assert ServerMode.get_mode() == 'easy'
+        assert statements == []
+
+
+def test_set_mode_invalidates_the_snapshot(app):
+    with app.app_context():
+        before = ServerMode.get_config()
+        generation = server_mode_cache.generation
+        ServerMode.set_mode('hard')
+
+        after = ServerMode.get_config()
+        assert after is not before
+        assert after.mode == 'hard'
+        assert after.version == before.version + 1
+        assert server_mode_cache.generation == generation + 1
+
+
+def test_stale_snapshot_reloads_on_version_mismatch(app, monkeypatch):
+    with app.app_context():
+        snapshot = ServerMode.get_config()
+        # Another process changing the row does not invalidate this one
+        db.session.execute(text(
+            "UPDATE server_mode SET mode = 'hard', config_version = config_version + 1"
+        ))
+        db.session.commit()
+        assert ServerMode.get_config() is snapshot
+
+        monkeypatch.setattr(server_mode_cache, 'recheck_interval', 0)
+        assert ServerMode.get_mode() == 'hard'
+
+
+def test_upgrade_adds_config_version(app):
+    with app.app_context():
+        db.session.execute(text('DROP TABLE server_mode'))
+        db.session.execute(text(
+            'CREATE TABLE server_mode (id INTEGER PRIMARY KEY, mode VARCHAR(10) NOT NULL, '
+            'updated_at DATETIME, rate_limit INTEGER, max_paste_size INTEGER, max_file_size INTEGER, '
+            'allowed_file_types VARCHAR(255), log_level VARCHAR(20), security_config TEXT)'
+        ))
+        db.session.execute(text("INSERT INTO server_mode (mode) VALUES ('hard')"))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+        upgrade_database()
+        upgrade_database()
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('server_mode')}
+        assert 'config_version' in columns
+        server_mode_cache.invalidate()
+        assert ServerMode.get_config().version == 0
+        assert ServerMode.set_mode('easy').config_version == 1
@@ -0,0 +1,166 @@
+import json
+from types import SimpleNamespace
+
+import gevent
+import pytest
+from gevent.queue import Queue
+from werkzeug.test import EnvironBuilder
+
+from core.models import Paste
+from core.schema import paste_fanout
+from core.subscriptions import FanoutEngine
+
+SUBSCRIBE = 'subscription { paste(title: "watched") { id title } }'
+
+
+class FakeSocket:
+    """The geventwebsocket socket interface, fed from a queue."""
+
+    def __init__(self, *messages):
+        self.incoming = Queue()
+        self.sent = []
+        self.closed = False
+        for message in messages:
+            self.push(message)
+
+    def push(self, message):
+        self.incoming.put(None if message is None else json.dumps(message))
+
+    def receive(self):
+        return self.incoming.get()
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def close(self):
+        self.closed = True
+        self.incoming.put(None)
+
+
+def open_socket(app, ws):
+    """Run a websocket handshake to /subscriptions through the full WSGI stack."""
+    environ = EnvironBuilder('/subscriptions', headers={
+        'Upgrade': 'websocket', 'Connection': 'Upgrade'
+    }).get_environ()
+    environ['wsgi.websocket'] = ws
+    return gevent.spawn(app.wsgi_app, environ, lambda *args: None)
+
+
+def sent_of_type(ws, message_type):
+    return [message for message in ws.sent if message['type'] == message_type]
+
+
+def paste(id, title):
+    return SimpleNamespace(id=id, title=title)
+
+
+def test_subscriptions_route_reaches_the_subscription_server(app):
+    ws = FakeSocket({'type': 'connection_init'}, {'type': 'start', 'id': '1', 'payload': {'query': SUBSCRIBE}})
+    connection = open_socket(app, ws)
+    gevent.sleep(0.01)
+    assert sent_of_type(ws, 'connection_ack')
+    assert paste_fanout.subscriber_count == 1
+
+    paste_fanout.publish_many([Paste(id=7, title='watched'), Paste(id=8, title='other')])
+    gevent.sleep(0.01)
+    assert sent_of_type(ws, 'data') == [
+        {'type': 'data', 'id': '1', 'payload': {'data': {'paste': {'id': '7', 'title': 'watched'}}}}
+    ]
+
+    ws.push(None)
+    connection.join(timeout=1)
+    assert connection.dead
+
+
+def test_plain_http_to_subscriptions_is_not_a_server_error(client):
+    assert client.get('/subscriptions').status_code == 404
+
+
+def test_fanout_delivers_only_to_matching_subscribers():
+    engine = FanoutEngine()
+    by_id = engine.subscribe(paste_id=1)
+    by_title = engine.subscribe(title='news')
+    everything = engine.subscribe()
+
+    engine.publish_many([paste(1, 'misc'), paste(2, 'news'), paste(3, 'misc')])
+
+    assert [p.id for p in by_id.queue.queue] == [1]
+    assert [p.id for p in by_title.queue.queue] == [2]
+    assert [p.id for p in everything.queue.queue] == [1, 2, 3]
+    assert engine.delivered == 5
+
+
+def test_fanout_renders_each_selection_once():
+    engine = FanoutEngine()
+    rendered = []
+
+    def render(p):
+        rendered.append(p.id)
+        return str(p.id)
+
+    first = engine.subscribe(selection_key='a', render=render)
+    second = engine.subscribe(selection_key='a', render=render)
+    engine.publish(paste(1, 'misc'))
+
+    assert rendered == [1]
+    assert list(first.queue.queue) == list(second.queue.queue) == ['1']
+
+
+def test_slow_consumer_keeps_the_newest_messages():
+    engine = FanoutEngine(queue_size=2, policy='drop_oldest')
+    subscriber = engine.subscribe()
+    engine.publish_many([paste(id, 'misc') for id in range(1, 5)])
+
+    assert [p.id for p in subscriber.queue.queue] == [3, 4]
+    assert subscriber.dropped == 2
+
+
+def test_slow_consumer_can_be_dropped_or_disconnected():
+    engine = FanoutEngine(queue_size=1, policy='drop_newest')
+    subscriber = engine.subscribe()
+    engine.publish_many([paste(1, 'misc'), paste(2, 'misc')])
+    assert [p.id for p in subscriber.queue.queue] == [1]
+
+    disconnected = []
+    engine = FanoutEngine(queue_size=1, policy='disconnect')
+    subscriber = engine.subscribe(on_overflow=disconnected.append)
+    engine.publish_many([paste(1, 'misc'), paste(2, 'misc'), paste(3, 'misc')])
+    assert disconnected == [subscriber]
+    assert subscriber.closed
+    assert engine.delivered == 1
+
+
+@pytest.mark.parametrize('last_message', [None, {'type': 'connection_terminate'}])
+def test_closing_the_connection_unsubscribes(app, last_message):
+    ws = FakeSocket(
+        {'type': 'connection_init'},
+        {'type': 'start', 'id': '1', 'payload': {'query': SUBSCRIBE}},
+        {'type': 'start', 'id': '2', 'payload': {'query': 'subscription { pasteCreated { id } }'}},
+    )
+    connection = open_socket(app, ws)
+    gevent.sleep(0.01)
+    assert paste_fanout.subscriber_count == 2
+
+    ws.push(last_message)
+    connection.join(timeout=1)
+    assert connection.dead
+    assert paste_fanout.subscriber_count == 0
+    assert not paste_fanout._renderers
+
+    paste_fanout.publish(Paste(id=7, title='watched'))
+    gevent.sleep(0.01)
+    assert not sent_of_type(ws, 'data')
+
+
+def test_stop_unsubscribes_one_operation(app):
+    ws = FakeSocket(
+        {'type': 'connection_init'},
+        {'type': 'start', 'id': '1', 'payload': {'query': SUBSCRIBE}},
+        {'type': 'stop', 'id': '1'},
+    )
+    connection = open_socket(app, ws)
+    gevent.sleep(0.01)
+    assert paste_fanout.subscriber_count == 0
+
+    ws.push(None)
+    connection.join(timeout=1)
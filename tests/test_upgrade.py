@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from core.db_migrate import upgrade_database
+from core.models import db, server_mode_cache, PasteVersion, ServerMode
+from core.search import search
+from core.versions import get_version_content, version_cache
+
+CONTENTS = ('a\n', 'a\nb\n', 'a\nb\nc\n')
+
+
+@pytest.fixture
+def baseline_db(app):
+    """The database as the baseline schema left it, with a paste and three full-text versions."""
+    with app.app_context():
+        for table in ('paste_search', 'user_search', 'audit_rollups', 'maintenance_checkpoints'):
+            db.session.execute(text(f'DROP TABLE IF EXISTS {table}'))
+        for table, column in (
+            ('paste_versions', 'delta'), ('paste_versions', 'is_snapshot'), ('server_mode', 'config_version')
+        ):
+            db.session.execute(text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+        db.session.execute(text("INSERT INTO users (id, username, password_hash) VALUES (1, 'legacy', 'x')"))
+        db.session.execute(text(
+            "INSERT INTO pastes (id, title, content, public, version, user_id, owner_id) "
+            "VALUES (1, 'legacy paste', :content, 1, 3, 1, 1)"
+        ), {'content': CONTENTS[-1]})
+        for version, content in enumerate(CONTENTS, 1):
+            db.session.execute(text(
+                'INSERT INTO paste_versions (paste_id, content, version) VALUES (1, :content, :version)'
+            ), {'content': content, 'version': version})
+        db.session.commit()
+        # Startup begins on fresh connections, not ones holding the old schema
+        db.session.remove()
+        db.engine.dispose()
+    server_mode_cache.invalidate()
+    version_cache.clear()
+    return app
+
+
+def test_upgrade_converts_a_baseline_database(baseline_db):
+    with baseline_db.app_context():
+        upgrade_database()
+
+        inspector = inspect(db.engine)
+        assert {'audit_rollups', 'maintenance_checkpoints'} <= set(inspector.get_table_names())
+        assert 'config_version' in {c['name'] for c in inspector.get_columns('server_mode')}
+        assert ServerMode.get_mode() == 'easy'
+
+        rows = PasteVersion.query.filter_by(paste_id=1).order_by(PasteVersion.version).all()
+        assert [row.is_snapshot for row in rows] == [True, False, False]
+        assert [get_version_content(1, version) for version in (1, 2, 3)] == list(CONTENTS)
+
+
+def test_upgrade_runs_again_as_a_no_op(baseline_db, count_queries):
+    with baseline_db.app_context():
+        upgrade_database()
+    with count_queries() as statements:
+        with baseline_db.app_context():
+            upgrade_database()
+    assert not [s for s in statements if s.startswith(('ALTER', 'UPDATE', 'INSERT', 'DELETE'))]
+
+
+def test_upgrade_builds_the_search_index(baseline_db):
+    with baseline_db.app_context():
+        upgrade_database()
+        assert [type(hit).__name__ for hit in search('legacy')] == ['Paste', 'User']
@@ -0,0 +1,18 @@
+import gevent
+
+from core.workers import LeaderLock
+
+
+def test_leader_lock_is_held_by_one_holder_at_a_time(tmp_path):
+    path = str(tmp_path / 'jobs.lock')
+    first, second = LeaderLock(path), LeaderLock(path, poll_interval=0.01)
+    first.acquire()
+
+    waiting = gevent.spawn(second.acquire)
+    gevent.sleep(0.05)
+    assert not second.held
+
+    first.release()
+    waiting.join(timeout=1)
+    assert second.held
+    second.release()